@@ -0,0 +1,138 @@
+"""
+Benchmark of the API calls of the Orchestrator against a local FakeApiServer, which adds a fixed latency to every
+request. The sequential client issues one blocking request at a time through a CustomObjectsApi, as the
+PyTorchJobClient does, and clears the namespace with a DELETE per job. The ApiGateway issues the same requests
+concurrently over a pool of keep-alive connections, coalesces duplicate GETs and clears the namespace with a single
+deletecollection. GETs are measured once per job (get/s), and twice per job (dup get/s), of which the gateway only sends
+one request per job to the server, such that the latter overstates its GET throughput. The gateway is also run against
+a server that fails a fraction of the requests, to show the cost of the retries. Run from the project root:
+
+    python3 -m benchmarks.api_gateway [--jobs N] [--latency SECONDS] [--fault-rate RATE] [--workers N]
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from kubeflow.pytorchjob.constants.constants import PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, PYTORCHJOB_PLURAL
+from kubernetes.client import ApiClient, CustomObjectsApi, V1DeleteOptions
+
+from benchmarks.job_templates import make_task
+from fltk.util.cluster.client import JOB_LABEL_SELECTOR, JobTemplateCache
+from fltk.util.cluster.fake_server import FakeApiServer
+from fltk.util.cluster.gateway import ApiGateway
+from fltk.util.config import BareConfig
+
+NAMESPACE = 'test'
+
+
+class SequentialClient:
+    """
+    Blocking client with the calls of the PyTorchJobClient, without retries.
+    """
+
+    def __init__(self, api: CustomObjectsApi):
+        self.api = api
+
+    def create(self, job, namespace: str):
+        return self.api.create_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace,
+                                                        PYTORCHJOB_PLURAL, job)
+
+    def get(self, name: str, namespace: str):
+        return self.api.get_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace,
+                                                     PYTORCHJOB_PLURAL, name)
+
+    def delete(self, name: str, namespace: str):
+        return self.api.delete_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace,
+                                                        PYTORCHJOB_PLURAL, name, body=V1DeleteOptions())
+
+
+def run_sequential(server: FakeApiServer, jobs: list, names: list) -> dict:
+    client = SequentialClient(CustomObjectsApi(ApiClient(server.configuration())))
+    timings = {}
+    start = time.perf_counter()
+    for job in jobs:
+        client.create(job, NAMESPACE)
+    timings['create'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in names:
+        client.get(name, NAMESPACE)
+    timings['get'] = time.perf_counter() - start
+    start = time.perf_counter()
+    # Every job is polled twice per round, as by the Orchestrator and a duplicate status check.
+    for name in names + names:
+        client.get(name, NAMESPACE)
+    timings['duplicate get'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in names:
+        client.delete(name, NAMESPACE)
+    timings['clear'] = time.perf_counter() - start
+    return timings
+
+
+def run_gateway(server: FakeApiServer, jobs: list, names: list, workers: int) -> dict:
+    gateway = ApiGateway(server.configuration(), workers=workers, backoff=0.01)
+    timings = {}
+    start = time.perf_counter()
+    for future in [gateway.create_async(job, NAMESPACE) for job in jobs]:
+        future.result()
+    timings['create'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for future in [gateway.get_async(name, NAMESPACE) for name in names]:
+        future.result()
+    timings['get'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for future in [gateway.get_async(name, NAMESPACE) for name in names + names]:
+        future.result()
+    timings['duplicate get'] = time.perf_counter() - start
+    start = time.perf_counter()
+    gateway.delete_collection(NAMESPACE, JOB_LABEL_SELECTOR)
+    timings['clear'] = time.perf_counter() - start
+    gateway.close()
+    timings['gateway'] = gateway
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=200, help='Number of jobs to create, poll and delete')
+    parser.add_argument('--latency', type=float, default=0.005, help='Latency of every request in seconds')
+    parser.add_argument('--fault-rate', type=float, default=0.05, help='Fraction of failed requests')
+    parser.add_argument('--workers', type=int, default=8, help='Number of workers of the gateway')
+    args = parser.parse_args()
+
+    with open('configs/example_cloud_experiment.json') as f:
+        config = BareConfig.from_dict(json.load(f))
+    rng = random.Random(0)
+    cache = JobTemplateCache()
+    tasks = [make_task(rng) for _ in range(args.jobs)]
+    for task in tasks:
+        task.id = uuid.UUID(int=rng.getrandbits(128))
+    jobs = [cache.construct(config, task) for task in tasks]
+    names = [job['metadata']['name'] for job in jobs]
+
+    print(f'{args.jobs} jobs, {args.latency * 1000:.1f} ms latency')
+    print(f'{"client":>22} {"create/s":>9} {"get/s":>9} {"dup get/s":>10} {"clear (s)":>10} {"requests":>9} '
+          f'{"conns":>6} {"retries":>8}')
+    runs = [('sequential', 0.0, lambda server: run_sequential(server, jobs, names)),
+            ('gateway', 0.0, lambda server: run_gateway(server, jobs, names, args.workers)),
+            (f'gateway ({args.fault_rate:.0%} faults)', args.fault_rate,
+             lambda server: run_gateway(server, jobs, names, args.workers))]
+    for label, fault_rate, run in runs:
+        with FakeApiServer(latency=args.latency, fault_rate=fault_rate, seed=0) as server:
+            timings = run(server)
+            gateway = timings.get('gateway')
+            retries = sum(gateway.retried.values()) if gateway else 0
+            print(f'{label:>22} {args.jobs / timings["create"]:9.0f} {args.jobs / timings["get"]:9.0f} '
+                  f'{2 * args.jobs / timings["duplicate get"]:10.0f} {timings["clear"]:10.3f} '
+                  f'{sum(server.requests.values()):9d} {server.connections:6d} {retries:8d}')
+            if gateway:
+                for verb, histogram in gateway.latency.items():
+                    if histogram.count:
+                        print(f'{"":>22} {verb}: {histogram.summary()}')
+                print(f'{"":>22} coalesced {gateway.coalesced} GETs')
+
+
+if __name__ == '__main__':
+    main()
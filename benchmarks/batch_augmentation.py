@@ -0,0 +1,61 @@
+"""
+Benchmark of the CIFAR training pipeline: the per-sample transforms (on PIL images, as torchvision datasets return them,
+and on the uint8 arrays of the shards), against the augmentation of whole batches after collation
+(`fltk.datasets.augmentation.BatchAugmentation`). Every pipeline runs an epoch of a DataLoader over synthetic CIFAR10
+shards. Run from the project root:
+
+    python3 -m benchmarks.batch_augmentation [--samples N] [--batch-size N]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader
+from torchvision import transforms
+
+from fltk.datasets.augmentation import BatchAugmentation
+from fltk.datasets.cifar10 import CIFAR10Dataset
+from fltk.datasets.shards import ShardDataset, write_shards
+
+
+def per_sample(pil: bool):
+    steps = [transforms.ToTensor(), transforms.RandomHorizontalFlip(), transforms.RandomCrop(32, 4),
+             transforms.Normalize(CIFAR10Dataset.MEAN, CIFAR10Dataset.STD)]
+    return transforms.Compose([Image.fromarray] + steps if pil else steps), None
+
+
+def main(samples: int, batch_size: int):
+    # As a client with a CPU limit of one core, see `fltk.util.cpu`.
+    torch.set_num_threads(1)
+    rng = np.random.default_rng(0)
+    split = SimpleNamespace(data=rng.integers(0, 256, (samples, 32, 32, 3), dtype=np.uint8),
+                            targets=rng.integers(0, 10, samples), classes=[str(label) for label in range(10)])
+    pipelines = {
+        'per-sample (PIL)': per_sample(True),
+        'per-sample': per_sample(False),
+        'batched': (np.asarray, BatchAugmentation(CIFAR10Dataset.MEAN, CIFAR10Dataset.STD, flip=True, padding=4)),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        write_shards(Path(directory), {'train': split})
+        print(f'{"pipeline":>18} {"epoch":>8} {"samples/s":>10}')
+        for name, (transform, collate) in pipelines.items():
+            loader = DataLoader(ShardDataset(Path(directory), 'train', transform), batch_size=batch_size,
+                                shuffle=True, collate_fn=collate)
+            start = time.perf_counter()
+            for images, labels in loader:
+                assert images.shape == (len(labels), 3, 32, 32)
+            epoch = time.perf_counter() - start
+            print(f'{name:>18} {epoch:7.2f}s {samples / epoch:10.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    arguments = parser.parse_args()
+    main(arguments.samples, arguments.batch_size)
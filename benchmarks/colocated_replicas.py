@@ -0,0 +1,88 @@
+"""
+Benchmark of the training throughput of replicas that share a node, as the pods of several jobs do. Every replica
+trains a FashionMNISTCNN on random batches, and gets an equal share of the cores of this machine as CPU limit (at least
+one core). Compared are:
+
+    default: torch sizes its thread pools to the cores of the host (the behaviour without `configure_threads`),
+    threads: the thread pools are sized to the CPU limit of the replica (`fltk.util.cpu.configure_threads`),
+    pinned:  as threads, and every replica is pinned to a disjoint cpuset (when there are enough cores).
+
+Run from the project root:
+
+    python3 -m benchmarks.colocated_replicas [--replicas 1 2 4] [--duration SECONDS] [--batch-size N]
+"""
+import argparse
+import multiprocessing
+import time
+from typing import List, Optional, Tuple
+
+from fltk.util.cpu import available_cpus, format_cpuset
+
+VARIANTS = ['default', 'threads', 'pinned']
+
+
+def train(variant: str, cores: str, cpuset: Optional[str], duration: float, batch_size: int,
+          barrier: multiprocessing.Barrier, results: multiprocessing.Queue):
+    import torch
+
+    from fltk.nets.fashion_mnist_cnn import FashionMNISTCNN
+    from fltk.util.cpu import configure_threads
+
+    if variant != 'default':
+        configure_threads(cores, cpuset if variant == 'pinned' else None)
+    model = FashionMNISTCNN()
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+    loss_function = torch.nn.CrossEntropyLoss()
+    inputs, labels = torch.randn(batch_size, 1, 28, 28), torch.randint(0, 10, (batch_size,))
+
+    def step():
+        optimizer.zero_grad()
+        loss_function(model(inputs), labels).backward()
+        optimizer.step()
+
+    for _ in range(3):
+        step()
+    barrier.wait()
+    samples, start = 0, time.perf_counter()
+    while time.perf_counter() - start < duration:
+        step()
+        samples += batch_size
+    results.put((samples / (time.perf_counter() - start), torch.get_num_threads()))
+
+
+def run(variant: str, replicas: int, duration: float, batch_size: int) -> Tuple[List[float], int]:
+    cpus = available_cpus()
+    share = max(1, len(cpus) // replicas)
+    context = multiprocessing.get_context('spawn')
+    barrier, results = context.Barrier(replicas), context.Queue()
+    processes = []
+    for replica in range(replicas):
+        # Replicas share the cores when there are more replicas than cores.
+        cpuset = [cpus[(replica * share + offset) % len(cpus)] for offset in range(share)]
+        processes.append(context.Process(target=train, args=(variant, f'{share * 1000}m', format_cpuset(cpuset),
+                                                              duration, batch_size, barrier, results)))
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return [throughput for throughput, _ in measurements], measurements[0][1]
+
+
+def main(replica_counts: List[int], duration: float, batch_size: int):
+    print(f'{len(available_cpus())} cores, batch size {batch_size}, {duration:.0f}s per measurement')
+    print(f'{"replicas":>8} {"variant":>8} {"threads":>8} {"samples/s":>10} {"per replica":>12}')
+    for replicas in replica_counts:
+        for variant in VARIANTS:
+            throughputs, threads = run(variant, replicas, duration, batch_size)
+            print(f'{replicas:>8} {variant:>8} {threads:>8} {sum(throughputs):>10.0f} '
+                  f'{sum(throughputs) / replicas:>12.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--batch-size', type=int, default=64)
+    arguments = parser.parse_args()
+    main(arguments.replicas, arguments.duration, arguments.batch_size)
@@ -0,0 +1,67 @@
+"""
+Benchmark of loading a dataset from the archives with torchvision, against the memory-mapped shards of the extractor
+(`fltk.datasets.shards`). Uses a synthetic FashionMNIST of the real size (60000 training samples, in the idx format of
+the archives), such that it runs without downloading. Measured are the time to open the training split (what every pod
+pays at startup), and an epoch of a DataLoader over it. Run from the project root:
+
+    python3 -m benchmarks.dataset_shards [--samples N] [--batch-size N]
+"""
+import argparse
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from torch.utils.data import DataLoader
+from torchvision import datasets, transforms
+
+from fltk.datasets.shards import ShardDataset, shard_path, write_shards
+
+
+def write_idx(path: Path, array: np.ndarray, magic: int):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('>I', magic))
+        f.write(struct.pack(f'>{array.ndim}I', *array.shape))
+        f.write(array.astype(np.uint8).tobytes())
+
+
+def create_archives(root: Path, samples: int):
+    raw = root / 'FashionMNIST' / 'raw'
+    raw.mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for prefix, count in [('train', samples), ('t10k', samples // 6)]:
+        write_idx(raw / f'{prefix}-images-idx3-ubyte', rng.integers(0, 256, (count, 28, 28)), 2051)
+        write_idx(raw / f'{prefix}-labels-idx1-ubyte', rng.integers(0, 10, count), 2049)
+
+
+def main(samples: int, batch_size: int):
+    transform = transforms.Compose([transforms.ToTensor()])
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        create_archives(root, samples)
+        splits = {split: datasets.FashionMNIST(root=str(root), train=split == 'train') for split in ('train', 'test')}
+        write_shards(shard_path(root, 'FashionMNIST'), splits)
+
+        loaders = {
+            'torchvision': lambda: datasets.FashionMNIST(root=str(root), train=True, transform=transform),
+            'shards': lambda: ShardDataset(shard_path(root, 'FashionMNIST'), 'train', transform),
+        }
+        print(f'{"loader":>12} {"open":>10} {"epoch":>10} {"samples/s":>10}')
+        for name, load in loaders.items():
+            start = time.perf_counter()
+            dataset = load()
+            opened = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in DataLoader(dataset, batch_size=batch_size, shuffle=True):
+                pass
+            epoch = time.perf_counter() - start
+            print(f'{name:>12} {opened * 1000:8.1f}ms {epoch:9.2f}s {len(dataset) / epoch:10.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=60000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    arguments = parser.parse_args()
+    main(arguments.samples, arguments.batch_size)
@@ -0,0 +1,64 @@
+"""
+Benchmark of loading a HistoryStore and warm starting a JobWorkloadPredictor from it, as a function of the number of
+stored records. Half of the records are compacted into the memory-mapped `.npy` file and half are in the append-only
+log, which is the worst case before a compaction. Run from the project root:
+
+    python3 -m benchmarks.history_store
+"""
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from fltk.job_prediction.backends import BACKENDS, NETWORK_MACS, JobFeatures, create_backend
+from fltk.job_prediction.history_store import RECORD_DTYPE, HistoryStore
+from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
+
+SIZES = [1000, 10000, 100000]
+
+
+def make_records(rng: random.Random, count: int) -> np.ndarray:
+    features = JobFeatures.to_records([
+        JobFeatures(rng.choice(list(NETWORK_MACS)), rng.choice(['CIFAR10', 'CIFAR100', 'FashionMNIST']),
+                    rng.randint(1, 100), rng.choice([32, 64, 128]), rng.randint(1, 4), rng.choice([500, 1000, 2000]),
+                    rng.choice([2 ** 30, 2 ** 31])) for _ in range(count)])
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    for name in features.dtype.names:
+        records[name] = features[name]
+    records['length'] = [rng.randint(1000, 1000000) for _ in range(count)]
+    records['timestamp'] = time.time()
+    return records
+
+
+def main(repetitions: int = 5):
+    rng = random.Random(0)
+    print(f'{"records":>8} {"load (ms)":>10} ' + ' '.join(f'{f"warm start {name} (ms)":>22}' for name in BACKENDS))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            path = Path(directory) / f'history_{size}'
+            records = make_records(rng, size)
+            np.save(path.with_name(path.name + '.npy'), records[:size // 2])
+            store = HistoryStore(path, compact_every=size)
+            for record in records[size // 2:]:
+                features = JobFeatures(record['network'].decode(), record['dataset'].decode(), int(record['epochs']),
+                                       int(record['batch_size']), int(record['parallelism']),
+                                       int(record['millicores']), int(record['memory']))
+                store.append(features, float(record['length']), float(record['timestamp']))
+
+            start = time.perf_counter()
+            for _ in range(repetitions):
+                store.load()
+            load = (time.perf_counter() - start) / repetitions
+            warm = []
+            for name in BACKENDS:
+                start = time.perf_counter()
+                for _ in range(repetitions):
+                    JobWorkloadPredictor(create_backend(name), store)
+                warm.append((time.perf_counter() - start) / repetitions)
+            print(f'{size:>8} {load * 1e3:10.2f} ' + ' '.join(f'{duration * 1e3:22.2f}' for duration in warm))
+
+
+if __name__ == '__main__':
+    main()
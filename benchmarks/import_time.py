@@ -0,0 +1,123 @@
+"""
+Benchmark of the import time of the modes of `python3 -m fltk`, measured with `python -X importtime` in a fresh
+interpreter per run. The client mode (the replica of every training job) should only import torch, torchvision, and
+the net and dataset it trains, so the benchmark fails (with exit code 1) when a client imports one of the modules of
+the Orchestrator or TensorBoard (which is only imported when `tensorboard_active`), or when the import time besides
+torch and torchvision exceeds the budget. TensorBoard counts against the budget, also when torch imports it. The `eager` mode imports
+all modes, as `fltk.launch` did before the imports were moved into the launch functions. Run from the project root:
+
+    python3 -m benchmarks.import_time [--runs N] [--budget MILLISECONDS]
+"""
+import argparse
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+# Packages that are (only) imported by torch and torchvision, which every client has to import.
+FRAMEWORK = {'torch', 'torchvision'}
+# Modules of the framework that are only imported for optional features, which are not counted as framework.
+OPTIONAL = ('torch.utils.tensorboard',)
+# Packages of the Orchestrator (and optional features) that a client must not import.
+FORBIDDEN = {'client': ['dropbox', 'kubeflow', 'kubernetes', 'pint', 'sklearn', 'fltk.orchestrator',
+                        'fltk.job_prediction', 'tensorboard', 'torch.utils.tensorboard']}
+
+# Imports of every mode, as done by `fltk.__main__` and the launch function of the mode.
+MODES = {
+    'client': '''
+import fltk.__main__
+import torch.distributed
+from fltk.client import Client
+from fltk.util.config.arguments import LearningParameters
+from fltk.util.cpu import configure_threads
+from fltk.util.progress import ProgressReporter
+params = LearningParameters('FashionMNISTCNN', 'FashionMNIST', 1, 1, 0.1, 0.1, 'CrossEntropy', 'Adam')
+params.get_model_class(), params.get_dataset_class(), params.get_loss(), params.get_optimizer()
+''',
+    'cluster': '''
+import fltk.__main__
+from kubernetes import config
+from fltk.orchestrator import Orchestrator
+from fltk.util.cluster.client import ClusterManager
+from fltk.util.task.generator.multi_group_arrival_generator import MultiGroupArrivalGenerator
+''',
+    'simulate': '''
+import fltk.__main__
+from fltk.orchestrator import STATISTICS_HEADER
+from fltk.simulator import LogNormalDurationModel, Simulator
+''',
+    'eager': '''
+import fltk.__main__
+import fltk.client, fltk.extractor, fltk.orchestrator, fltk.simulator, fltk.sweep, fltk.worker
+import fltk.util.cluster.kubeflow, fltk.util.cluster.local, fltk.util.cluster.worker_pool
+import fltk.nets, fltk.datasets
+for name in fltk.nets.__all__ + fltk.datasets.__all__:
+    getattr(fltk.nets, name, None) or getattr(fltk.datasets, name)
+''',
+}
+
+
+def parse_importtime(output: str) -> Tuple[int, int, Set[str]]:
+    """
+    Function to parse the output of `-X importtime`.
+    @param output: Standard error of the interpreter.
+    @type output: str
+    @return: Total import time and import time of the framework (in microseconds), and the imported modules.
+    @rtype: Tuple[int, int, Set[str]]
+    """
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(own), int(cumulative)))
+    total = sum(own for _, _, own, _ in entries)
+    framework = 0
+    # A module is listed after the modules it imports, so the parents of a module precede it in reverse order.
+    parents: List[Tuple[int, bool]] = []
+    for depth, name, _, cumulative in reversed(entries):
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        optional = any(name == module or name.startswith(module + '.') for module in OPTIONAL)
+        in_framework = bool(parents) and parents[-1][1] and not optional
+        if not in_framework and not optional and name.split('.')[0] in FRAMEWORK:
+            framework += cumulative
+            in_framework = True
+        parents.append((depth, in_framework))
+    return total, framework, {name for _, name, _, _ in entries}
+
+
+def measure(code: str) -> Tuple[int, int, Set[str]]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return parse_importtime(result.stderr)
+
+
+def main(runs: int = 5, budget: float = 500):
+    failures = []
+    print(f'{"mode":>10} {"total":>10} {"torch":>10} {"other":>10}')
+    for mode, code in MODES.items():
+        measurements = [measure(code) for _ in range(runs)]
+        total = min(total for total, _, _ in measurements) / 1000
+        other = min(total - framework for total, framework, _ in measurements) / 1000
+        print(f'{mode:>10} {total:8.0f}ms {total - other:8.0f}ms {other:8.0f}ms')
+        modules = measurements[0][2]
+        imported = [package for package in FORBIDDEN.get(mode, [])
+                    if any(module == package or module.startswith(package + '.') for module in modules)]
+        if imported:
+            failures.append(f'{mode} imports {", ".join(imported)}')
+        if mode == 'client' and other > budget:
+            failures.append(f'{mode} spends {other:.0f}ms on imports besides torch, budget is {budget:.0f}ms')
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=500,
+                        help='Maximum import time of a client besides torch and torchvision in milliseconds')
+    arguments = parser.parse_args()
+    main(arguments.runs, arguments.budget)
@@ -0,0 +1,54 @@
+"""
+Benchmark of the construction of PyTorchJob descriptions on the deploy path. The DeploymentBuilder (`construct_job`)
+builds the V1 objects of every task, which are serialised by the API client when the job is posted, while the
+JobTemplateCache patches a copy of a serialised template. Tasks are drawn from a number of job classes (network,
+dataset and executor resources) with random hyper-parameters and data parallelism. Run from the project root:
+
+    python3 -m benchmarks.job_templates
+"""
+import json
+import random
+import time
+import uuid
+
+from fltk.util.cluster.client import JobTemplateCache, construct_job, serialize_model
+from fltk.util.config import BareConfig
+from fltk.util.task.config.parameter import HyperParameters, SystemParameters
+from fltk.util.task.task import ArrivalTask
+
+JOB_CLASSES = [('FashionMNISTCNN', 'FashionMNIST', '500m', '1Gi'), ('CIFAR10CNN', 'CIFAR10', '1000m', '2Gi'),
+               ('CIFAR100ResNet', 'CIFAR100', '2000m', '4Gi'), ('CIFAR10ResNet', 'CIFAR10', '1000m', '2Gi')]
+
+
+def make_task(rng: random.Random) -> ArrivalTask:
+    network, dataset, cores, memory = rng.choice(JOB_CLASSES)
+    return ArrivalTask(priority=1, id=uuid.uuid4(), network=network, dataset=dataset,
+                       sys_conf=SystemParameters(rng.randint(1, 4), cores, memory, 'train'),
+                       param_conf=HyperParameters(rng.choice([32, 64, 128]), rng.randint(1, 100), '0.01', '0.0002'),
+                       created=0, task_id='task', group_id='group', predicted_length=0)
+
+
+def main(jobs: int = 5000):
+    with open('configs/example_cloud_experiment.json') as f:
+        config = BareConfig.from_dict(json.load(f))
+    rng = random.Random(0)
+    tasks = [make_task(rng) for _ in range(jobs)]
+    cache = JobTemplateCache()
+
+    methods = [
+        ('builder', lambda task: construct_job(config, task)),
+        ('builder + serialise', lambda task: serialize_model(construct_job(config, task))),
+        ('template cache', lambda task: cache.construct(config, task)),
+    ]
+    print(f'{"method":>20} {"jobs/s":>10} {"us/job":>8}')
+    for name, method in methods:
+        start = time.perf_counter()
+        for task in tasks:
+            method(task)
+        duration = time.perf_counter() - start
+        print(f'{name:>20} {jobs / duration:10.0f} {duration / jobs * 1e6:8.1f}')
+    print(f'{len(cache)} templates cached')
+
+
+if __name__ == '__main__':
+    main()
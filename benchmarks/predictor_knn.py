@@ -0,0 +1,111 @@
+"""
+Benchmark of `JobWorkloadPredictor` lookups as a function of the size of its history. For every size, the latency of a
+single `predict_length` (the orchestrator predicts every arrival on its own), the per-task cost of a batched
+`predict_lengths`, and the amortized cost of `feedback` are reported. As reference, the linear scan over a dictionary
+of task vectors (as the predictor did before the HistoryIndex) is timed on the same history. Run from the project root:
+
+    python3 -m benchmarks.predictor_knn
+"""
+import random
+import time
+import uuid
+
+from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.task.config.parameter import HyperParameters, JobClassParameter, NetworkConfiguration, Priority, \
+    SystemParameters, TrainTask
+from fltk.util.task.generator.arrival_generator import Arrival
+from fltk.util.task.task import ArrivalTask
+
+HISTORIES = [100, 1000, 10000, 100000]
+# Latency budget of a single prediction at the largest history, in microseconds.
+BUDGET_US = 1000
+
+
+def make_parameters(rng: random.Random):
+    sys_conf = SystemParameters(data_parallelism=rng.randint(1, 4), executor_cores=f'{rng.choice([500, 1000, 2000])}m',
+                                executor_memory=f'{rng.choice([1000, 2000, 4000])}Mi', action='train')
+    param_conf = HyperParameters(bs=rng.choice([32, 64, 128, 256]), max_epoch=rng.randint(1, 100), lr='0.01',
+                                 lr_decay='0.0002')
+    return sys_conf, param_conf
+
+
+def make_task(rng: random.Random) -> ArrivalTask:
+    sys_conf, param_conf = make_parameters(rng)
+    return ArrivalTask(priority=1, id=uuid.uuid4(), network='FashionMNISTCNN', dataset='fashion-mnist',
+                       sys_conf=sys_conf, param_conf=param_conf, created=0, task_id='task', group_id='group',
+                       predicted_length=0)
+
+
+def make_arrival(rng: random.Random) -> Arrival:
+    sys_conf, param_conf = make_parameters(rng)
+    parameters = JobClassParameter(NetworkConfiguration('FashionMNISTCNN', 'fashion-mnist'), sys_conf, param_conf, 1,
+                                   [Priority(1, 1)])
+    return Arrival(0, TrainTask('task', parameters, Priority(1, 1)), 'task', 'group')
+
+
+def legacy_vector(sys_conf: SystemParameters, param_conf: HyperParameters) -> list:
+    """
+    Task vector of the legacy predictor, i.e. the epochs, batch size, parallelism, cores and memory of a task.
+    """
+    return [int(param_conf.max_epoch), int(param_conf.bs), int(sys_conf.data_parallelism),
+            cpu_to_millicores(sys_conf.executor_cores), memory_to_bytes(sys_conf.executor_memory)]
+
+
+def legacy_distance(vec_a: list, vec_b: list) -> float:
+    """
+    Distance of the legacy predictor, the manhattan distance of which every difference is divided by the largest of the
+    two values, as the dimensions differ in magnitude.
+    """
+    return sum(abs(x_a - x_b) / max(x_a, x_b) for x_a, x_b in zip(vec_a, vec_b))
+
+
+def legacy_predict(history: dict, arrival: Arrival):
+    task_vector = legacy_vector(arrival.get_system_config(), arrival.get_parameter_config())
+    closest, min_dist = None, 0
+    for other_id, (other_vec, _) in history.items():
+        dist = legacy_distance(task_vector, other_vec)
+        if closest is None or dist < min_dist:
+            closest, min_dist = other_id, dist
+    return history[closest][1]
+
+
+def main(queries: int = 1000):
+    rng = random.Random(0)
+    arrivals = [make_arrival(rng) for _ in range(queries)]
+    print(f'{"history":>8} {"feedback (us)":>14} {"predict (us)":>13} {"batched (us/task)":>18} '
+          f'{"legacy scan (us)":>17}')
+    for size in HISTORIES:
+        predictor = JobWorkloadPredictor()
+        tasks = [make_task(rng) for _ in range(size)]
+        lengths = [rng.randint(1000, 1000000) for _ in range(size)]
+        start = time.perf_counter()
+        for task, length in zip(tasks, lengths):
+            predictor.feedback(task, length)
+        feedback = (time.perf_counter() - start) / size
+        # The first lookup builds the KD-tree.
+        predictor.predict_length(arrivals[0])
+
+        start = time.perf_counter()
+        for arrival in arrivals:
+            predictor.predict_length(arrival)
+        predict = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        predictor.predict_lengths(arrivals)
+        batched = (time.perf_counter() - start) / queries
+
+        history = {task.id: (legacy_vector(task.sys_conf, task.param_conf), length)
+                   for task, length in zip(tasks, lengths)}
+        legacy_queries = max(1, min(queries, 100000 // size))
+        start = time.perf_counter()
+        for arrival in arrivals[:legacy_queries]:
+            legacy_predict(history, arrival)
+        legacy = (time.perf_counter() - start) / legacy_queries
+        print(f'{size:>8} {feedback * 1e6:14.1f} {predict * 1e6:13.1f} {batched * 1e6:18.1f} {legacy * 1e6:17.1f}')
+    verdict = 'within' if predict * 1e6 < BUDGET_US else 'OVER'
+    print(f'Single prediction at {HISTORIES[-1]} jobs: {predict * 1e6:.1f} us ({verdict} the {BUDGET_US} us budget)')
+
+
+if __name__ == '__main__':
+    main()
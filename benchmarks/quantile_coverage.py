@@ -0,0 +1,98 @@
+"""
+Evaluation of the calibration of the quantiles predicted by `JobWorkloadPredictor`. Completed jobs are replayed in order
+of completion: every job is first predicted, and then observed, as it would be by an Orchestrator. Per backend, the
+fraction of the jobs that completed within each predicted quantile (the coverage, which should be close to the
+quantile), the median width of the quantiles relative to the point prediction, and the MAPE of the point prediction are
+reported, over all jobs and over the jobs after the first `CALIBRATED_AFTER`.
+
+The jobs are read from a HistoryStore (see `fltk simulate --history`), or drawn from a synthetic workload in which the
+length depends on the network, the parallelism and the batch size as in `benchmarks.history_store`, with log-normal
+noise. Run from the project root:
+
+    python3 -m benchmarks.quantile_coverage [--history PATH] [--jobs N]
+"""
+import argparse
+import math
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from fltk.job_prediction.backends import BACKENDS, DATASET_SIZES, FEATURE_DTYPE, NETWORK_MACS, JobFeatures, \
+    VECTOR_FIELDS, create_backend
+from fltk.job_prediction.history_store import RECORD_DTYPE, HistoryStore
+from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
+
+CALIBRATED_AFTER = 200
+DATASETS = {'CIFAR10CNN': 'CIFAR10', 'CIFAR10ResNet': 'CIFAR10', 'CIFAR100ResNet': 'CIFAR100',
+            'CIFAR100VGG': 'CIFAR100', 'FashionMNISTCNN': 'FashionMNIST', 'FashionMNISTResNet': 'FashionMNIST'}
+
+
+def make_records(rng: random.Random, count: int, sigma: float = 0.3) -> np.ndarray:
+    # Throughput of a network differs from its multiply-accumulates, which the predictor has to learn.
+    efficiency = {network: math.exp(rng.gauss(0, 0.5)) for network in DATASETS}
+    jobs = []
+    for _ in range(count):
+        network = rng.choice(list(DATASETS))
+        jobs.append(JobFeatures(network, DATASETS[network], rng.randint(1, 20), rng.choice([32, 64, 128]),
+                                rng.randint(1, 4), rng.choice([500, 1000, 2000]), rng.choice([2 ** 30, 2 ** 31])))
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    features = JobFeatures.to_records(jobs)
+    for name in FEATURE_DTYPE.names:
+        records[name] = features[name]
+    for i, job in enumerate(jobs):
+        work = job.epochs * DATASET_SIZES[job.dataset] * NETWORK_MACS[job.network] / (job.parallelism *
+                                                                                      job.millicores / 1000)
+        records[i]['length'] = 3000 * work / 5e9 * efficiency[job.network] * (job.batch_size / 64) ** -0.2 * \
+            math.exp(rng.gauss(0, sigma))
+    records['timestamp'] = time.time() + np.arange(count)
+    return records
+
+
+def replay(predictor: JobWorkloadPredictor, records: np.ndarray) -> dict:
+    quantiles = np.asarray(JobWorkloadPredictor.QUANTILES)
+    covered = np.zeros((len(records), len(quantiles)), dtype=bool)
+    widths = np.zeros((len(records), len(quantiles)))
+    errors = np.zeros(len(records))
+    for i, record in enumerate(records):
+        features = JobFeatures(record['network'].decode(), record['dataset'].decode(),
+                               *(int(record[name]) for name in VECTOR_FIELDS))
+        points, predicted = predictor.predict_quantiles([features])
+        length = float(record['length'])
+        covered[i] = length <= predicted[0]
+        widths[i] = predicted[0] / max(points[0], 1)
+        errors[i] = abs(points[0] - length) / max(length, 1)
+        predictor.observe(('replay', i), features, length, points[0],
+                          dict(zip(JobWorkloadPredictor.QUANTILES, predicted[0])))
+    return {'covered': covered, 'widths': widths, 'errors': errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=str, default=None, help='Path of a history store to replay')
+    parser.add_argument('--jobs', type=int, default=5000, help='Number of synthetic jobs, without a history store')
+    args = parser.parse_args()
+    if args.history:
+        records = HistoryStore(Path(args.history)).load()
+        records = records[np.argsort(records['timestamp'], kind='stable')]
+    else:
+        records = make_records(random.Random(0), args.jobs)
+    print(f'Replaying {len(records)} jobs')
+
+    quantiles = JobWorkloadPredictor.QUANTILES
+    print(f'{"backend":>8} {"jobs":>8} ' + ' '.join(f'{f"p{round(q * 100)} cover":>10}' for q in quantiles) + ' ' +
+          ' '.join(f'{f"p{round(q * 100)} width":>10}' for q in quantiles) + f' {"MAPE (%)":>9}')
+    for name in BACKENDS:
+        result = replay(JobWorkloadPredictor(create_backend(name)), records)
+        for label, start in (('all', 0), (f'>{CALIBRATED_AFTER}', CALIBRATED_AFTER)):
+            if start >= len(records):
+                continue
+            coverage = result['covered'][start:].mean(axis=0)
+            widths = np.median(result['widths'][start:], axis=0)
+            print(f'{name:>8} {label:>8} ' + ' '.join(f'{value:10.3f}' for value in coverage) + ' ' +
+                  ' '.join(f'{value:10.2f}' for value in widths) + f' {100 * result["errors"][start:].mean():9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of Kubernetes quantity conversion, comparing the pint based `Convert` with the pint-free
+`cpu_to_millicores`/`memory_to_bytes` parsers. Run from the project root:
+
+    python3 -m benchmarks.quantity_conversion
+"""
+import timeit
+
+from fltk.util.cluster.conversion import Convert, cpu_to_millicores, memory_to_bytes, parse_quantity
+
+CPU_QUANTITIES = ['100m', '250m', '500m', '1000m', '1', '2', '4', '3920m']
+MEMORY_QUANTITIES = ['128Mi', '256Mi', '1Gi', '2000Mi', '2Gi', '15Gi', '1e9', '512k']
+
+
+def main(number: int = 20000):
+    converter = Convert()
+    for value in CPU_QUANTITIES:
+        assert cpu_to_millicores(value) == round(converter(value) * 1000), value
+    for value in MEMORY_QUANTITIES:
+        assert memory_to_bytes(value) == round(converter(value)), value
+
+    quantities = CPU_QUANTITIES + MEMORY_QUANTITIES
+
+    def run_pint():
+        for value in quantities:
+            converter.uncached(value)
+
+    def run_pint_cached():
+        for value in quantities:
+            converter(value)
+
+    def run_parser():
+        parse_quantity.cache_clear()
+        for value in CPU_QUANTITIES:
+            cpu_to_millicores.__wrapped__(value)
+        for value in MEMORY_QUANTITIES:
+            memory_to_bytes.__wrapped__(value)
+
+    def run_parser_cached():
+        for value in CPU_QUANTITIES:
+            cpu_to_millicores(value)
+        for value in MEMORY_QUANTITIES:
+            memory_to_bytes(value)
+
+    for name, func, repeat in [('pint', run_pint, number // 100), ('pint (cached)', run_pint_cached, number),
+                               ('parser', run_parser, number), ('parser (cached)', run_parser_cached, number)]:
+        duration = min(timeit.repeat(func, number=repeat, repeat=3))
+        per_call = duration / (repeat * len(quantities))
+        print(f'{name:>16}: {per_call * 1e6:8.3f} us/conversion ({repeat * len(quantities) / duration:12.0f}/s)')
+
+
+if __name__ == '__main__':
+    main()
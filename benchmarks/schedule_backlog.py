@@ -0,0 +1,79 @@
+"""
+Benchmark of `Schedule.reschedule` as a function of the number of pending tasks. Every round, all pipelines become idle
+and the policy selects their next task, after which the selected tasks are added again to keep the backlog constant.
+As reference, the cost of re-ordering the full backlog with a PriorityQueue (as the policies did before the
+PendingTaskStore) is reported. Run from the project root:
+
+    python3 -m benchmarks.schedule_backlog
+"""
+import json
+import random
+import time
+import uuid
+from queue import PriorityQueue
+
+from fltk.schedulers.schedule import Schedule
+from fltk.util.clock import SimulatedClock
+from fltk.util.config import BareConfig
+from fltk.util.task.task import ArrivalTask
+
+BACKLOGS = [10, 100, 1000, 10000, 100000]
+GROUPS = 10
+
+
+def make_task(rng: random.Random, created: int) -> ArrivalTask:
+    return ArrivalTask(priority=rng.randint(1, 3), id=uuid.uuid4(), network='FashionMNISTCNN', dataset='fashion-mnist',
+                       sys_conf=None, param_conf=None, created=created, task_id=f'task_{created}',
+                       group_id=f'group_{rng.randrange(GROUPS)}', predicted_length=rng.randint(1000, 100000))
+
+
+def legacy_reorder(tasks, pipelines: int) -> None:
+    lengths = PriorityQueue()
+    for pipe in range(pipelines):
+        lengths.put((0, pipe))
+    order = PriorityQueue()
+    for task in tasks:
+        order.put((1, task))
+    while not order.empty():
+        _, task = order.get()
+        length, pipe = lengths.get()
+        lengths.put((length + task.predicted_length, pipe))
+
+
+def bench_reschedule(config: BareConfig, backlog: int, rounds: int) -> float:
+    rng = random.Random(backlog)
+    clock = SimulatedClock()
+    schedule = Schedule(None, config, None, clock=clock)
+    for created in range(backlog):
+        schedule.add_task(make_task(rng, created))
+    clock.advance(backlog / 1000 + 1)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        schedule.reschedule()
+        for pipe in schedule.schedule:
+            while pipe:
+                schedule.add_task(pipe.pop())
+    return (time.perf_counter() - start) / rounds
+
+
+def main(rounds: int = 200):
+    with open('configs/example_cloud_experiment.json') as f:
+        config = BareConfig.from_dict(json.load(f))
+    print(f'{"backlog":>8} {"policy":>8} {"reschedule (us)":>16} {"legacy re-order (us)":>21}')
+    for backlog in BACKLOGS:
+        rng = random.Random(0)
+        tasks = [make_task(rng, created) for created in range(backlog)]
+        legacy_rounds = max(1, min(rounds, 100000 // backlog))
+        start = time.perf_counter()
+        for _ in range(legacy_rounds):
+            legacy_reorder(tasks, config.experiment.pipelines)
+        legacy = (time.perf_counter() - start) / legacy_rounds
+        for policy in ['random', 'fifo', 'fair']:
+            config.experiment.scheduler = policy
+            duration = bench_reschedule(config, backlog, rounds)
+            print(f'{backlog:>8} {policy:>8} {duration * 1e6:16.1f} {legacy * 1e6:21.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,10 @@ import logging
 from argparse import Namespace, ArgumentParser
 from pathlib import Path
 
-from fltk.launch import launch_client, launch_orchestrator, launch_extractor
+from fltk.launch import launch_client, launch_orchestrator, launch_extractor, launch_simulator, \
+    launch_sweep, launch_worker
 from fltk.util.config.arguments import create_client_parser, create_cluster_parser, extract_learning_parameters, \
-    create_extractor_parser
+    create_extractor_parser, create_simulator_parser, create_sweep_parser, create_worker_parser
 from fltk.util.config.base_config import BareConfig
 
 
@@ -15,6 +16,9 @@ def __main__():
     create_client_parser(subparsers)
     create_cluster_parser(subparsers)
     create_extractor_parser(subparsers)
+    create_simulator_parser(subparsers)
+    create_sweep_parser(subparsers)
+    create_worker_parser(subparsers)
     """
     To create your own parser mirror the construction in the 'client_parser' object.
     Or refer to the ArgumentParser library documentation.
@@ -36,8 +40,17 @@ def __main__():
         client_start(arguments, config)
         logging.info("Stopping client...")
         exit(0)
+    elif arguments.mode == 'worker':
+        logging.getLogger().setLevel(logging.INFO)
+        launch_worker(arguments, config)
     elif arguments.mode == 'extractor':
         launch_extractor(arguments, config)
+    elif arguments.mode == 'simulate':
+        simulation_logging()
+        launch_simulator(arguments, config)
+    elif arguments.mode == 'sweep':
+        simulation_logging()
+        launch_sweep(arguments, config)
     else:
         print("Provided mode is not supported...")
         exit(1)
@@ -53,6 +66,15 @@ def cluster_start(args: Namespace, configuration: BareConfig):
     launch_orchestrator(args=args, conf=configuration)
 
 
+def simulation_logging():
+    """
+    Function to only log the progress of simulations, and not every arrival and deployment that is simulated.
+    """
+    logging.getLogger().setLevel(logging.INFO)
+    for name in ['Orchestrator', 'Scheduler', 'MultiGroupArrivalGenerator', 'Simulator']:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
 def client_start(args: Namespace, configuration: BareConfig):
     learning_params = extract_learning_parameters(args)
     task_id = args.task_id
@@ -1,22 +1,30 @@
+import copy
 import datetime
+import itertools
 import logging
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import numpy as np
 import torch
 import torch.distributed as dist
-from sklearn.metrics import confusion_matrix
-from torch.utils.tensorboard import SummaryWriter
 
-from fltk.nets.util.evaluation import calculate_class_precision, calculate_class_recall
+from fltk.datasets.dataset import loader_candidates
+from fltk.nets.util.evaluation import calculate_class_precision, calculate_class_recall, \
+    confusion_matrix_from_counts
 from fltk.nets.util.utils import save_model, load_model_from_file
 from fltk.schedulers import MinCapableStepLR
 from fltk.schedulers.min_lr_step import LearningScheduler
 from fltk.util.config.arguments import LearningParameters
-from fltk.util.config.base_config import BareConfig
+from fltk.util.config.base_config import BareConfig, DataLoaderConfig
+from fltk.util.cpu import cpu_limit
+from fltk.util.progress import ProgressReport, ProgressReporter
 from fltk.util.results import EpochData
 
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
 
 class Client(object):
 
@@ -51,7 +59,7 @@ class Client(object):
 
         self.optimizer: torch.optim.Optimizer
         self.scheduler: LearningScheduler
-        self.tb_writer: SummaryWriter
+        self.tb_writer: Optional['SummaryWriter'] = None
 
     def prepare_learner(self, distributed: bool = False) -> None:
         """
@@ -78,8 +86,56 @@ class Client(object):
                                           self.config.get_scheduler_gamma(),
                                           self.config.get_min_lr())
 
-        self.tb_writer = SummaryWriter(
-            str(self.config.get_log_path(self._task_id, self._id, self.learning_params.model)))
+        if self.dataset.loader_config.autotune:
+            self._autotune_loaders()
+
+        if self.config.cluster_config.client.tensorboard_active:
+            # TensorBoard takes over a hundred milliseconds to import, so it is only imported when it is used.
+            from torch.utils.tensorboard import SummaryWriter
+            self.tb_writer = SummaryWriter(
+                str(self.config.get_log_path(self._task_id, self._id, self.learning_params.model)))
+
+    def _autotune_loaders(self) -> DataLoaderConfig:
+        """
+        Function to choose the settings of the DataLoaders, by timing a few training steps with every candidate setting
+        that fits in the CPU limit of the client (see `fltk.datasets.dataset.loader_candidates`). The steps run on the
+        local model (without synchronisation between the ranks), and the parameters and buffers of the model are
+        restored afterwards, such that the autotuning does not change the training.
+        @return: Chosen settings, which are also used by the dataset.
+        @rtype: DataLoaderConfig
+        """
+        configured = self.dataset.loader_config
+        candidates = loader_candidates(configured, cpu_limit() // 1000)
+        if len(candidates) == 1:
+            return configured
+        model = getattr(self.model, 'module', self.model)
+        state = copy.deepcopy(model.state_dict())
+        model.train()
+        timings = {}
+        for candidate in candidates:
+            self.dataset.configure_loaders(candidate)
+            batches = iter(self.dataset.get_train_loader())
+            samples, start = 0, None
+            # The first batch includes the start of the loader processes, which persist between epochs.
+            for i, (inputs, labels) in enumerate(itertools.islice(batches, configured.autotune_batches + 1)):
+                if i == 0:
+                    start = time.perf_counter()
+                    continue
+                inputs, labels = inputs.to(self.device), labels.to(self.device)
+                self.loss_function(model(inputs), labels).backward()
+                samples += len(labels)
+            del batches
+            if samples:
+                timings[candidate] = (time.perf_counter() - start) / samples
+        model.load_state_dict(state)
+        self.optimizer.zero_grad()
+        best = min(timings, key=timings.get) if timings else configured
+        for candidate, timing in timings.items():
+            self._logger.info(f'Loader with {candidate.num_workers} workers and prefetch factor '
+                              f'{candidate.prefetch_factor}: {1 / timing:.0f} samples/s')
+        self._logger.info(f'Training with {best.num_workers} loader workers and prefetch factor {best.prefetch_factor}')
+        self.dataset.configure_loaders(best)
+        return best
 
     def stop_learner(self):
         """
@@ -88,7 +144,8 @@ class Client(object):
         @rtype: None
         """
         self._logger.info(f"Tearing down Client {self._id}")
-        self.tb_writer.close()
+        if self.tb_writer is not None:
+            self.tb_writer.close()
 
     def _init_device(self, cuda_device: torch.device = torch.device('cpu')):
         """
@@ -130,10 +187,12 @@ class Client(object):
         @param log_interval: Iteration interval at which to log.
         @type log_interval: int
         """
-        running_loss = 0.0
+        # The loss is accumulated on the device, and only read (which waits for the device) at the log interval.
+        running_loss = torch.zeros((), device=self.device)
         final_running_loss = 0.0
         self.model.train()
         for i, (inputs, labels) in enumerate(self.dataset.get_train_loader()):
+            inputs, labels = inputs.to(self.device), labels.to(self.device)
             # zero the parameter gradients
             self.optimizer.zero_grad()
 
@@ -147,11 +206,11 @@ class Client(object):
             loss.backward()
             self.optimizer.step()
 
-            running_loss += float(loss.detach().item())
+            running_loss += loss.detach()
             if i % log_interval == 0:
-                self._logger.info('[%d, %5d] loss: %.3f' % (epoch, i, running_loss / log_interval))
-                final_running_loss = running_loss / log_interval
-                running_loss = 0.0
+                final_running_loss = running_loss.item() / log_interval
+                self._logger.info('[%d, %5d] loss: %.3f' % (epoch, i, final_running_loss))
+                running_loss.zero_()
         self.scheduler.step()
 
         # Save model
@@ -174,11 +233,10 @@ class Client(object):
         confusion_mat will be in a np.array, which corresponds to the nubmer of classes in a classification task.
         @rtype: Tuple[float, float, np.array, np.array, np.array]:
         """
-        correct = 0
         total = 0
-        targets_ = []
-        pred_ = []
-        loss = 0.0
+        # The loss and the counts of (target, prediction) pairs are accumulated on the device, and read once.
+        loss = torch.zeros((), device=self.device)
+        counts = None
 
         # Disable gradient calculation, as we are only interested in predictions
         with torch.no_grad():
@@ -190,15 +248,19 @@ class Client(object):
                 # Future work may add support for non-classification training.
                 _, predicted = torch.max(outputs.data, 1)
                 total += labels.size(0)
-                correct += (predicted == labels).sum().item()
 
-                targets_.extend(labels.detach().cpu().view_as(predicted).numpy())
-                pred_.extend(predicted.detach().cpu().numpy())
+                classes = outputs.shape[1]
+                pairs = torch.bincount(labels.view_as(predicted) * classes + predicted, minlength=classes * classes)
+                counts = pairs if counts is None else counts + pairs
 
-                loss += self.loss_function(outputs, labels).item()
+                loss += self.loss_function(outputs, labels)
 
+        if counts is None:
+            raise ValueError(f'Cannot test on the empty test set of {type(self.dataset).__name__}')
+        confusion_mat: np.array = confusion_matrix_from_counts(counts.view(classes, classes).cpu().numpy())
+        correct = int(np.trace(confusion_mat))
         accuracy = 100.0 * correct / total
-        confusion_mat: np.array = confusion_matrix(targets_, pred_)
+        loss = loss.item()
 
         class_precision: np.array = calculate_class_precision(confusion_mat)
         class_recall: np.array = calculate_class_recall(confusion_mat)
@@ -211,9 +273,12 @@ class Client(object):
 
         return accuracy, loss, class_precision, class_recall, confusion_mat
 
-    def run_epochs(self) -> List[EpochData]:
+    def run_epochs(self, reporter: ProgressReporter = None) -> List[EpochData]:
         """
         Function to run training epochs using the pre-set Hyper-Parameters.
+        @param reporter: Channel to report the progress to the Orchestrator after every epoch, only used by the
+        'master node'.
+        @type reporter: ProgressReporter
         @return: A list of data gathered during the execution, containing progress information such as accuracy. See also
         EpochData.
         @rtype: List[EpochData]
@@ -246,11 +311,18 @@ class Client(object):
                              loss=test_loss,
                              class_precision=class_precision,
                              class_recall=class_recall,
-                             confusion_mat=confusion_mat)
+                             confusion_mat=confusion_mat,
+                             data_loader=self.dataset.loader_config)
 
             epoch_results.append(data)
             if self._id == 0:
                 self.log_progress(data, epoch)
+                if reporter is not None:
+                    elapsed = datetime.datetime.now() - start_time_train
+                    reporter.report(ProgressReport(task_id=self._task_id, epoch=epoch,
+                                                   epochs=self.learning_params.max_epoch,
+                                                   elapsed=elapsed.total_seconds() * 1000,
+                                                   timestamp=time.time()))
         return epoch_results
 
     def save_model(self, epoch):
@@ -271,6 +343,8 @@ class Client(object):
         @return: None
         @rtype: None
         """
+        if self.tb_writer is None:
+            return
 
         self.tb_writer.add_scalar('training loss per epoch',
                                   epoch_data.loss_train,
@@ -1,4 +1,17 @@
-from .cifar10 import CIFAR10Dataset
-from .cifar100 import CIFAR100Dataset
-from .fashion_mnist import FashionMNISTDataset
-from .mnist import MNIST
\ No newline at end of file
+import importlib
+
+# The datasets are imported on first access, such that a client only imports the dataset it trains on.
+_modules = {
+    'CIFAR10Dataset': '.cifar10',
+    'CIFAR100Dataset': '.cifar100',
+    'FashionMNISTDataset': '.fashion_mnist',
+    'MNIST': '.mnist',
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
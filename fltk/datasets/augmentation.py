@@ -0,0 +1,68 @@
+from typing import Any, List, Sequence, Tuple
+
+import torch
+from torch.utils.data._utils.collate import default_collate
+
+
+class BatchAugmentation:
+    """
+    Augmentation and normalisation of whole batches, as the `collate_fn` of a DataLoader. The samples are collated as
+    uint8 images (N x H x W x C, as the arrays of `ShardDataset` or `numpy.asarray` of a PIL image), and the batch is
+    randomly flipped and cropped (with zero padding, as `RandomHorizontalFlip` and `RandomCrop(size, padding)`) with
+    vectorized tensor operations, before it is converted to normalised floats (as `ToTensor` and `Normalize`) in a
+    single fused operation. This replaces the Python-level work of the per-sample transforms.
+    """
+
+    def __init__(self, mean: Sequence[float], std: Sequence[float], flip: bool = False, padding: int = 0):
+        """
+        @param mean: Mean of every channel, as in `transforms.Normalize`.
+        @type mean: Sequence[float]
+        @param std: Standard deviation of every channel, as in `transforms.Normalize`.
+        @type std: Sequence[float]
+        @param flip: Whether to flip half of the images horizontally.
+        @type flip: bool
+        @param padding: Padding of the random crop (of the size of the images), no crop when 0.
+        @type padding: int
+        """
+        std = torch.tensor(std, dtype=torch.float32).view(1, -1, 1, 1)
+        # Normalize((x / 255 - mean) / std) as a single multiply-add per pixel.
+        self.scale = 1 / (255 * std)
+        self.bias = -torch.tensor(mean, dtype=torch.float32).view(1, -1, 1, 1) / std
+        self.flip = flip
+        self.padding = padding
+
+    def __call__(self, samples: List[Tuple[Any, int]]) -> Tuple[torch.Tensor, torch.Tensor]:
+        images, labels = default_collate(samples)
+        return self.augment(images), labels
+
+    def augment(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Function to augment and normalise a batch.
+        @param images: Batch of uint8 images, N x H x W x C (or N x H x W for a single channel).
+        @type images: torch.Tensor
+        @return: Batch of normalised float images, N x C x H x W.
+        @rtype: torch.Tensor
+        """
+        if images.dim() == 3:
+            images = images.unsqueeze(-1)
+        images = images.permute(0, 3, 1, 2)
+        if self.flip:
+            flipped = torch.rand(images.shape[0]) < 0.5
+            images = torch.where(flipped.view(-1, 1, 1, 1), images.flip(3), images)
+        if self.padding:
+            images = self.crop(images)
+        return torch.addcmul(self.bias, images.float(), self.scale).contiguous()
+
+    def crop(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Function to crop every image of a batch at a random offset in the zero padded image, by gathering the rows and
+        columns of the crops with a single indexing operation.
+        """
+        count, _, height, width = images.shape
+        padded = torch.nn.functional.pad(images, [self.padding] * 4)
+        top = torch.randint(0, 2 * self.padding + 1, (count, 1, 1))
+        left = torch.randint(0, 2 * self.padding + 1, (count, 1, 1))
+        rows = top + torch.arange(height).view(1, -1, 1)
+        columns = left + torch.arange(width).view(1, 1, -1)
+        # Advanced indexing of the batch, rows and columns moves the channels last.
+        return padded[torch.arange(count).view(-1, 1, 1), :, rows, columns].permute(0, 3, 1, 2)
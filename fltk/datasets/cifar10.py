@@ -1,40 +1,54 @@
-from torch.utils.data import DataLoader, DistributedSampler
+import numpy as np
+from torch.utils.data import DistributedSampler
 from torchvision import datasets
 from torchvision import transforms
 
+from .augmentation import BatchAugmentation
 from .dataset import Dataset
 
 
 class CIFAR10Dataset(Dataset):
 
+    MEAN = [0.485, 0.456, 0.406]
+    STD = [0.229, 0.224, 0.225]
+
     def __init__(self, config, learning_param, rank: int = 0, world_size: int = None):
         super(CIFAR10Dataset, self).__init__(config, learning_param, rank, world_size)
 
     def load_train_dataset(self, rank: int = 0, world_size: int = None):
-        normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        transform = transforms.Compose([
-            transforms.RandomHorizontalFlip(),
-            transforms.RandomCrop(32, 4),
-            transforms.ToTensor(),
-            normalize
-        ])
-
-        train_dataset = datasets.CIFAR10(root=self.config.get_data_path(), train=True, download=True, transform=transform)
+        collate = None
+        if self.config.batch_augmentation_enabled(self.learning_params.dataset):
+            # Samples are collated as uint8 images, and augmented per batch.
+            transform = np.asarray
+            collate = BatchAugmentation(self.MEAN, self.STD, flip=True, padding=4)
+        else:
+            normalize = transforms.Normalize(mean=self.MEAN, std=self.STD)
+            transform = transforms.Compose([
+                transforms.ToTensor(),
+                transforms.RandomHorizontalFlip(),
+                transforms.RandomCrop(32, 4),
+                normalize
+            ])
+
+        train_dataset = self.load_dataset(datasets.CIFAR10, train=True, transform=transform)
         sampler = DistributedSampler(train_dataset, rank=rank, num_replicas=self.world_size) if self.world_size else None
-        train_loader = DataLoader(train_dataset, batch_size=self.learning_params.batch_size, sampler=sampler,
-                                  shuffle=(sampler is None))
+        train_loader = self.create_loader(train_dataset, True, sampler, collate)
 
         return train_loader
 
     def load_test_dataset(self):
-        normalize = transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        transform = transforms.Compose([
-            transforms.ToTensor(),
-            normalize
-        ])
-        test_dataset = datasets.CIFAR10(root=self.config.get_data_path(), train=False, download=True,
-                                        transform=transform)
+        collate = None
+        if self.config.batch_augmentation_enabled(self.learning_params.dataset):
+            transform = np.asarray
+            collate = BatchAugmentation(self.MEAN, self.STD)
+        else:
+            normalize = transforms.Normalize(mean=self.MEAN, std=self.STD)
+            transform = transforms.Compose([
+                transforms.ToTensor(),
+                normalize
+            ])
+        test_dataset = self.load_dataset(datasets.CIFAR10, train=False, transform=transform)
         sampler = DistributedSampler(test_dataset, rank=self.rank,
                                      num_replicas=self.world_size) if self.world_size else None
-        test_loader = DataLoader(test_dataset, batch_size=self.learning_params.batch_size, sampler=sampler)
+        test_loader = self.create_loader(test_dataset, False, sampler, collate)
         return test_loader
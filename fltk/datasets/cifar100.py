@@ -1,37 +1,49 @@
-from torch.utils.data import DataLoader, DistributedSampler
+import numpy as np
+from torch.utils.data import DistributedSampler
 from torchvision import datasets
 from torchvision import transforms
 
+from .augmentation import BatchAugmentation
 from .dataset import Dataset
 
 
 class CIFAR100Dataset(Dataset):
 
+    MEAN = [0.507, 0.487, 0.441]
+    STD = [0.267, 0.256, 0.276]
+
     DEFAULT_TRANSFORM = transforms.Compose([
+        transforms.ToTensor(),
         transforms.RandomHorizontalFlip(),
         transforms.RandomCrop(32, 4),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.507, 0.487, 0.441], std=[0.267, 0.256, 0.276])
+        transforms.Normalize(mean=MEAN, std=STD)
     ])
 
     def __init__(self, config, learning_param, rank: int = 0, world_size: int = None):
         super(CIFAR100Dataset, self).__init__(config, learning_param, rank, world_size)
 
+    def __pipeline(self):
+        """
+        Function to get the transform and collate function of the splits, both splits use the DEFAULT_TRANSFORM.
+        """
+        if self.config.batch_augmentation_enabled(self.learning_params.dataset):
+            # Samples are collated as uint8 images, and augmented per batch.
+            return np.asarray, BatchAugmentation(self.MEAN, self.STD, flip=True, padding=4)
+        return self.DEFAULT_TRANSFORM, None
+
     def load_train_dataset(self, rank: int = 0, world_size: int = None):
-        train_dataset = datasets.CIFAR100(root=self.config.get_data_path(), train=True, download=True,
-                                          transform=self.DEFAULT_TRANSFORM)
+        transform, collate = self.__pipeline()
+        train_dataset = self.load_dataset(datasets.CIFAR100, train=True, transform=transform)
         sampler = DistributedSampler(train_dataset, rank=rank,
                                      num_replicas=self.world_size) if self.world_size else None
-        train_loader = DataLoader(train_dataset, batch_size=self.learning_params.batch_size, sampler=sampler,
-                                  shuffle=(sampler is None))
+        train_loader = self.create_loader(train_dataset, True, sampler, collate)
 
         return train_loader
 
     def load_test_dataset(self):
-
-        test_dataset = datasets.CIFAR100(root=self.config.get_data_path(), train=False, download=True,
-                                         transform=self.DEFAULT_TRANSFORM)
+        transform, collate = self.__pipeline()
+        test_dataset = self.load_dataset(datasets.CIFAR100, train=False, transform=transform)
         sampler = DistributedSampler(test_dataset, rank=self.rank,
                                      num_replicas=self.world_size) if self.world_size else None
-        test_loader = DataLoader(test_dataset, batch_size=self.learning_params.batch_size, sampler=sampler)
+        test_loader = self.create_loader(test_dataset, False, sampler, collate)
         return test_loader
@@ -1,18 +1,52 @@
 from abc import abstractmethod
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Tuple
 
 import torch
 from torch.utils.data import DataLoader
 from torch.utils.data import TensorDataset
 
+from fltk.datasets.shards import ShardDataset, read_manifest, shard_path
+from fltk.util.config.base_config import DataLoaderConfig
+
+# Prefetch factors that are tried by the autotuning of the DataLoaders, for every number of loader processes.
+AUTOTUNE_PREFETCH_FACTORS = [2, 4]
+
+
+def loader_candidates(loader_config: DataLoaderConfig, cores: int) -> List[DataLoaderConfig]:
+    """
+    Function to get the settings that the autotuning of the DataLoaders tries, the configured settings and the settings
+    with up to one loader process per core besides the core of the training process.
+    @param loader_config: Configured settings.
+    @type loader_config: DataLoaderConfig
+    @param cores: Number of cores that the client may use.
+    @type cores: int
+    @return: Candidate settings, the configured settings first.
+    @rtype: List[DataLoaderConfig]
+    """
+    candidates = [loader_config, replace(loader_config, num_workers=0, prefetch_factor=None, persistent_workers=False)]
+    for workers in range(1, cores):
+        for prefetch_factor in AUTOTUNE_PREFETCH_FACTORS:
+            # The loader processes are kept between epochs, such that they start once per job.
+            candidates.append(replace(loader_config, num_workers=workers, prefetch_factor=prefetch_factor,
+                                      persistent_workers=True))
+    return list(dict.fromkeys(candidates))
+
 
 class Dataset:
 
+    # Underlying (torchvision) datasets of the process, by Dataset class, data path, split and transform (by its
+    # representation, which lists the parameters of torchvision transforms), such that a long-lived worker (see
+    # `fltk.worker`) loads every dataset only once per transform, e.g. with and without batch augmentation.
+    _loaded: Dict[Tuple[type, str, bool, str], Any] = {}
+
     def __init__(self, config, learning_params, rank: int, world_size: int):
         self.config = config
         self.learning_params = learning_params
 
         self.rank = rank
         self.world_size = world_size
+        self.loader_config: DataLoaderConfig = config.execution_config.data_loader
 
         self.train_loader = self.load_train_dataset()
         self.test_loader = self.load_test_dataset()
@@ -33,6 +67,78 @@ class Dataset:
         """
         return self.test_loader
 
+    def load_dataset(self, dataset_class: Callable[..., Any], train: bool, transform: Callable) -> Any:
+        """
+        Function to get the train or test split of a dataset, which is loaded on first use in the process. The shards
+        of the dataset (see `fltk.datasets.shards`) are used when the extractor wrote them to the data path.
+        @param dataset_class: Class of the (torchvision) dataset, e.g. `torchvision.datasets.CIFAR10`.
+        @type dataset_class: Callable[..., Any]
+        @param train: Whether to get the train (or test) split.
+        @type train: bool
+        @param transform: Transform of the samples of the split.
+        @type transform: Callable
+        @return: Dataset of the split.
+        @rtype: Any
+        """
+        key = (type(self), str(self.config.get_data_path()), train, repr(transform))
+        if key not in Dataset._loaded:
+            # Prefer the memory-mapped shards of the extractor, over decoding the archives of torchvision.
+            directory = shard_path(self.config.get_data_path(), dataset_class.__name__)
+            manifest = read_manifest(directory)
+            if manifest is not None:
+                Dataset._loaded[key] = ShardDataset(directory, 'train' if train else 'test', transform, manifest)
+            else:
+                Dataset._loaded[key] = dataset_class(root=self.config.get_data_path(), train=train, download=True,
+                                                     transform=transform)
+        return Dataset._loaded[key]
+
+    def create_loader(self, dataset: Any, train: bool, sampler: Any = None, collate_fn: Callable = None) -> DataLoader:
+        """
+        Function to create the DataLoader of a split, with the batch size of the job (or the test batch size) and the
+        settings of the `loader_config`.
+        @param dataset: Dataset of the split.
+        @type dataset: Any
+        @param train: Whether the split is the train split, which is shuffled when no sampler is provided.
+        @type train: bool
+        @param sampler: Sampler of the split, e.g. a DistributedSampler.
+        @type sampler: Any
+        @param collate_fn: Function to collate the samples into a batch, see `fltk.datasets.augmentation`.
+        @type collate_fn: Callable
+        @return: Loader of the split.
+        @rtype: DataLoader
+        """
+        batch_size = self.learning_params.batch_size
+        if not train and self.loader_config.test_batch_size:
+            batch_size = self.loader_config.test_batch_size
+        return DataLoader(dataset, batch_size=batch_size, sampler=sampler, shuffle=train and sampler is None,
+                          collate_fn=collate_fn, **self.__loader_options())
+
+    def configure_loaders(self, loader_config: DataLoaderConfig) -> None:
+        """
+        Function to recreate the loaders of both splits with other settings, e.g. as chosen by autotuning.
+        @param loader_config: Settings of the loaders.
+        @type loader_config: DataLoaderConfig
+        @return: None
+        @rtype: None
+        """
+        self.loader_config = loader_config
+        self.train_loader = self.__recreate(self.train_loader)
+        self.test_loader = self.__recreate(self.test_loader)
+
+    def __recreate(self, loader: DataLoader) -> DataLoader:
+        # The (random) sampler of the loader is kept, such that the loader shuffles (or not) as before.
+        return DataLoader(loader.dataset, batch_size=loader.batch_size, sampler=loader.sampler,
+                          collate_fn=loader.collate_fn, **self.__loader_options())
+
+    def __loader_options(self) -> Dict[str, Any]:
+        options = {'num_workers': self.loader_config.num_workers}
+        if self.loader_config.num_workers > 0:
+            options.update(persistent_workers=self.loader_config.persistent_workers)
+            # torch 1.9 only accepts an integer prefetch factor, so its default is used by leaving it out.
+            if self.loader_config.prefetch_factor is not None:
+                options.update(prefetch_factor=self.loader_config.prefetch_factor)
+        return options
+
     @abstractmethod
     def load_train_dataset(self):
         """
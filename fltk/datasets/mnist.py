@@ -1,4 +1,4 @@
-from torch.utils.data import DataLoader, DistributedSampler
+from torch.utils.data import DistributedSampler
 from torchvision import datasets
 from torchvision import transforms
 
@@ -15,19 +15,16 @@ class MNIST(Dataset):
         super(MNIST, self).__init__(config, learning_param, rank, world_size)
 
     def load_train_dataset(self, rank: int = 0, world_size: int = None):
-        train_dataset = datasets.FashionMNIST(root=self.config.get_data_path(), train=True, download=True,
-                                              transform=self.DEFAULT_TRANSFORM)
+        train_dataset = self.load_dataset(datasets.MNIST, train=True, transform=self.DEFAULT_TRANSFORM)
         sampler = DistributedSampler(train_dataset, rank=rank,
                                      num_replicas=self.world_size) if self.world_size else None
-        train_loader = DataLoader(train_dataset, batch_size=self.learning_params.batch_size, sampler=sampler,
-                                  shuffle=(sampler is None))
+        train_loader = self.create_loader(train_dataset, True, sampler)
 
         return train_loader
 
     def load_test_dataset(self):
-        test_dataset = datasets.FashionMNIST(root=self.config.get_data_path(), train=False, download=True,
-                                             transform=self.DEFAULT_TRANSFORM)
+        test_dataset = self.load_dataset(datasets.MNIST, train=False, transform=self.DEFAULT_TRANSFORM)
         sampler = DistributedSampler(test_dataset, rank=self.rank,
                                      num_replicas=self.world_size) if self.world_size else None
-        test_loader = DataLoader(test_dataset, batch_size=self.learning_params.batch_size, sampler=sampler)
+        test_loader = self.create_loader(test_dataset, False, sampler)
         return test_loader
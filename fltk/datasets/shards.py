@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import torch.utils.data
+
+# Directory (in the data path) with a directory of shards for every dataset, as written by the extractor.
+SHARD_DIR = 'shards'
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def shard_path(data_path: Path, name: str) -> Path:
+    """
+    Function to get the directory of the shards of a dataset.
+    @param data_path: Data path of the configuration.
+    @type data_path: Path
+    @param name: Name of the dataset, i.e. of its torchvision class (e.g. `CIFAR10`).
+    @type name: str
+    @return: Directory of the shards and manifest of the dataset.
+    @rtype: Path
+    """
+    return Path(data_path) / SHARD_DIR / name
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    """
+    Function to read the manifest of the shards of a dataset.
+    @param directory: Directory of the shards.
+    @type directory: Path
+    @return: Manifest, or None when the dataset has no (complete) shards.
+    @rtype: Optional[Dict[str, Any]]
+    """
+    try:
+        manifest = json.loads((directory / MANIFEST).read_text())
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == FORMAT_VERSION else None
+
+
+def write_shards(directory: Path, splits: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Function to write the splits of a torchvision dataset as shards: the samples of a split as one contiguous uint8
+    array (N x H x W, or N x H x W x C for color images) and the labels as an int64 array, in `.npy` files. The manifest
+    is written last, such that an interrupted extraction is not used.
+    @param directory: Directory to write the shards to.
+    @type directory: Path
+    @param splits: Dataset (with `data`, `targets` and `classes`, as the torchvision image datasets) of every split.
+    @type splits: Dict[str, Any]
+    @return: Manifest of the shards.
+    @rtype: Dict[str, Any]
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = {'version': FORMAT_VERSION, 'splits': {}}
+    for split, dataset in splits.items():
+        images = np.ascontiguousarray(np.asarray(dataset.data), dtype=np.uint8)
+        labels = np.asarray(dataset.targets, dtype=np.int64)
+        np.save(directory / f'{split}-images.npy', images)
+        np.save(directory / f'{split}-labels.npy', labels)
+        manifest['splits'][split] = {'images': f'{split}-images.npy', 'labels': f'{split}-labels.npy',
+                                     'samples': len(labels), 'shape': list(images.shape[1:]),
+                                     'classes': list(getattr(dataset, 'classes', []))}
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+class ShardDataset(torch.utils.data.Dataset):
+    """
+    Split of a dataset that was written by `write_shards`. The shards are memory-mapped read-only, such that opening
+    the dataset takes milliseconds, and the processes on a node (e.g. co-located pods with the data on a shared volume)
+    share the pages of the shards in the page cache, instead of each holding a decoded copy. Samples are passed to the
+    transform as uint8 arrays (H x W or H x W x C), as accepted by `transforms.ToTensor`.
+    """
+
+    def __init__(self, directory: Path, split: str, transform: Callable = None, manifest: Dict[str, Any] = None):
+        """
+        @param directory: Directory of the shards.
+        @type directory: Path
+        @param split: Split to load, `train` or `test`.
+        @type split: str
+        @param transform: Transform of the samples.
+        @type transform: Callable
+        @param manifest: Manifest of the shards, read from the directory when None.
+        @type manifest: Dict[str, Any]
+        """
+        manifest = manifest or read_manifest(directory)
+        if manifest is None or split not in manifest['splits']:
+            raise FileNotFoundError(f'No shards of split {split} in {directory}')
+        self.directory = directory
+        self.description = manifest['splits'][split]
+        self.classes = self.description['classes']
+        self.transform = transform
+        self.__open()
+
+    def __open(self):
+        self.images = np.load(self.directory / self.description['images'], mmap_mode='r')
+        self.labels = np.load(self.directory / self.description['labels'], mmap_mode='r')
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Loader processes that are not forked map the shards themselves, instead of receiving a copy of the samples.
+        state = self.__dict__.copy()
+        del state['images'], state['labels']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self.__open()
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, index: int):
+        # Copy the sample out of the (read-only) mapping, the transforms may convert it in place.
+        image = np.array(self.images[index])
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, int(self.labels[index])
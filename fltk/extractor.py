@@ -1,10 +1,14 @@
-import os
+import logging
 from argparse import Namespace
 
 from torchvision.datasets import FashionMNIST, CIFAR10, CIFAR100, MNIST
 
+from fltk.datasets.shards import read_manifest, shard_path, write_shards
 from fltk.util.config import BareConfig
 
+# Datasets that are extracted, by the name of their directory of shards.
+DATASETS = {dataset.__name__: dataset for dataset in [MNIST, FashionMNIST, CIFAR10, CIFAR100]}
+
 
 def download_datasets(args: Namespace, config: BareConfig):
     """
@@ -12,6 +16,9 @@ def download_datasets(args: Namespace, config: BareConfig):
     download all datasets into the `data` directory and include it in the Docker image that is build for the project.
     (This to prevent unnecessary load on the services that provide the datasets, and decrease the energy footprint of
     using the FLTK framework).
+
+    Every dataset is also written as memory-mappable shards of pre-decoded samples (see `fltk.datasets.shards`), which
+    the clients load instead of the archives.
     @param args: Namespace object.
     @type args: Namespace
     @param config: FLTK configuration file, for finding the path where the datasets should be stored.
@@ -20,16 +27,15 @@ def download_datasets(args: Namespace, config: BareConfig):
     @rtype: None
     """
     data_path = config.get_data_path()
-    root = str(data_path)
-
-    if not data_path.is_dir():
-        os.mkdirs(root, exist_ok=True)
+    data_path.mkdir(parents=True, exist_ok=True)
 
-    # Prepare MNIST
-    MNIST(root=root, download=True)
-    # Prepare Fashion MNIST
-    FashionMNIST(root=root, download=True)
-    # Prepare CIFAR10
-    CIFAR10(root=root, download=True)
-    # Prepare CIFAR100
-    CIFAR100(root=root, download=True)
+    for name, dataset_class in DATASETS.items():
+        directory = shard_path(data_path, name)
+        if read_manifest(directory) is not None:
+            logging.info(f'Shards of {name} already exist in {directory}')
+            continue
+        splits = {split: dataset_class(root=str(data_path), train=split == 'train', download=True)
+                  for split in ('train', 'test')}
+        manifest = write_shards(directory, splits)
+        logging.info(f'Wrote {sum(split["samples"] for split in manifest["splits"].values())} samples of {name} '
+                     f'to {directory}')
@@ -0,0 +1,280 @@
+import math
+import zlib
+from abc import abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+import scipy.linalg
+
+from fltk.job_prediction.history_index import HistoryIndex
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.task.config.parameter import HyperParameters, SystemParameters
+
+# Multiply-accumulates of a forward pass of a single sample, per network (see `fltk.util.config.arguments`).
+NETWORK_MACS: Dict[str, float] = {
+    'CIFAR10CNN': 3.9e7,
+    'CIFAR10ResNet': 5.6e8,
+    'CIFAR100ResNet': 5.6e8,
+    'CIFAR100VGG': 3.3e8,
+    'FashionMNISTCNN': 2.8e6,
+    # Estimated as a ResNet-18 on 28x28 inputs.
+    'FashionMNISTResNet': 4.3e8,
+}
+DEFAULT_MACS = 1e8
+
+# Number of training samples per dataset.
+DATASET_SIZES: Dict[str, int] = {
+    'CIFAR10': 50000,
+    'CIFAR100': 50000,
+    'FashionMNIST': 60000,
+    'MNIST': 60000,
+}
+DEFAULT_DATASET_SIZE = 50000
+
+# Columnar representation of JobFeatures, e.g. to store the history of a predictor (see `history_store.HistoryStore`).
+FEATURE_DTYPE = np.dtype([('network', 'S64'), ('dataset', 'S64'), ('epochs', '<i4'), ('batch_size', '<i4'),
+                          ('parallelism', '<i4'), ('millicores', '<i8'), ('memory', '<i8')])
+_HASH_MULTIPLIERS = np.random.default_rng(0).integers(1, 2 ** 63, size=FEATURE_DTYPE['network'].itemsize // 8,
+                                                     dtype=np.uint64) | np.uint64(1)
+# Columns of the numeric task vector.
+VECTOR_FIELDS = ['epochs', 'batch_size', 'parallelism', 'millicores', 'memory']
+
+
+@dataclass(frozen=True)
+class JobFeatures:
+    """
+    Description of a training job as seen by a predictor backend.
+    """
+    network: str
+    dataset: str
+    epochs: int
+    batch_size: int
+    parallelism: int
+    millicores: int
+    memory: int
+
+    @classmethod
+    def from_parameters(cls, network: str, dataset: str, sys_conf: SystemParameters,
+                        param_conf: HyperParameters) -> 'JobFeatures':
+        return cls(network=network, dataset=dataset, epochs=int(param_conf.max_epoch), batch_size=int(param_conf.bs),
+                   parallelism=int(sys_conf.data_parallelism), millicores=cpu_to_millicores(sys_conf.executor_cores),
+                   memory=memory_to_bytes(sys_conf.executor_memory))
+
+    @property
+    def vector(self) -> List[int]:
+        """
+        Numeric task vector, i.e. epochs, batch size, data parallelism, milli-cores and bytes of memory.
+        """
+        return [self.epochs, self.batch_size, self.parallelism, self.millicores, self.memory]
+
+    @staticmethod
+    def to_records(features: Sequence['JobFeatures']) -> np.ndarray:
+        """
+        Function to convert a batch of jobs to a structured array of FEATURE_DTYPE.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @return: Array with a record per job.
+        @rtype: np.ndarray
+        """
+        return np.array([(job.network.encode(), job.dataset.encode(), job.epochs, job.batch_size, job.parallelism,
+                          job.millicores, job.memory) for job in features], dtype=FEATURE_DTYPE)
+
+
+class PredictorBackend:
+    """
+    Model of the length of jobs that is trained online on the measured lengths of completed jobs.
+    """
+
+    @abstractmethod
+    def predict(self, features: Sequence[JobFeatures]) -> np.ndarray:
+        """
+        Function to predict the length of a batch of jobs.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @return: Predicted lengths in milliseconds.
+        @rtype: np.ndarray
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    @abstractmethod
+    def update(self, key: Hashable, features: JobFeatures, length: float) -> None:
+        """
+        Function to train the model on a completed job.
+        @param key: Identifier of the job.
+        @type key: Hashable
+        @param features: Features of the job.
+        @type features: JobFeatures
+        @param length: Measured length in milliseconds.
+        @type length: float
+        @return: None
+        @rtype: None
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    def fit(self, records: np.ndarray, lengths: np.ndarray) -> None:
+        """
+        Function to train the model on a batch of completed jobs, e.g. the history of earlier experiments.
+        @param records: Features of the jobs, as array of FEATURE_DTYPE.
+        @type records: np.ndarray
+        @param lengths: Measured lengths in milliseconds.
+        @type lengths: np.ndarray
+        @return: None
+        @rtype: None
+        """
+        for index, (record, length) in enumerate(zip(records, lengths)):
+            features = JobFeatures(record['network'].decode(), record['dataset'].decode(),
+                                   *(int(record[name]) for name in VECTOR_FIELDS))
+            self.update(('fit', index), features, float(length))
+
+
+class NearestNeighbourBackend(PredictorBackend):
+    """
+    Predicts the distance weighted length of the most similar jobs in the history, by their numeric task vector.
+    """
+
+    # Number of features of a task vector, see `JobFeatures.vector`.
+    DIMENSIONS = 5
+
+    def __init__(self, k: int = 5, tree_threshold: int = HistoryIndex.TREE_THRESHOLD):
+        self.history = HistoryIndex(self.DIMENSIONS, k=k, tree_threshold=tree_threshold)
+
+    def predict(self, features: Sequence[JobFeatures]) -> np.ndarray:
+        vectors = [job.vector for job in features]
+        if not len(self.history):
+            # this is basically a random guess based on the task vector
+            return np.array([(vector[0] * vector[1]) / vector[3] for vector in vectors], dtype=np.float64)
+        return self.history.predict(vectors)
+
+    def update(self, key: Hashable, features: JobFeatures, length: float) -> None:
+        self.history.append(key, features.vector, length)
+
+    def fit(self, records: np.ndarray, lengths: np.ndarray) -> None:
+        self.history.extend(np.column_stack([records[name] for name in VECTOR_FIELDS]), lengths)
+
+
+class RidgeBackend(PredictorBackend):
+    """
+    Online ridge regression on the logarithm of the length. Besides the logarithms of the numeric features and the
+    static cost of the network, the network and dataset are one-hot encoded into a fixed number of hashed features, such
+    that unseen networks and datasets need no re-allocation.
+
+    The weights are regularised towards a prior in which the length is proportional to the static cost of the job, the
+    number of epochs times the size of the dataset times the multiply-accumulates of a forward pass of the network,
+    divided by the cores of all executors (the log work feature). Cold-start predictions thereby already account for
+    the size of the network. The sufficient statistics (X^T X and X^T y) are updated per completed job in O(d^2), and
+    solved lazily on the next prediction.
+    """
+
+    # Multiply-accumulates per second of a single core, of the prior (a training step costs three forward passes).
+    PRIOR_THROUGHPUT = 5e9
+    # Dense features: bias, log work, log epochs, log batch size, log parallelism, log cores, log GiB, log MACs, log
+    # dataset size.
+    DENSE_FEATURES = 9
+    FIT_CHUNK = 16384
+
+    def __init__(self, alpha: float = 1.0, buckets: int = 64, throughput: float = PRIOR_THROUGHPUT):
+        """
+        @param alpha: Strength of the regularisation towards the prior.
+        @type alpha: float
+        @param buckets: Number of hashed features of the network and dataset.
+        @type buckets: int
+        @param throughput: Multiply-accumulates per second of a core, for the cold-start prior.
+        @type throughput: float
+        """
+        self._buckets = buckets
+        dimensions = self.DENSE_FEATURES + buckets
+        self._prior = np.zeros(dimensions)
+        self._prior[0] = math.log(3 * 1000 / throughput)
+        self._prior[1] = 1
+        self._gram = alpha * np.eye(dimensions)
+        self._moment = alpha * self._prior
+        self._weights = self._prior.copy()
+        self._stale = False
+
+    def predict(self, features: Sequence[JobFeatures]) -> np.ndarray:
+        if self._stale:
+            self._weights = scipy.linalg.solve(self._gram, self._moment, assume_a='pos')
+            self._stale = False
+        return np.exp(self.design(features) @ self._weights)
+
+    def update(self, key: Hashable, features: JobFeatures, length: float) -> None:
+        x = self.design([features])[0]
+        self._gram += np.outer(x, x)
+        self._moment += x * math.log(max(length, 1))
+        self._stale = True
+
+    def fit(self, records: np.ndarray, lengths: np.ndarray) -> None:
+        # The design matrix is built in chunks, to bound its memory for large histories.
+        for start in range(0, len(records), self.FIT_CHUNK):
+            matrix = self.design_records(records[start:start + self.FIT_CHUNK])
+            self._gram += matrix.T @ matrix
+            self._moment += matrix.T @ np.log(np.maximum(lengths[start:start + self.FIT_CHUNK], 1))
+            self._stale = True
+
+    def design(self, features: Sequence[JobFeatures]) -> np.ndarray:
+        """
+        Function to compute the design matrix of a batch of jobs.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @return: Matrix with a row of DENSE_FEATURES + buckets columns per job.
+        @rtype: np.ndarray
+        """
+        return self.design_records(JobFeatures.to_records(features))
+
+    def design_records(self, records: np.ndarray) -> np.ndarray:
+        """
+        Function to compute the design matrix of jobs in the columnar representation of FEATURE_DTYPE.
+        """
+        rows = np.arange(len(records))
+        networks, network_index = _factorize(records['network'])
+        datasets, dataset_index = _factorize(records['dataset'])
+        macs = np.array([NETWORK_MACS.get(network.decode(), DEFAULT_MACS) for network in networks])[network_index]
+        sizes = np.array([DATASET_SIZES.get(dataset.decode(), DEFAULT_DATASET_SIZE)
+                          for dataset in datasets])[dataset_index]
+        cores = records['millicores'] / 1000
+        # Static cost of the job: the multiply-accumulates of the forward passes of all epochs, per core.
+        work = records['epochs'] * sizes * macs / np.maximum(records['parallelism'] * cores, 1e-3)
+        matrix = np.zeros((len(records), self.DENSE_FEATURES + self._buckets))
+        matrix[:, 0] = 1
+        matrix[:, 1:self.DENSE_FEATURES] = np.log(np.maximum(np.column_stack([
+            work, records['epochs'], records['batch_size'], records['parallelism'], cores,
+            records['memory'] / 2 ** 30, macs, sizes]), 1e-6))
+        network_tokens = [f'network={network.decode()}' for network in networks]
+        dataset_tokens = [f'dataset={dataset.decode()}' for dataset in datasets]
+        pair_tokens = [[f'{network},{dataset}' for dataset in dataset_tokens] for network in network_tokens]
+        for columns, signs in (self.__hash(network_tokens, network_index), self.__hash(dataset_tokens, dataset_index),
+                               self.__hash(sum(pair_tokens, []), network_index * len(datasets) + dataset_index)):
+            matrix[rows, self.DENSE_FEATURES + columns] += signs
+        return matrix
+
+    def __hash(self, tokens: List[str], index: np.ndarray):
+        digests = np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.int64)
+        return (digests % self._buckets)[index], np.where(digests & 2 ** 31, 1.0, -1.0)[index]
+
+
+def _factorize(column: np.ndarray) -> Tuple[List, np.ndarray]:
+    """
+    Function to get the distinct values of a (fixed-width bytes) column and the index of the value of each row, like
+    `np.unique(column, return_inverse=True)` but by sorting a 64-bit hash of the values instead of the values.
+    """
+    words = np.ascontiguousarray(column).view(np.uint64).reshape(len(column), -1)
+    keys = (words * _HASH_MULTIPLIERS[:words.shape[1]]).sum(axis=1)
+    _, first, index = np.unique(keys, return_index=True, return_inverse=True)
+    return column[first].tolist(), index
+
+
+# Predictor backends, selected by `experiment.predictor` in the configuration.
+BACKENDS = {
+    'knn': NearestNeighbourBackend,
+    'ridge': RidgeBackend,
+}
+
+
+def create_backend(name: str) -> PredictorBackend:
+    """
+    Function to create a predictor backend by name, see BACKENDS.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown predictor backend: {name}, expected one of {list(BACKENDS)}')
+    return BACKENDS[name]()
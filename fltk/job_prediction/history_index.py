@@ -0,0 +1,186 @@
+from typing import Dict, Hashable, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class HistoryIndex:
+    """
+    Nearest-neighbour index over the feature vectors of completed jobs and their measured lengths. The vectors are
+    stored in a contiguous, growable matrix of log-normalised features, i.e. the Manhattan distance between two rows
+    approximates the sum of the relative differences of their features, independent of the magnitude of a feature.
+
+    Small histories are searched by brute force on the matrix. Above `tree_threshold` rows a KD-tree is built, and rows
+    that were appended after the last build are searched by brute force until the tree is rebuilt (once they exceed
+    `rebuild_fraction` of the indexed rows), such that appends stay amortized O(1).
+    """
+
+    TREE_THRESHOLD = 512
+    REBUILD_FRACTION = 0.125
+    # Maximum number of elements of the difference array of a brute-force search.
+    BRUTE_FORCE_ELEMENTS = 2 ** 18
+
+    def __init__(self, dimensions: int, k: int = 5, tree_threshold: int = TREE_THRESHOLD,
+                 rebuild_fraction: float = REBUILD_FRACTION, capacity: int = 1024):
+        """
+        @param dimensions: Number of features of a vector.
+        @type dimensions: int
+        @param k: Number of neighbours that are averaged by `predict`.
+        @type k: int
+        @param tree_threshold: Number of rows from which a KD-tree is used instead of brute force.
+        @type tree_threshold: int
+        @param rebuild_fraction: Fraction of unindexed rows (relative to the indexed rows) at which the tree is rebuilt.
+        @type rebuild_fraction: float
+        @param capacity: Initial number of rows of the matrix, it grows by doubling.
+        @type capacity: int
+        """
+        self.k = k
+        self._tree_threshold = tree_threshold
+        self._rebuild_fraction = rebuild_fraction
+        self._features = np.empty((capacity, dimensions), dtype=np.float64)
+        self._lengths = np.empty(capacity, dtype=np.float64)
+        self._rows: Dict[Hashable, int] = dict()
+        self._size = 0
+        self._tree: cKDTree = None
+        # Number of rows (from the start of the matrix) that are indexed by the tree.
+        self._indexed = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def normalise(vectors) -> np.ndarray:
+        """
+        Function to map raw feature vectors to the space of the index.
+        @param vectors: Vector or matrix of (non-negative) features.
+        @type vectors: array_like
+        @return: Log-normalised features.
+        @rtype: np.ndarray
+        """
+        return np.log1p(np.asarray(vectors, dtype=np.float64))
+
+    def append(self, key: Hashable, vector: Sequence[float], length: float) -> None:
+        """
+        Function to add the measured length of a job, O(1) amortized. A key that is already in the index replaces its
+        earlier measurement.
+        @param key: Identifier of the job.
+        @type key: Hashable
+        @param vector: Raw feature vector of the job.
+        @type vector: Sequence[float]
+        @param length: Measured length of the job.
+        @type length: float
+        @return: None
+        @rtype: None
+        """
+        row = self._rows.get(key)
+        if row is None:
+            if self._size == len(self._lengths):
+                self.__grow()
+            row = self._rows[key] = self._size
+            self._size += 1
+        elif row < self._indexed:
+            # The tree holds the old features of the row.
+            self._tree, self._indexed = None, 0
+        self._features[row] = self.normalise(vector)
+        self._lengths[row] = length
+
+    def extend(self, vectors, lengths, keys: Sequence[Hashable] = None) -> None:
+        """
+        Function to add the measured lengths of a batch of jobs, e.g. to warm start the index from a stored history.
+        @param vectors: Raw feature vectors, one per row.
+        @type vectors: array_like
+        @param lengths: Measured lengths.
+        @type lengths: array_like
+        @param keys: Identifiers of the jobs, without keys the jobs cannot be replaced by a later `append`.
+        @type keys: Sequence[Hashable]
+        @return: None
+        @rtype: None
+        """
+        if keys is not None:
+            for key, vector, length in zip(keys, vectors, lengths):
+                self.append(key, vector, length)
+            return
+        count = len(lengths)
+        if self._size + count > len(self._lengths):
+            self.__grow(self._size + count)
+        self._features[self._size:self._size + count] = self.normalise(vectors).reshape(count, -1)
+        self._lengths[self._size:self._size + count] = lengths
+        self._size += count
+
+    def query(self, vectors, k: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Function to find the nearest neighbours of a batch of vectors.
+        @param vectors: Raw feature vectors, one per row.
+        @type vectors: array_like
+        @param k: Number of neighbours, by default the `k` of the index. Fewer are returned if the history is smaller.
+        @type k: int
+        @return: Tuple of the distances and the lengths of the neighbours, both of shape (vectors, k), nearest first.
+        @rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        if not self._size:
+            raise ValueError('Cannot query an empty history')
+        points = np.atleast_2d(self.normalise(vectors))
+        k = min(k or self.k, self._size)
+        self.__maybe_rebuild()
+        distances, rows = self.__brute_force(points, self._indexed, self._size, k)
+        if self._tree is not None:
+            tree_k = min(k, self._indexed)
+            tree_distances, tree_rows = self._tree.query(points, k=tree_k, p=1)
+            tree_distances = tree_distances.reshape(len(points), tree_k)
+            tree_rows = tree_rows.reshape(len(points), tree_k)
+            distances = np.concatenate([tree_distances, distances], axis=1)
+            rows = np.concatenate([tree_rows, rows], axis=1)
+            order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            rows = np.take_along_axis(rows, order, axis=1)
+        return distances, self._lengths[rows]
+
+    def predict(self, vectors, k: int = None) -> np.ndarray:
+        """
+        Function to predict the lengths of a batch of vectors as the inverse-distance weighted average of the lengths
+        of their nearest neighbours. Exact matches take precedence, i.e. their lengths are averaged.
+        @param vectors: Raw feature vectors, one per row.
+        @type vectors: array_like
+        @param k: Number of neighbours, by default the `k` of the index.
+        @type k: int
+        @return: Predicted lengths.
+        @rtype: np.ndarray
+        """
+        distances, lengths = self.query(vectors, k)
+        exact = distances == 0
+        with np.errstate(divide='ignore'):
+            weights = np.where(exact.any(axis=1, keepdims=True), exact, 1 / distances)
+        return (weights * lengths).sum(axis=1) / weights.sum(axis=1)
+
+    def __brute_force(self, points: np.ndarray, start: int, stop: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, stop - start)
+        if k <= 0:
+            return np.empty((len(points), 0)), np.empty((len(points), 0), dtype=np.intp)
+        # Batches of points are compared in chunks, to bound the size of the intermediate difference array.
+        chunk = max(1, self.BRUTE_FORCE_ELEMENTS // ((stop - start) * points.shape[1]))
+        if len(points) > chunk:
+            results = [self.__brute_force(points[i:i + chunk], start, stop, k) for i in range(0, len(points), chunk)]
+            return np.concatenate([d for d, _ in results]), np.concatenate([r for _, r in results])
+        distances = np.abs(points[:, None, :] - self._features[None, start:stop]).sum(axis=2)
+        if k < stop - start:
+            rows = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.broadcast_to(np.arange(stop - start), distances.shape)
+        distances = np.take_along_axis(distances, rows, axis=1)
+        order = np.argsort(distances, axis=1, kind='stable')
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(rows, order, axis=1) + start
+
+    def __maybe_rebuild(self) -> None:
+        if self._size < self._tree_threshold:
+            return
+        if self._tree is None or self._size - self._indexed > self._rebuild_fraction * self._indexed:
+            self._tree = cKDTree(self._features[:self._size])
+            self._indexed = self._size
+
+    def __grow(self, minimum: int = 0) -> None:
+        capacity = max(2 * len(self._lengths), minimum)
+        features = np.empty((capacity, self._features.shape[1]), dtype=np.float64)
+        features[:self._size] = self._features[:self._size]
+        lengths = np.empty(capacity, dtype=np.float64)
+        lengths[:self._size] = self._lengths[:self._size]
+        self._features, self._lengths = features, lengths
@@ -0,0 +1,175 @@
+import fcntl
+import logging
+import os
+import struct
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from fltk.job_prediction.backends import FEATURE_DTYPE, JobFeatures
+
+# Record of the store: the features of a completed job, its measured length (ms) and the (unix) time of completion.
+RECORD_DTYPE = np.dtype(FEATURE_DTYPE.descr + [('length', '<f8'), ('timestamp', '<f8')])
+
+
+class HistoryStore:
+    """
+    On-disk history of measured job lengths, shared by experiments (and concurrent orchestrators or sweep cells) to warm
+    start their JobWorkloadPredictor.
+
+    The store consists of three files next to `path`:
+        * `<path>.npy`: compacted records, memory-mapped when loading.
+        * `<path>.log`: append-only log of fixed-size binary records since the last compaction.
+        * `<path>.lock`: lock file, appends and compactions hold an exclusive lock and loads a shared lock.
+
+    The log is compacted into the `.npy` file once it holds `compact_every` records. Compaction applies the eviction
+    policy, i.e. records older than `max_age` seconds are dropped, and only the newest `max_records` are kept. Loads
+    apply the same policy, so evicted records are never returned. The `.npy` file is replaced atomically, such that
+    readers that still map the previous version are not affected.
+    """
+
+    MAGIC = b'FLTKHST1'
+    HEADER = struct.Struct('<8sI')
+
+    def __init__(self, path: Path, max_age: float = None, max_records: int = None, compact_every: int = 1000):
+        """
+        @param path: Path of the store, without suffix.
+        @type path: Path
+        @param max_age: Maximum age of a record in seconds, by default records do not expire.
+        @type max_age: float
+        @param max_records: Maximum number of (newest) records that are kept, by default unbounded.
+        @type max_records: int
+        @param compact_every: Number of records in the log after which it is compacted.
+        @type compact_every: int
+        """
+        self.__logger = logging.getLogger('HistoryStore')
+        path = Path(path)
+        self._data_path = path.with_name(path.name + '.npy')
+        self._log_path = path.with_name(path.name + '.log')
+        self._lock_path = path.with_name(path.name + '.lock')
+        self.max_age = max_age
+        self.max_records = max_records
+        self.compact_every = compact_every
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def append(self, features: JobFeatures, length: float, timestamp: float = None) -> None:
+        """
+        Function to append the measured length of a job to the log, and compact the log once it is full.
+        @param features: Features of the job.
+        @type features: JobFeatures
+        @param length: Measured length in milliseconds.
+        @type length: float
+        @param timestamp: Time of completion, by default the current (unix) time.
+        @type timestamp: float
+        @return: None
+        @rtype: None
+        """
+        self.extend([features], [length], [time.time() if timestamp is None else timestamp])
+
+    def extend(self, features: Sequence[JobFeatures], lengths: Sequence[float], timestamps: Sequence[float]) -> None:
+        """
+        Function to append the measured lengths of a batch of jobs to the log under a single lock, and compact the log
+        once it is full.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @param lengths: Measured lengths in milliseconds.
+        @type lengths: Sequence[float]
+        @param timestamps: (Unix) times of completion.
+        @type timestamps: Sequence[float]
+        @return: None
+        @rtype: None
+        """
+        if not len(features):
+            return
+        records = np.zeros(len(features), dtype=RECORD_DTYPE)
+        features_records = JobFeatures.to_records(features)
+        for name in FEATURE_DTYPE.names:
+            records[name] = features_records[name]
+        records['length'] = lengths
+        records['timestamp'] = timestamps
+        with self.__lock(fcntl.LOCK_EX):
+            with open(self._log_path, 'ab') as f:
+                if f.tell() == 0:
+                    f.write(self.HEADER.pack(self.MAGIC, RECORD_DTYPE.itemsize))
+                elif (f.tell() - self.HEADER.size) % RECORD_DTYPE.itemsize:
+                    # Drop the partial record of an interrupted append, to keep the records aligned.
+                    f.truncate(f.tell() - (f.tell() - self.HEADER.size) % RECORD_DTYPE.itemsize)
+                f.write(records.tobytes())
+                count = (f.tell() - self.HEADER.size) // RECORD_DTYPE.itemsize
+            if count >= self.compact_every:
+                self.__compact()
+
+    def load(self, now: float = None) -> np.ndarray:
+        """
+        Function to read the records of the store, without the evicted records.
+        @param now: Current (unix) time for age-based eviction, by default the current time.
+        @type now: float
+        @return: Array of RECORD_DTYPE, oldest record first.
+        @rtype: np.ndarray
+        """
+        with self.__lock(fcntl.LOCK_SH):
+            return self.__evict(self.__read(mmap=True), now)
+
+    def compact(self) -> None:
+        """
+        Function to merge the log into the compacted records, and apply the eviction policy.
+        @return: None
+        @rtype: None
+        """
+        with self.__lock(fcntl.LOCK_EX):
+            self.__compact()
+
+    def __compact(self) -> None:
+        records = self.__evict(self.__read(mmap=False), None)
+        temporary = self._data_path.with_name(f'.{self._data_path.name}.tmp')
+        with open(temporary, 'wb') as f:
+            np.save(f, records)
+        os.replace(temporary, self._data_path)
+        with open(self._log_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, RECORD_DTYPE.itemsize))
+        self.__logger.info(f'Compacted history to {len(records)} records')
+
+    def __read(self, mmap: bool) -> np.ndarray:
+        parts = []
+        if self._data_path.exists():
+            parts.append(np.load(self._data_path, mmap_mode='r' if mmap else None))
+        log = self.__read_log()
+        if log is not None and len(log):
+            parts.append(log)
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def __read_log(self) -> Optional[np.ndarray]:
+        if not self._log_path.exists():
+            return None
+        with open(self._log_path, 'rb') as f:
+            header = f.read(self.HEADER.size)
+            if not header:
+                return None
+            magic, itemsize = self.HEADER.unpack(header)
+            if magic != self.MAGIC or itemsize != RECORD_DTYPE.itemsize:
+                raise ValueError(f'Incompatible history log: {self._log_path}')
+            # A trailing partial record (of an interrupted append) is ignored.
+            return np.fromfile(f, dtype=RECORD_DTYPE, count=(os.fstat(f.fileno()).st_size - self.HEADER.size)
+                               // RECORD_DTYPE.itemsize)
+
+    def __evict(self, records: np.ndarray, now: Optional[float]) -> np.ndarray:
+        if self.max_age is not None:
+            now = time.time() if now is None else now
+            records = records[records['timestamp'] >= now - self.max_age]
+        if self.max_records is not None and len(records) > self.max_records:
+            records = records[len(records) - self.max_records:]
+        return records
+
+    @contextmanager
+    def __lock(self, operation: int):
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
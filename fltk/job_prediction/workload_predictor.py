@@ -1,155 +1,233 @@
-import uuid
-
-from fltk.util.task.config.parameter import SystemParameters, HyperParameters
+import logging
+import math
+import statistics
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fltk.job_prediction.backends import FEATURE_DTYPE, JobFeatures, PredictorBackend, create_backend
+from fltk.job_prediction.history_store import HistoryStore
+from fltk.util.progress import ProgressReport
 from fltk.util.task.generator.arrival_generator import Arrival
 from fltk.util.task.task import ArrivalTask
-import re
 
 
 class JobWorkloadPredictor:
-    def __init__(self):
-        self.history = dict()
+    # Weight of the predicted length when refining the remaining time of a running job, in number of measured epochs.
+    PRIOR_EPOCHS = 1
+    # Quantiles of the length that are predicted for every task, see `predict_quantiles`.
+    QUANTILES = (0.5, 0.9, 0.99)
+    # Number of most recent completed jobs of which the prediction errors calibrate the quantiles.
+    CALIBRATION_WINDOW = 1000
+    # Number of completed jobs from which the measured errors replace the prior.
+    MIN_CALIBRATION = 20
+    # Standard deviation of the logarithm of the ratio of measured and predicted length that is assumed before then.
+    PRIOR_SIGMA = 0.5
+    # Number of measured lengths that are buffered before they are written to the store in a single append.
+    FLUSH_EVERY = 100
+
+    def __init__(self, backend: PredictorBackend = None, store: HistoryStore = None, record: bool = True):
+        """
+        @param backend: Model of the job lengths, by default a nearest-neighbour model (see `backends.BACKENDS`).
+        @type backend: PredictorBackend
+        @param store: Persistent history to warm start the backend from, and to record the measured lengths in.
+        @type store: HistoryStore
+        @param record: Whether the measured lengths are recorded in the store, e.g. not for simulated lengths.
+        @type record: bool
+        """
+        self.__logger = logging.getLogger('JobWorkloadPredictor')
+        self.backend = backend or create_backend('knn')
+        self.store = store
+        self.record = record
+        # Measured lengths (features, length, unix time of completion) that are not written to the store yet.
+        self._unwritten: List[Tuple[JobFeatures, float, float]] = []
+        self.observations = 0
+        # Number of measured lengths of earlier experiments that the backend was trained on.
+        self.warm_records = 0
+        # Sum of the absolute percentage errors of the predictions of the completed tasks.
+        self._absolute_errors = 0.0
+        # Logarithms of the ratio of measured and predicted length of the most recent completed tasks.
+        self._residuals: Deque[float] = deque(maxlen=self.CALIBRATION_WINDOW)
+        self._offsets: Optional[np.ndarray] = None
+        # Number of completed tasks with predicted quantiles, and how many of them completed within each quantile.
+        self._calibrated = 0
+        self._covered = np.zeros(len(self.QUANTILES), dtype=np.int64)
+        if store is not None:
+            self.warm_start(store)
+
+    @property
+    def trained(self) -> bool:
+        return self.observations + self.warm_records > 0
+
+    def warm_start(self, store: HistoryStore) -> None:
+        """
+        Function to train the backend on the (non-evicted) records of a history store.
+        @param store: History of earlier experiments.
+        @type store: HistoryStore
+        @return: None
+        @rtype: None
+        """
+        start = time.perf_counter()
+        records = store.load()
+        if len(records):
+            self.backend.fit(records[list(FEATURE_DTYPE.names)], records['length'])
+        self.warm_records += len(records)
+        self.__logger.info(f'Warm started from {len(records)} records in {time.perf_counter() - start:.3f} seconds')
+
+    @property
+    def mape(self) -> float:
+        """
+        Mean absolute percentage error of the predicted lengths of the tasks that completed so far, NaN if none did.
+        """
+        return 100 * self._absolute_errors / self.observations if self.observations else math.nan
+
+    @property
+    def coverage(self) -> Dict[float, float]:
+        """
+        Fraction of the completed tasks that completed within their predicted quantiles, NaN if none did.
+        """
+        return {quantile: covered / self._calibrated if self._calibrated else math.nan
+                for quantile, covered in zip(self.QUANTILES, self._covered)}
 
     def predict_length(self, task: Arrival):
-        task_vector = self.get_task_vector(task)
-
-        if len(self.history.keys()) == 0:
-            # this is basically a random guess based on the task vector
-            return (task_vector[0] * task_vector[1]) / (task_vector[3])
-        else:
-            closest = None
-            min_dist = 0
-            for other_vec_id, (other_vec, time) in self.history.items():
-                # pretty stupid algorithm which just searches for the closest vector using a distance metric
-                dist = self.calc_vector_distance(task_vector, other_vec)
-                if closest == None or min_dist < dist:
-                    closest = other_vec_id
-                    min_dist = dist
-
-            return self.history[closest][1]
-
-
-    def calc_vector_distance(self, vec_a, vec_b):
-        # manhattan or euclidean distance would not work since the difference in magnitude between 2 vector dimensions would mess with the results
-        # cosine distance would not work since we care about the magnitude of the vectors
-
-        # so instead we use manhattan distance but we devide the difference by the largest one
-        sum = 0
-        for x_a, x_b in zip(vec_a, vec_b):
-            sum += abs(x_a - x_b) / max(x_a, x_b)
-
-        return sum
+        return self.predict_lengths([task])[0]
+
+    def predict_distribution(self, task: Arrival) -> Tuple[int, Dict[float, int]]:
+        """
+        Function to predict the length of a task, together with the quantiles of its length.
+        @param task: Arrival to predict.
+        @type task: Arrival
+        @return: Tuple of the predicted length and the predicted length per quantile of QUANTILES, in milliseconds.
+        @rtype: Tuple[int, Dict[float, int]]
+        """
+        points, quantiles = self.predict_quantiles([self.get_features(task)])
+        return int(round(points[0])), {quantile: int(round(length))
+                                       for quantile, length in zip(self.QUANTILES, quantiles[0])}
+
+    def predict_lengths(self, tasks: Sequence[Arrival]) -> List[int]:
+        """
+        Function to predict the length of a batch of tasks with a single lookup in the backend.
+        @param tasks: Arrivals to predict.
+        @type tasks: Sequence[Arrival]
+        @return: Predicted length per arrival.
+        @rtype: List[int]
+        """
+        return [int(round(prediction)) for prediction in self.predict_features([self.get_features(task)
+                                                                                for task in tasks])]
+
+    def predict_features(self, features: Sequence[JobFeatures]) -> np.ndarray:
+        """
+        Function to predict the length of a batch of jobs by their features.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @return: Predicted lengths in milliseconds.
+        @rtype: np.ndarray
+        """
+        return self.backend.predict(features)
+
+    def predict_quantiles(self, features: Sequence[JobFeatures]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Function to predict the length of a batch of jobs by their features, together with the quantiles of their
+        length. The quantiles scale the prediction of the backend by the empirical quantiles of the ratio of measured
+        and predicted length of the most recent completed jobs (split conformal prediction), such that they are
+        calibrated for any backend. Until MIN_CALIBRATION jobs completed, the ratio is assumed log-normal.
+        @param features: Features of the jobs.
+        @type features: Sequence[JobFeatures]
+        @return: Tuple of the predicted lengths, and the predicted lengths per quantile of QUANTILES (one row per job),
+        in milliseconds.
+        @rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        points = self.predict_features(features)
+        return points, points[:, None] * np.exp(self.__offsets())[None, :]
+
+    def __offsets(self) -> np.ndarray:
+        if self._offsets is None:
+            count = len(self._residuals)
+            if count < self.MIN_CALIBRATION:
+                self._offsets = np.array([statistics.NormalDist(0, self.PRIOR_SIGMA).inv_cdf(quantile)
+                                          for quantile in self.QUANTILES])
+            else:
+                # The ceil((n + 1) * q)-th smallest of n residuals covers a new job with probability at least q.
+                ranks = np.minimum(np.ceil((count + 1) * np.asarray(self.QUANTILES)).astype(int), count)
+                self._offsets = np.sort(np.fromiter(self._residuals, dtype=np.float64, count=count))[ranks - 1]
+        return self._offsets
+
+    def predict_remaining(self, task: ArrivalTask, report: ProgressReport) -> float:
+        """
+        Function to refine the remaining time of a running task with its measured progress. The duration of the
+        remaining epochs is the average of the measured epoch durations, shrunk towards the epoch duration of the
+        predicted length (which weighs as PRIOR_EPOCHS measured epochs), such that a single slow epoch (e.g. while the
+        data is downloaded) does not dominate the estimate.
+        @param task: Task of the job.
+        @type task: ArrivalTask
+        @param report: Latest progress of the job.
+        @type report: ProgressReport
+        @return: Remaining time in milliseconds after the report.
+        @rtype: float
+        """
+        epochs = max(report.epochs, 1)
+        remaining_epochs = max(epochs - report.epoch, 0)
+        if not remaining_epochs:
+            return 0.0
+        prior = task.predicted_length / epochs
+        epoch_duration = (report.elapsed + self.PRIOR_EPOCHS * prior) / (report.epoch + self.PRIOR_EPOCHS)
+        return remaining_epochs * epoch_duration
 
     def feedback(self, task: ArrivalTask, actual_length: int):
-        task_vector = self.get_task_vector_from_arrival_task(task)
-
-        self.history[task.id] = (task_vector, actual_length)
-
-    def get_task_vector_from_arrival_task(self, task: ArrivalTask):
-        return [
-            int(task.param_conf.max_epoch),
-            int(task.param_conf.bs),
-            int(task.sys_conf.data_parallelism),
-            self.cores_to_number(task.sys_conf.executor_cores),
-            self.memory_to_number(task.sys_conf.executor_memory)
-        ]
-
-    def get_task_vector(self, task: Arrival):
-        return [
-            int(task.get_parameter_config().max_epoch),
-            int(task.get_parameter_config().bs),
-            int(task.get_system_config().data_parallelism),
-            self.cores_to_number(task.get_system_config().executor_cores),
-            self.memory_to_number(task.get_system_config().executor_memory)
-        ]
-
-    def cores_to_number(self, cores):
-        r = re.compile("([0-9]+)([a-zA-Z]+)")
-        m = r.match(cores)
-        # TODO assumes that we always use "XXXXm"
-        return int(m.group(1))
-
-
-    def memory_to_number(self, memory):
-        r = re.compile("([0-9]+)([a-zA-Z]+)")
-        m = r.match(memory)
-
-        multiplier = 1
-        if m.group(2) == 'Ki':
-            multiplier = 1000
-        elif m.group(2) == 'Mi':
-            multiplier = 1000000
-        elif m.group(2) == 'Gi':
-            multiplier = 1000000000
-
-        return int(m.group(1)) * multiplier
-
-
-
-
-if __name__ == "__main__":
-    # test the predictor
-    predictor = JobWorkloadPredictor()
-
-    tasks = [
-        ArrivalTask(priority=1,
-                    id=uuid.uuid4(),
-                    network="",
-                    dataset="",
-                    sys_conf=SystemParameters(
-                        data_parallelism=2,
-                        executor_cores=2,
-                        executor_memory="2Gi",
-                        action=""
-                    ),
-                   param_conf=HyperParameters(
-                       bs=128,
-                       max_epoch=5,
-                       lr="0.05",
-                       lr_decay="0.001"
-                   )),
-        ArrivalTask(priority=1,
-                    id=uuid.uuid4(),
-                    network="",
-                    dataset="",
-                    sys_conf=SystemParameters(
-                        data_parallelism=2,
-                        executor_cores=2,
-                        executor_memory="2Gi",
-                        action=""
-                    ),
-                    param_conf=HyperParameters(
-                        bs=256,
-                        max_epoch=3,
-                        lr="0.05",
-                        lr_decay="0.001"
-                    )),
-        ArrivalTask(priority=1,
-                    id=uuid.uuid4(),
-                    network="",
-                    dataset="",
-                    sys_conf=SystemParameters(
-                        data_parallelism=2,
-                        executor_cores=5,
-                        executor_memory="3Gi",
-                        action=""
-                    ),
-                    param_conf=HyperParameters(
-                        bs=128,
-                        max_epoch=7,
-                        lr="0.05",
-                        lr_decay="0.001"
-                    ))
-    ]
-
-    print(predictor.predict_length(tasks[0]))
-    predictor.feedback(tasks[0], 10)
-    assert predictor.predict_length(tasks[0]) == 10
-
-    assert predictor.predict_length(tasks[1]) == 10
-    predictor.feedback(tasks[1], 100)
-
-    assert predictor.predict_length(tasks[2]) == 100
-    predictor.feedback(tasks[2], 1000)
-
-
+        features = self.get_features_from_arrival_task(task)
+        self.observe(task.id, features, actual_length, task.predicted_length, task.predicted_quantiles)
+        if self.store is not None and self.record:
+            # The lengths are appended in batches, such that the scheduling loop does not lock the store per job.
+            self._unwritten.append((features, actual_length, time.time()))
+            if len(self._unwritten) >= self.FLUSH_EVERY:
+                self.flush()
+        self.__logger.debug(f'Predicted {task.predicted_length} for {task.id}, measured {actual_length}, '
+                            f'MAPE {self.mape:.1f}%')
+
+    def flush(self) -> None:
+        """
+        Function to write the buffered measured lengths to the store.
+        @return: None
+        @rtype: None
+        """
+        if not self._unwritten:
+            return
+        features, lengths, timestamps = zip(*self._unwritten)
+        self.store.extend(features, lengths, timestamps)
+        self._unwritten.clear()
+
+    def observe(self, key: Hashable, features: JobFeatures, actual_length: float, predicted_length: float,
+                predicted_quantiles: Dict[float, int] = None) -> None:
+        """
+        Function to account the measured length of a completed job, i.e. its prediction errors and the training of the
+        backend. Unlike `feedback`, the measurement is not recorded in the store.
+        @param key: Identifier of the job.
+        @type key: Hashable
+        @param features: Features of the job.
+        @type features: JobFeatures
+        @param actual_length: Measured length in milliseconds.
+        @type actual_length: float
+        @param predicted_length: Length that was predicted at the arrival of the job.
+        @type predicted_length: float
+        @param predicted_quantiles: Quantiles of the length that were predicted at the arrival of the job.
+        @type predicted_quantiles: Dict[float, int]
+        @return: None
+        @rtype: None
+        """
+        self.observations += 1
+        self._absolute_errors += abs(predicted_length - actual_length) / max(actual_length, 1)
+        self._residuals.append(math.log(max(actual_length, 1) / max(predicted_length, 1)))
+        self._offsets = None
+        if predicted_quantiles:
+            self._calibrated += 1
+            self._covered += [actual_length <= predicted_quantiles[quantile] for quantile in self.QUANTILES]
+        self.backend.update(key, features, actual_length)
+
+    def get_features(self, task: Arrival) -> JobFeatures:
+        return JobFeatures.from_parameters(task.get_network(), task.get_dataset(), task.get_system_config(),
+                                           task.get_parameter_config())
+
+    def get_features_from_arrival_task(self, task: ArrivalTask) -> JobFeatures:
+        return JobFeatures.from_parameters(task.network, task.dataset, task.sys_conf, task.param_conf)
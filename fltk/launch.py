@@ -1,19 +1,20 @@
+import csv
 import logging
 import os
 from argparse import Namespace
 from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-import torch.distributed as dist
-from kubernetes import config
-
-from fltk.client import Client
-from fltk.extractor import download_datasets
-from fltk.orchestrator import Orchestrator
-from fltk.util.cluster.client import ClusterManager
+from fltk.util.cluster.backend import ClusterBackend
 from fltk.util.config.arguments import LearningParameters
-from fltk.util.config.base_config import BareConfig
-from fltk.util.task.generator.arrival_generator import ExperimentGenerator
-from fltk.util.task.generator.multi_group_arrival_generator import MultiGroupArrivalGenerator
+from fltk.util.config.base_config import BareConfig, HistoryConfig
+
+if TYPE_CHECKING:
+    from fltk.util.cluster.client import ClusterManager
+
+# The dependencies of a mode are imported by its launch function, such that e.g. a client (the replica of every
+# training job) imports torch and the net and dataset it trains, but not the Orchestrator, Kubernetes or Dropbox.
 
 
 def should_distribute() -> bool:
@@ -25,6 +26,8 @@ def should_distribute() -> bool:
     @return: Indicator for distributed execution.
     @rtype: bool
     """
+    import torch.distributed as dist
+
     world_size = int(os.environ.get('WORLD_SIZE', 1))
     return dist.is_available() and world_size > 1
 
@@ -41,6 +44,12 @@ def launch_client(task_id: str, config: BareConfig = None, learning_params: Lear
     @return: None
     @rtype: None
     """
+    import torch.distributed as dist
+    from fltk.client import Client
+    from fltk.util.cpu import configure_threads
+    from fltk.util.progress import ProgressReporter
+
+    configure_threads()
     logging.info(f'Starting with host={os.environ["MASTER_ADDR"]} and port={os.environ["MASTER_PORT"]}')
     rank, world_size, backend = 0, None, None
     distributed = should_distribute()
@@ -52,10 +61,32 @@ def launch_client(task_id: str, config: BareConfig = None, learning_params: Lear
     logging.info(f'Starting Creating client with {rank}')
     client = Client(rank, task_id, world_size, config, learning_params)
     client.prepare_learner(distributed)
-    epoch_data = client.run_epochs()
+    reporter = ProgressReporter.from_environment()
+    try:
+        epoch_data = client.run_epochs(reporter)
+    finally:
+        if reporter is not None:
+            reporter.close()
     print(epoch_data)
 
 
+def launch_worker(args: Namespace, conf: BareConfig):
+    """
+    Worker launch function, runs the tasks of the WorkerPool of an Orchestrator until the pool stops.
+    @param args: Arguments passed from CLI.
+    @type args: Namespace
+    @param conf: Parsed configuration file passed from the CLI, shared with the Orchestrator.
+    @type conf: BareConfig
+    @return: None
+    @rtype: None
+    """
+    from fltk.util.progress import parse_address
+    from fltk.worker import Worker
+
+    worker = Worker(conf, parse_address(args.connect), args.name, args.datasets)
+    worker.run()
+
+
 def launch_orchestrator(args: Namespace = None, conf: BareConfig = None):
     """
     Default runner for the Orchestrator that is based on KubeFlow
@@ -67,7 +98,17 @@ def launch_orchestrator(args: Namespace = None, conf: BareConfig = None):
     @return: None
     @rtype: None
     """
+    from kubernetes import config
+    from fltk.orchestrator import Orchestrator
+    from fltk.util.cluster.client import ClusterManager
+    from fltk.util.task.generator.multi_group_arrival_generator import MultiGroupArrivalGenerator
+
     logging.info('Starting as Orchestrator')
+    if args.backend:
+        conf.cluster_config.backend = args.backend
+    if conf.cluster_config.backend != 'kubeflow':
+        launch_local_orchestrator(conf)
+        return
     logging.info("Starting Orchestrator, initializing resources....")
     if args.local:
         logging.info("Loading local configuration file")
@@ -100,6 +141,55 @@ def launch_orchestrator(args: Namespace = None, conf: BareConfig = None):
     logging.info("Stopped execution of Orchestrator...")
 
 
+def launch_local_orchestrator(conf: BareConfig):
+    """
+    Runner for the Orchestrator with a backend that does not use the Kubernetes API, i.e. local processes or a pool of
+    warm workers, such that the whole stack runs on a single machine.
+    @param conf: Configuration for execution of Orchestrators components.
+    @type conf: BareConfig
+    @return: None
+    @rtype: None
+    """
+    from fltk.orchestrator import Orchestrator
+    from fltk.util.task.generator.multi_group_arrival_generator import MultiGroupArrivalGenerator
+
+    backend = create_cluster_backend(conf)
+    backend.start()
+
+    arrival_generator = MultiGroupArrivalGenerator(conf)
+    orchestrator = Orchestrator(None, arrival_generator, conf, backend=backend)
+
+    pool = ThreadPool(2)
+    logging.info("Starting arrival generator")
+    pool.apply_async(arrival_generator.start, args=[conf.get_duration()])
+    logging.info("Starting orchestrator")
+    pool.apply(orchestrator.run)
+    backend.stop()
+    logging.info("Stopped execution of Orchestrator...")
+
+
+def create_cluster_backend(conf: BareConfig, cluster_manager: 'ClusterManager' = None) -> ClusterBackend:
+    """
+    Function to create the backend of the configuration (`cluster.backend`) that runs the tasks.
+    @param conf: Configuration of the experiment.
+    @type conf: BareConfig
+    @param cluster_manager: Manager of the resources of the cluster, used by the kubeflow backend.
+    @type cluster_manager: ClusterManager
+    @return: Backend, that is not started yet.
+    @rtype: ClusterBackend
+    """
+    cluster = conf.cluster_config
+    if cluster.backend == 'local':
+        from fltk.util.cluster.local import LocalProcessBackend
+        return LocalProcessBackend(Path(cluster.local.log_dir) if cluster.local.log_dir else None,
+                                   Path(cluster.local.cgroup) if cluster.local.cgroup else None)
+    if cluster.backend == 'pool':
+        from fltk.util.cluster.worker_pool import WorkerPool
+        return WorkerPool(cluster.worker_pool, conf.config_path)
+    from fltk.util.cluster.kubeflow import KubeflowBackend
+    return KubeflowBackend(cluster_manager=cluster_manager, api_config=cluster.api)
+
+
 def launch_extractor(args: Namespace, conf: BareConfig):
     """
     Extractor launch function, will only download all models and quit execution.
@@ -110,4 +200,62 @@ def launch_extractor(args: Namespace, conf: BareConfig):
     @return: None
     @rtype: None
     """
+    from fltk.extractor import download_datasets
+
     download_datasets(args, conf)
+
+
+def launch_simulator(args: Namespace, conf: BareConfig):
+    """
+    Simulator launch function, replays the experiment of the configuration on a simulated clock, without a cluster,
+    and writes the statistics of every repetition.
+    @param args: Arguments passed from CLI.
+    @type args: Namespace
+    @param conf: Parsed configuration file passed from the CLI.
+    @type conf: BareConfig
+    @return: None
+    @rtype: None
+    """
+    from fltk.orchestrator import STATISTICS_HEADER
+    from fltk.simulator import LogNormalDurationModel, Simulator
+
+    if args.scheduler:
+        conf.experiment.scheduler = args.scheduler
+    if args.predictor:
+        conf.experiment.predictor = args.predictor
+    if args.planning_quantile is not None:
+        conf.experiment.planning_quantile = args.planning_quantile
+    if args.history:
+        conf.execution_config.history = HistoryConfig(args.history)
+    simulator = Simulator(conf, LogNormalDurationModel(args.epoch_median, args.epoch_sigma), args.node_cpu,
+                          args.node_memory)
+    results = simulator.run_repetitions(args.repetitions, args.seed)
+    with open(args.output, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(STATISTICS_HEADER)
+        writer.writerows(results)
+    for row in results:
+        logging.info(dict(zip(STATISTICS_HEADER, row)))
+    logging.info(f'Wrote statistics of {len(results)} simulated experiments to {args.output}')
+
+
+def launch_sweep(args: Namespace, conf: BareConfig):
+    """
+    Sweep launch function, simulates every experiment of a design table (times the number of repetitions) in a
+    process pool, and stores the statistics in a columnar result store.
+    @param args: Arguments passed from CLI.
+    @type args: Namespace
+    @param conf: Parsed configuration file passed from the CLI, shared by all experiments.
+    @type conf: BareConfig
+    @return: None
+    @rtype: None
+    """
+    from fltk.sweep import ResultStore, SweepRunner, cross_design, read_design
+
+    design = read_design(Path(args.design))
+    if args.schedulers:
+        design = cross_design(design, 'scheduler', args.schedulers)
+    store = ResultStore(Path(args.output))
+    runner = SweepRunner(conf, design, args.repetitions, store, args.seed, args.epoch_median, args.epoch_sigma)
+    runner.run(args.workers)
+    logging.info(f'Wrote statistics of {len(store)} simulated experiments to {args.output}')
@@ -1,6 +1,19 @@
-from .cifar_10_cnn import Cifar10CNN
-from .cifar_100_resnet import Cifar100ResNet
-from .fashion_mnist_cnn import FashionMNISTCNN
-from .fashion_mnist_resnet import FashionMNISTResNet
-from .cifar_10_resnet import Cifar10ResNet
-from .cifar_100_vgg import Cifar100VGG
\ No newline at end of file
+import importlib
+
+# The nets are imported on first access, such that importing a single net (or `fltk.nets.util`) does not import all.
+_modules = {
+    'Cifar10CNN': '.cifar_10_cnn',
+    'Cifar100ResNet': '.cifar_100_resnet',
+    'FashionMNISTCNN': '.fashion_mnist_cnn',
+    'FashionMNISTResNet': '.fashion_mnist_resnet',
+    'Cifar10ResNet': '.cifar_10_resnet',
+    'Cifar100VGG': '.cifar_100_vgg',
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
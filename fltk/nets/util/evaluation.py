@@ -1,6 +1,26 @@
 import numpy as np
 
 
+def confusion_matrix(targets, predictions) -> np.array:
+    """
+    Calculates the confusion matrix of a classification, as `sklearn.metrics.confusion_matrix` (with the labels that
+    occur in the targets or predictions as classes), without importing scikit-learn in the clients.
+    """
+    targets, predictions = np.asarray(targets), np.asarray(predictions)
+    labels = np.union1d(targets, predictions)
+    indices = np.searchsorted(labels, targets) * len(labels) + np.searchsorted(labels, predictions)
+    return np.bincount(indices, minlength=len(labels) ** 2).reshape(len(labels), len(labels))
+
+
+def confusion_matrix_from_counts(counts: np.array) -> np.array:
+    """
+    Calculates the confusion matrix of a classification from the counts of all (target, prediction) pairs of classes,
+    as `confusion_matrix`, i.e. restricted to the classes that occur in the targets or predictions.
+    """
+    present = (counts.sum(axis=0) + counts.sum(axis=1)) > 0
+    return counts[present][:, present]
+
+
 def calculate_class_precision(conf_mat: np.array) -> np.array:
     """
     Calculates the precision for each class from a confusion matrix.
@@ -1,14 +1,16 @@
 import logging
 from collections import OrderedDict
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 import torch
-from torch.utils.tensorboard import SummaryWriter
 
 from fltk.util.config.base_config import BareConfig
 from fltk.util.results import EpochData
 
+if TYPE_CHECKING:
+    from torch.utils.tensorboard import SummaryWriter
+
 
 def flatten_params(model_description: Union[torch.nn.Module, OrderedDict]):
     """
@@ -94,7 +96,7 @@ def save_model(model: torch.nn.Module, directory: str, epoch: int):
     torch.save(model.state_dict(), full_save_path)
 
 
-def test_model(model, epoch, writer: SummaryWriter = None) -> EpochData:
+def test_model(model, epoch, writer: 'SummaryWriter' = None) -> EpochData:
     """
     Function to test model during training with
     @return:
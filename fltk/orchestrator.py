@@ -1,22 +1,33 @@
 import logging
-import time
 import uuid
+from collections import deque
+from pathlib import Path
 from queue import PriorityQueue
-from typing import List
+from typing import Callable, Deque, List, Tuple
 import dropbox
 import csv
 
-from kubeflow.pytorchjob import PyTorchJobClient
-from kubeflow.pytorchjob.constants.constants import PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, PYTORCHJOB_PLURAL
 from kubernetes import client
 
+from fltk.job_prediction.backends import create_backend
+from fltk.job_prediction.history_store import HistoryStore
 from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
 from fltk.schedulers.schedule import Schedule
-from fltk.util.cluster.client import construct_job, ClusterManager
+from fltk.util.clock import Clock, WallClock
+from fltk.util.cluster.backend import ClusterBackend, match_labels
+from fltk.util.cluster.client import construct_job, ClusterManager, JOB_LABEL_SELECTOR
+from fltk.util.cluster.job_tracker import JobCompletionTracker
+from fltk.util.cluster.kubeflow import KubeflowBackend
 from fltk.util.config.base_config import BareConfig
+from fltk.util.events import EventNotifier, NotifyingQueue
+from fltk.util.progress import ProgressReport, ProgressServer
 from fltk.util.task.generator.arrival_generator import ArrivalGenerator, Arrival
 from fltk.util.task.task import ArrivalTask
 
+STATISTICS_HEADER = ['scheduler', 'static', 'nodes', 'pipeline', 'number_of_groups', 'jobs_per_group', 'trial',
+                     'fairness', 'utilization', 'norm_fairness', 'norm_utilization', 'mean_completion_time',
+                     'p99_completion_time', 'prediction_mape', 'p90_coverage']
+
 
 class Orchestrator(object):
     """
@@ -36,18 +47,72 @@ class Orchestrator(object):
     """
     _alive = False
 
-    def __init__(self, cluster_mgr: ClusterManager, arv_gen: ArrivalGenerator, config: BareConfig):
+    # Interval (in seconds) at which the Orchestrator wakes up without an event.
+    _poll_interval: float = 1
+
+    def __init__(self, cluster_mgr: ClusterManager, arv_gen: ArrivalGenerator, config: BareConfig,
+                 backend: ClusterBackend = None, clock: Clock = None, poll_interval: float = None,
+                 capacity: Callable[[], List[Tuple[int, int]]] = None, seed: int = None):
         self.__logger = logging.getLogger('Orchestrator')
         self.__logger.debug("Loading in-cluster configuration")
         self.__cluster_mgr = cluster_mgr
         self.__arrival_generator = arv_gen
         self._config = config
+        self._clock = clock or WallClock()
+        if poll_interval is not None:
+            self._poll_interval = poll_interval
+
+        # Backend that runs the jobs, by default PyTorchJobs on the cluster, which is stopped after the experiment.
+        self.__owns_backend = backend is None
+        if backend is None:
+            backend = KubeflowBackend(cluster_manager=cluster_mgr, api_config=config.cluster_config.api)
+        self.__backend = backend
 
-        # API to interact with the cluster.
-        self.__client = PyTorchJobClient()
+        # Arrivals and job completions wake up the main loop, instead of a fixed sleep.
+        self._events = EventNotifier(self._clock)
+        arrivals = self.__arrival_generator.arrivals
+        if isinstance(arrivals, NotifyingQueue):
+            arrivals.add_listener(lambda: self._events.notify(EventNotifier.ARRIVAL))
 
-        self.workload_predictor = JobWorkloadPredictor()
-        self.schedule = Schedule(self.__client, self._config, self.workload_predictor)
+        # Single watch on the PyTorchJobs of the namespace, instead of requesting each deployed job.
+        self._tracker = JobCompletionTracker(self.__backend.source(self._config.cluster_config.namespace))
+        self._tracker.add_listener(lambda name, job: self._events.notify(EventNotifier.JOB_STATUS))
+
+        # Per-epoch progress of the deployed jobs, pushed by the ProgressServer (from its receiving thread).
+        self._progress: Deque[ProgressReport] = deque()
+        self._progress_server: ProgressServer = None
+
+        history = config.execution_config.history
+        store = HistoryStore(Path(history.path), history.max_age, history.max_records,
+                             history.compact_every) if history else None
+        self.workload_predictor = JobWorkloadPredictor(create_backend(config.experiment.predictor), store,
+                                                       history.record if history else True)
+        if capacity is None and self.__backend.capacity() is not None:
+            capacity = self.__backend.capacity
+        self.schedule = Schedule(self.__backend, self._config, self.workload_predictor, self._clock, self._tracker,
+                                 capacity, seed)
+
+    def notify(self, event: str) -> None:
+        """
+        Function to wake up the main loop of the Orchestrator, e.g. when the status of a job changed.
+        @param event: Kind of event, see EventNotifier.
+        @type event: str
+        @return: None
+        @rtype: None
+        """
+        self._events.notify(event)
+
+    def report_progress(self, report: ProgressReport) -> None:
+        """
+        Function to pass the progress of a deployed job to the main loop of the Orchestrator, safe to call from other
+        threads.
+        @param report: Progress of the job after an epoch.
+        @type report: ProgressReport
+        @return: None
+        @rtype: None
+        """
+        self._progress.append(report)
+        self._events.notify(EventNotifier.PROGRESS)
 
     def stop(self) -> None:
         """
@@ -57,73 +122,139 @@ class Orchestrator(object):
         """
         self.__logger.info("Received stop signal for the Orchestrator.")
         self._alive = False
+        self._tracker.stop()
+        if self._progress_server is not None:
+            self._progress_server.stop()
+            self._progress_server = None
+        self._events.notify(EventNotifier.STOP)
 
-    def run(self, clear: bool = True) -> None:
+    def run(self, clear: bool = True, report: bool = True) -> None:
         """
-        Main loop of the Orchestartor.
+        Main loop of the Orchestartor. The loop is event driven, i.e. it sleeps until either an arrival is put on the
+        queue of the ArrivalGenerator, a deployed job completes or reports progress, or a stop signal is received.
         @param clear: Boolean indicating whether a previous deployment needs to be cleaned up (i.e. lingering jobs that
         were deployed by the previous run).
-
         @type clear: bool
+        @param report: Boolean indicating whether the statistics of the experiment need to be written (and uploaded)
+        after completion.
+        @type report: bool
         @return: None
         @rtype: None
         """
         self._alive = True
-        start_time = time.time()
+        start_time = self._clock.time()
+        end_time = start_time + self._config.get_duration()
         if clear:
             self.__clear_jobs()
-        while self._alive and time.time() - start_time < self._config.get_duration():
+        if self._clock.realtime:
+            self._tracker.start()
+            progress_port = self._config.cluster_config.orchestrator.progress_port
+            if progress_port is not None:
+                self._progress_server = ProgressServer(self.report_progress, port=progress_port)
+                self._progress_server.start()
+        while self._alive and self._clock.time() < end_time:
             # 1. Check arrivals
             # If new arrivals, store them in arrival list
-            while not self.__arrival_generator.arrivals.empty():
-                arrival: Arrival = self.__arrival_generator.arrivals.get()
-                unique_identifier: uuid.UUID = uuid.uuid4()
-                task = ArrivalTask(priority=arrival.get_priority(),
-                                   id=unique_identifier,
-                                   network=arrival.get_network(),
-                                   dataset=arrival.get_dataset(),
-                                   sys_conf=arrival.get_system_config(),
-                                   param_conf=arrival.get_parameter_config(),
-                                   group_id=arrival.group_id,
-                                   task_id=arrival.task_id,
-                                   created=round(time.time() * 1000),
-                                   predicted_length=self.workload_predictor.predict_length(arrival))
-
-                self.__logger.info(f"Arrival of: {task.task_id} {unique_identifier}")
-                self.schedule.pending_tasks.append(task)
+            self.__process_arrivals()
+
+            # 2. Check completions of deployed jobs, this frees up the pipelines for the next deployment.
+            if not self._clock.realtime:
+                self._tracker.sync()
+            self.schedule.check_completed()
+
+            # 3. Refine the remaining time of the running jobs with their reported progress.
+            while self._progress:
+                self.schedule.record_progress(self._progress.popleft())
 
             self.schedule.reschedule()
 
             self.schedule.deploy_tasks()
 
-            self.schedule.check_completed()
-
             if len(self.schedule.completed_tasks) == self._config.experiment.number_of_groups * self._config.experiment.number_of_jobs_per_group:
                 self._alive = False
+                break
 
             self.__logger.debug("Still alive...")
-            time.sleep(1)
+            self._events.wait(min(self._poll_interval, end_time - self._clock.time()))
 
+        self.__logger.info(f'Experiment completed, currently does not support waiting.')
+        self.workload_predictor.flush()
 
-        logging.info(f'Experiment completed, currently does not support waiting.')
+        if report:
+            self.__report_statistics()
 
+        self.stop()
+        if self.__owns_backend:
+            self.__backend.stop()
+        return
+
+    def __process_arrivals(self) -> None:
+        """
+        Function to drain the arrival queue of the ArrivalGenerator, and add the arrivals as pending tasks to the
+        Schedule.
+        @return: None
+        @rtype: None
+        """
+        while not self.__arrival_generator.arrivals.empty():
+            arrival: Arrival = self.__arrival_generator.arrivals.get()
+            unique_identifier: uuid.UUID = uuid.uuid4()
+            predicted_length, predicted_quantiles = self.workload_predictor.predict_distribution(arrival)
+            task = ArrivalTask(priority=arrival.get_priority(),
+                               id=unique_identifier,
+                               network=arrival.get_network(),
+                               dataset=arrival.get_dataset(),
+                               sys_conf=arrival.get_system_config(),
+                               param_conf=arrival.get_parameter_config(),
+                               group_id=arrival.group_id,
+                               task_id=arrival.task_id,
+                               created=self._clock.time_ms(),
+                               predicted_length=predicted_length,
+                               predicted_quantiles=predicted_quantiles,
+                               learned=self.workload_predictor.trained)
+
+            self.__logger.info(f"Arrival of: {task.task_id} {unique_identifier}")
+            self.schedule.add_task(task)
+
+    def statistics(self) -> List:
+        """
+        Function to get the statistics of the experiment, i.e. the fairness and utilization of the Schedule (absolute and
+        normalized by the size of the experiment), the mean and p99 completion time of the tasks (in seconds), the mean
+        absolute percentage error of the predicted task lengths and the fraction of the tasks that completed within
+        their predicted p90 length, together with the parameters of the experiment.
+        @return: Row of statistics, with columns as in STATISTICS_HEADER.
+        @rtype: List
+        """
+        experiment = self._config.experiment
+        fairness = self.schedule.calculate_fairness()
+        utilization = self.schedule.calculate_utilization()
+        mean_completion, p99_completion = self.schedule.calculate_completion_times()
+        return [experiment.scheduler, experiment.static, experiment.nodes, experiment.pipelines,
+                experiment.number_of_groups, experiment.number_of_jobs_per_group, experiment.repetition, fairness,
+                utilization,
+                fairness / ((experiment.number_of_groups ** 2) * (experiment.number_of_jobs_per_group ** 2)),
+                utilization / (experiment.number_of_groups * experiment.number_of_jobs_per_group),
+                mean_completion, p99_completion, self.workload_predictor.mape,
+                self.workload_predictor.coverage[0.9]]
+
+    def __report_statistics(self) -> None:
+        """
+        Function to write the fairness and utilization statistics of the experiment to disk, and upload them.
+        @return: None
+        @rtype: None
+        """
         # with open('./logging/statistics.csv', 'a+') as f:
         #     f.write(f'{self._config.experiment.scheduler} ; {self._config.experiment.cpu_per_job} ; {self._config.experiment.memory_per_job} ; {self._config.experiment.number_of_groups}  ; {self._config.experiment.number_of_jobs_per_group} ; {self._config.experiment.scheduler} ; {self.schedule.calculate_fairness()} ; {self.schedule.calculate_utilization()}')
 
         dpbx = dropbox.Dropbox("x8KMxPF9z50AAAAAAAAAAXrTe1JWjuMJ-vYm8OnFAGJeHfPpy5HndfMrhwnij8os")
-        header = ['scheduler', 'static', 'nodes', 'pipeline', 'number_of_groups', 'jobs_per_group', 'trial', 'fairness', 'utilization', 'norm_fairness', 'norm_utilization']
-        data = [self._config.experiment.scheduler, self._config.experiment.static, self._config.experiment.nodes, self._config.experiment.pipelines, self._config.experiment.number_of_groups,self._config.experiment.number_of_jobs_per_group, self._config.experiment.repetition, self.schedule.calculate_fairness(), self.schedule.calculate_utilization(), (self.schedule.calculate_fairness() / ((self._config.experiment.number_of_groups ** 2) * (self._config.experiment.number_of_jobs_per_group ** 2))), (self.schedule.calculate_utilization() / (self._config.experiment.number_of_groups * self._config.experiment.number_of_jobs_per_group))]
+        header = STATISTICS_HEADER
+        data = self.statistics()
         #print(dpbx.users_get_current_account()) #Make sure we have access
         with open('./statistics.csv', 'w+') as f:
             writer = csv.writer(f)
             writer.writerow(header)
             writer.writerow(data)
         with open('./statistics.csv', 'rb') as f2:
-            dpbx.files_upload(f2.read(), '/{}-{}-{}-{}-{}-{}-{}-{}-{}-{}-{}.csv'.format(self._config.experiment.scheduler, self._config.experiment.static, self._config.experiment.nodes, self._config.experiment.pipelines, self._config.experiment.number_of_groups,self._config.experiment.number_of_jobs_per_group, self._config.experiment.repetition, self.schedule.calculate_fairness(), self.schedule.calculate_utilization(), (self.schedule.calculate_fairness() / ((self._config.experiment.number_of_groups ** 2) * (self._config.experiment.number_of_jobs_per_group ** 2))), (self.schedule.calculate_utilization() / (self._config.experiment.number_of_groups * self._config.experiment.number_of_jobs_per_group))), mute = True)
-
-
-        self.stop()
-        return
+            dpbx.files_upload(f2.read(), '/{}-{}-{}-{}-{}-{}-{}-{}-{}-{}-{}.csv'.format(*data), mute = True)
 
     def __clear_jobs(self):
         """
@@ -134,16 +265,27 @@ class Orchestrator(object):
         namespace = self._config.cluster_config.namespace
         self.__logger.info(f'Clearing old jobs in current namespace: {namespace}')
 
-        for job in self.__client.get(namespace=self._config.cluster_config.namespace)['items']:
+        # The labelled jobs are deleted with a single request.
+        self.__logger.info(f'Deleting the jobs with labels {JOB_LABEL_SELECTOR}')
+        try:
+            for job_name in self.__backend.delete_collection(namespace=namespace, label_selector=JOB_LABEL_SELECTOR):
+                self.__logger.info(f'Deleting: {job_name}')
+        except Exception as e:
+            self.__logger.warning(f'Could not delete the jobs with labels {JOB_LABEL_SELECTOR}: {e}')
+
+        # Jobs without these labels (e.g. of deployments before the jobs were labelled) are deleted one by one.
+        try:
+            jobs = self.__backend.get(namespace=namespace)['items']
+        except Exception as e:
+            self.__logger.warning(f'Could not list the jobs in namespace {namespace}: {e}')
+            return
+        for job in jobs:
+            if match_labels(job, JOB_LABEL_SELECTOR):
+                # Already being deleted.
+                continue
             job_name = job['metadata']['name']
             self.__logger.info(f'Deleting: {job_name}')
             try:
-                self.__client.custom_api.delete_namespaced_custom_object(
-                    PYTORCHJOB_GROUP,
-                    PYTORCHJOB_VERSION,
-                    namespace,
-                    PYTORCHJOB_PLURAL,
-                    job_name)
+                self.__backend.delete(job_name, namespace=namespace)
             except Exception as e:
-                self.__logger.warning(f'Could not delete: {job_name}')
-                print(e)
+                self.__logger.warning(f'Could not delete {job_name}: {e}')
@@ -1 +1,15 @@
-from .min_lr_step import MinCapableStepLR
+import importlib
+
+# The learning rate scheduler is imported on first access, such that the (job) schedules of the Orchestrator do not
+# import torch.
+_modules = {
+    'MinCapableStepLR': '.min_lr_step',
+}
+
+__all__ = list(_modules)
+
+
+def __getattr__(name):
+    if name in _modules:
+        return getattr(importlib.import_module(_modules[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,19 +1,44 @@
+import dataclasses
+import datetime
+import itertools
 import logging
 import math
-import time
-from typing import List, Tuple
-from queue import PriorityQueue
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 import numpy as np
-from kubeflow.pytorchjob import PyTorchJobClient
 
 from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
-from fltk.util.cluster.client import construct_job
+from fltk.schedulers.task_store import PendingTaskStore
+from fltk.util.clock import Clock, WallClock
+from fltk.util.cluster.backend import ClusterBackend
+from fltk.util.cluster.client import JobTemplateCache
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.cluster.job_tracker import JobCompletionTracker, is_terminal
 from fltk.util.config import BareConfig
+from fltk.util.progress import ProgressReport
 from fltk.util.task.task import ArrivalTask
 from dateutil import parser
 
 
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Function to parse a timestamp of the Kubernetes API into a unix timestamp. The API uses RFC 3339 in UTC (e.g.
+    '2021-10-01T12:00:00Z'), which is parsed without dateutil, other formats fall back to dateutil.
+    @param timestamp: Timestamp to parse.
+    @type timestamp: str
+    @return: Seconds since the epoch.
+    @rtype: float
+    """
+    try:
+        return datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(
+                tzinfo=datetime.timezone.utc).timestamp()
+    except ValueError:
+        return parser.parse(timestamp).timestamp()
+
+
 class Job:
     def __init__(self, id: str, group_id: str, created: int, started: int, busy_time: int):
         self.id = id
@@ -23,17 +48,108 @@ class Job:
         self.busy_time = busy_time
 
 
+def task_demand(task: ArrivalTask) -> Tuple[int, int]:
+    """
+    Function to get the resources that are requested by a task, i.e. the resources of an executor times the number of
+    executors.
+    @param task: Task to get the demand of.
+    @type task: ArrivalTask
+    @return: Tuple of requested (milli-cores, bytes of memory).
+    @rtype: Tuple[int, int]
+    """
+    parallelism = int(task.sys_conf.data_parallelism)
+    cores, memory = executor_demand(task)
+    return cores * parallelism, memory * parallelism
+
+
+def executor_demand(task: ArrivalTask) -> Tuple[int, int]:
+    """
+    Function to get the resources that are requested by a single executor (pod) of a task, which has to fit on a node.
+    @param task: Task to get the demand of.
+    @type task: ArrivalTask
+    @return: Tuple of requested (milli-cores, bytes of memory).
+    @rtype: Tuple[int, int]
+    """
+    return cpu_to_millicores(task.sys_conf.executor_cores), memory_to_bytes(task.sys_conf.executor_memory)
+
+
 class Schedule:
-    def __init__(self, client: PyTorchJobClient, config: BareConfig, workload_predictor: JobWorkloadPredictor):
+    # Policies that do not bind a deployment to an idle pipeline, but deploy as long as there is capacity.
+    WORK_CONSERVING = {"backfill"}
+
+    # Policies that order the pending tasks by their (aged) predicted length.
+    LENGTH_BASED = {"sjf", "srpt"}
+    AGED_LENGTH = 'aged_length'
+
+    # Maximum number of pending tasks that are considered for backfilling in a single reschedule.
+    _backfill_depth: int = 100
+
+    def __init__(self, backend: ClusterBackend, config: BareConfig, workload_predictor: JobWorkloadPredictor,
+                 clock: Clock = None, tracker: JobCompletionTracker = None,
+                 capacity: Callable[[], List[Tuple[int, int]]] = None, seed: int = None):
+        """
+        @param backend: Backend to run the PyTorchJobs with.
+        @type backend: ClusterBackend
+        @param config: Configuration of the experiment.
+        @type config: BareConfig
+        @param workload_predictor: Predictor of the length of a task.
+        @type workload_predictor: JobWorkloadPredictor
+        @param clock: Clock to timestamp the deployments, by default the wall clock.
+        @type clock: Clock
+        @param tracker: Tracker that pushes the completions of jobs, by default the status of every job is requested.
+        @type tracker: JobCompletionTracker
+        @param capacity: Function to get the resources per node that are available to the jobs as (milli-cores, bytes),
+        empty while they are not known, required by the backfill policy.
+        @type capacity: Callable[[], List[Tuple[int, int]]]
+        @param seed: Seed of the random selection of pending tasks, by default the global generator of `random` is used.
+        @type seed: int
+        """
         self.__logger = logging.getLogger('Scheduler')
-        self.__client = client
+        self.__backend = backend
         self._config = config
+        self._clock = clock or WallClock()
         self.workload_predictor = workload_predictor
-        self.start_time = round(time.time() * 1000)
-
-        self.pending_tasks: List[ArrivalTask] = []
-        self.deployed_tasks: List[Tuple[int, ArrivalTask]] = []
+        self.start_time = self._clock.time_ms()
+        self._capacity = capacity
+        self._work_conserving = config.experiment.scheduler in self.WORK_CONSERVING
+        if self._work_conserving and capacity is None:
+            raise ValueError(f'Scheduler "{config.experiment.scheduler}" requires the capacity of the cluster')
+
+        # Quantile of the predicted length that the policies plan with, None for the point prediction.
+        self._quantile = config.experiment.planning_quantile
+        if self._quantile is not None and self._quantile not in JobWorkloadPredictor.QUANTILES:
+            raise ValueError(f'Cannot plan with quantile {self._quantile}, expected one of '
+                             f'{list(JobWorkloadPredictor.QUANTILES)}')
+
+        self.pending = PendingTaskStore(seed)
+        self._aging = config.experiment.aging
+        if config.experiment.scheduler in self.LENGTH_BASED:
+            # length - aging * (now - created) orders the same as length + aging * created.
+            self.pending.add_view(self.AGED_LENGTH, lambda task: (task.planned_length(self._quantile) +
+                                                                  self._aging * task.created, task.created))
+        # Deployed tasks keyed by the name of their PyTorchJob.
+        self.deployed_tasks: Dict[str, Tuple[int, ArrivalTask]] = dict()
+        self._deployed_jobs: Dict[str, Job] = dict()
+        # Number of running jobs per pipeline, and the milli-core milliseconds reserved by the jobs that were released.
+        self._running: List[int] = [0] * config.experiment.pipelines
+        self._reserved_time: float = 0
         self.completed_tasks: List[str] = []
+        # Time between arrival and completion of the completed tasks, in milliseconds.
+        self.completion_times: List[float] = []
+        self.preemptions = 0
+        # Tasks (by arrival identifier) that were preempted, these are not preempted again.
+        self._preempted: Set[str] = set()
+        # Start time of the running jobs according to their status (in milliseconds), once known.
+        self._running_since: Dict[str, float] = dict()
+
+        # Jobs that reached a terminal condition, pushed by the tracker (from its watching thread).
+        self._tracker = tracker
+        self._finished_jobs: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        # Jobs whose deployment was submitted but is not registered yet, and the completions observed for them.
+        self._deploying: Set[str] = set()
+        self._unmatched_jobs: Dict[str, Dict[str, Any]] = dict()
+        if tracker:
+            tracker.add_listener(lambda name, job: self._finished_jobs.append((name, job)))
 
         self.history: List[List[Job]] = []
         self.schedule: List[List[ArrivalTask]] = []
@@ -44,125 +160,507 @@ class Schedule:
             self.schedule.append([])
             self.pipeline_busy.append(False)
 
+        # Running aggregates, such that the statistics do not need to walk the full history.
+        self._realised_delays: Dict[str, int] = dict()
+        self._busy_time: List[float] = [0] * self.n_pipelines
+        self._pipeline_projections: List[Dict[str, int]] = [dict() for _ in range(self.n_pipelines)]
+        # Projected delay per group summed over the pipelines, and the number of pipelines that contribute to it.
+        self._projected_delays: Dict[str, List[int]] = dict()
+        self._dirty_pipelines: Set[int] = set()
+
         self.task_on_pipeline = dict()
+        # Serialised job descriptions per job class, such that a deployment only patches a copy.
+        self._templates = JobTemplateCache()
+
+    def add_task(self, task: ArrivalTask) -> None:
+        """
+        Function to add an arrived task to the pending tasks of the Schedule.
+        @param task: Task to schedule.
+        @type task: ArrivalTask
+        @return: None
+        @rtype: None
+        """
+        self.pending.add(task)
+
+    @property
+    def pending_tasks(self) -> Tuple[ArrivalTask, ...]:
+        """
+        Snapshot of the pending tasks in order of arrival. The snapshot is immutable, such that adding to it fails
+        instead of dropping the task, use `add_task` to add a task.
+        """
+        return tuple(self.pending)
 
     def reschedule(self):
-        self.schedule = [[] for _ in range(self.n_pipelines)]
+        """
+        Function to select the next task for every pipeline that is idle and has nothing scheduled. Only the head of
+        each pipeline is selected, such that a reschedule costs O(p log n) for p idle pipelines and n pending tasks,
+        instead of re-ordering all pending tasks.
+        @return: None
+        @rtype: None
+        """
+        if self._work_conserving:
+            if len(self.pending):
+                self.backfill_scheduler()
+            return
+
+        idle = [pipe for pipe in range(self.n_pipelines) if not self.pipeline_busy[pipe] and not self.schedule[pipe]]
+        if not len(self.pending) or not idle and self._config.experiment.scheduler != "srpt":
+            return
 
         if self._config.experiment.scheduler == "random":
-            self.random_scheduler()
+            self.random_scheduler(idle)
         if self._config.experiment.scheduler == "fifo":
-            self.fifo_scheduler()
+            self.fifo_scheduler(idle)
         if self._config.experiment.scheduler == "fair":
-            self.fair_scheduler()
-
-    def random_scheduler(self):
-        for task in self.pending_tasks:
-            self.schedule[np.random.randint(0, self.n_pipelines)].append(task)
-
-    def fifo_scheduler(self):
-        lengths = PriorityQueue()
-
-        for pipe in range(self.n_pipelines):
-            # length, pipe
-            lengths.put((0, pipe))
-
-        for task in self.pending_tasks:
-            length, pipe = lengths.get()
-            self.schedule[pipe].append(task)
-            lengths.put((length + task.predicted_length, pipe))
-
-    def fair_scheduler(self):
+            self.fair_scheduler(idle)
+        if self._config.experiment.scheduler == "sjf":
+            self.sjf_scheduler(idle)
+        if self._config.experiment.scheduler == "srpt":
+            self.srpt_scheduler(idle)
+
+    def random_scheduler(self, pipes: List[int]):
+        for pipe in pipes:
+            task = self.pending.random()
+            if task is None:
+                break
+            self.__assign(pipe, task)
+
+    def fifo_scheduler(self, pipes: List[int]):
+        for pipe in pipes:
+            task = self.pending.peek(PendingTaskStore.ARRIVAL)
+            if task is None:
+                break
+            self.__assign(pipe, task)
+
+    def fair_scheduler(self, pipes: List[int]):
         group_delays = self.calculate_group_delays()
-        task_order = PriorityQueue()
-
-        for task in self.pending_tasks:
-            delay = 1
-
-            if task.group_id in group_delays:
-                delay = 1 / group_delays[task.group_id]
+        for pipe in pipes:
+            heads = [self.pending.peek_group(group) for group in self.pending.groups()]
+            if not heads:
+                break
+            # Group with the largest delay first, groups without delay are served after groups that have been delayed.
+            task = min(heads, key=lambda head: (self.__delay_key(group_delays.get(head.group_id)), head.priority,
+                                                head.created))
+            self.__assign(pipe, task)
+
+    def sjf_scheduler(self, pipes: List[int]):
+        """
+        Shortest (predicted) job first, with aging: a task that waited for `w` milliseconds is ordered as if its
+        predicted length were `aging * w` shorter, such that long tasks are not starved.
+        """
+        for pipe in pipes:
+            task = self.pending.peek(self.AGED_LENGTH)
+            if task is None:
+                break
+            self.__assign(pipe, task)
 
-            task_order.put((delay, task))
+    def srpt_scheduler(self, pipes: List[int]):
+        """
+        Shortest remaining (predicted) processing time first, with aging. Idle pipelines are filled as by the sjf
+        policy. When no pipeline is idle, a running job is preempted (and requeued) for the first pending task. As jobs
+        cannot be suspended, a preempted job restarts from scratch, which delays it by the time that it has been running.
+        Running the pending task first therefore only reduces the sum of their completion times when its aged predicted
+        length is shorter than the aged remaining time of the job minus the time that it has been running, the job for
+        which this margin is largest is preempted. To bound the work that is lost to restarts, a task is preempted at
+        most once, and only tasks of which the length was learned (see `ArrivalTask.learned`) preempt, the cold-start
+        guess of the predictor is not comparable to the remaining time of the running jobs.
+        """
+        self.sjf_scheduler(pipes)
+        now = self._clock.time_ms()
+        while len(self.pending):
+            candidate = self.pending.peek(self.AGED_LENGTH)
+            if not candidate.learned:
+                break
+            victim, victim_key = None, None
+            for job_name, (_, task) in self.deployed_tasks.items():
+                if task.task_id in self._preempted:
+                    continue
+                remaining = self.remaining_time(job_name, now)
+                elapsed = now - self.start_time_of(job_name)
+                key = remaining - elapsed - self._aging * (now - task.created)
+                if victim_key is None or key > victim_key:
+                    victim, victim_key = job_name, key
+            if victim is None or (candidate.planned_length(self._quantile) - self._aging * (now - candidate.created)
+                                  >= victim_key):
+                break
+            pipe = self.__preempt(victim)
+            self.__assign(pipe, candidate)
+
+    def remaining_time(self, job_name: str, now: int) -> float:
+        """
+        Function to estimate the remaining time of a deployed job, i.e. its (refined) predicted length minus the time
+        that it has been running (see `start_time`).
+        @param job_name: Name of the PyTorchJob.
+        @type job_name: str
+        @param now: Current time in milliseconds.
+        @type now: int
+        @return: Remaining time in milliseconds.
+        @rtype: float
+        """
+        return max(self._deployed_jobs[job_name].busy_time - (now - self.start_time_of(job_name)), 0)
 
-        lengths = PriorityQueue()
+    def start_time_of(self, job_name: str) -> float:
+        """
+        Function to get the moment that a deployed job started running according to its status, or its deployment
+        when the status is not known yet. The length of a running job (its busy time) is counted from this moment.
+        @param job_name: Name of the PyTorchJob.
+        @type job_name: str
+        @return: Start time in milliseconds.
+        @rtype: float
+        """
+        started = self._running_since.get(job_name)
+        if started is None:
+            status = self._tracker.get(job_name) if self._tracker else None
+            start_time = status.get('status', {}).get('startTime') if status else None
+            if not start_time:
+                return self._deployed_jobs[job_name].started
+            started = self._running_since[job_name] = parse_timestamp(start_time) * 1000
+        return started
+
+    def record_progress(self, report: ProgressReport) -> None:
+        """
+        Function to refine the length of a running job with its reported progress. The refined length replaces the
+        predicted length in the busy time of its pipeline, and thereby in the projected delays of the tasks that are
+        scheduled after it (see `calculate_group_delays`), the backfill reservations and the remaining time of SRPT.
+        @param report: Progress of the job after an epoch.
+        @type report: ProgressReport
+        @return: None
+        @rtype: None
+        """
+        job_name = f'trainjob-{report.task_id}'
+        if job_name not in self.deployed_tasks:
+            # The job completed, or was preempted, before its report was processed.
+            return
+        pipe, task = self.deployed_tasks[job_name]
+        now = self._clock.time_ms()
+        remaining = self.workload_predictor.predict_remaining(task, report)
+        history_job = self._deployed_jobs[job_name]
+        length = now - self.start_time_of(job_name) + remaining
+        self._busy_time[pipe] += length - history_job.busy_time
+        history_job.busy_time = length
+        self._dirty_pipelines.add(pipe)
+
+    def __preempt(self, job_name: str) -> int:
+        """
+        Function to stop a deployed job, and add its task to the pending tasks again (under a new identifier, as the
+        deletion of the PyTorchJob is asynchronous).
+        @param job_name: Name of the PyTorchJob to stop.
+        @type job_name: str
+        @return: Pipeline on which the job was running.
+        @rtype: int
+        """
+        self.__logger.info(f'Preempting: {job_name}')
+        self.__backend.delete(job_name, namespace=self._config.cluster_config.namespace)
+        history_job = self._deployed_jobs[job_name]
+        pipe, task = self.__release(job_name, self._clock.time_ms() - history_job.started)
+        # Only the delay until the final start of a task is accounted.
+        self._realised_delays[task.group_id] -= history_job.started - task.created
+        self.pending.add(dataclasses.replace(task, id=uuid.uuid4()))
+        self.preemptions += 1
+        self._preempted.add(task.task_id)
+        return pipe
+
+    def backfill_scheduler(self):
+        """
+        EASY backfilling over the capacity of the cluster. Tasks are started in order of arrival as long as they fit in
+        the free capacity. When the first task does not fit, it gets a reservation at the (predicted) moment that
+        enough running jobs have completed, the shadow time. Later tasks are backfilled into the free capacity, when
+        they are predicted to complete before the shadow time, or only use capacity that the reservation does not need.
+        A task fits when every executor fits on a node, the executors of the deployed jobs are placed first-fit on the
+        nodes in order of deployment (as an approximation of the Kubernetes scheduler). Nothing is scheduled while the
+        capacity of the cluster is not known. Pipelines do not limit the number of deployments, they are used to
+        account the deployments.
+        @return: None
+        @rtype: None
+        """
+        nodes = self._capacity()
+        if not nodes:
+            self.__logger.debug('Capacity of the cluster is not known yet, not scheduling.')
+            return
+        now = self._clock.time_ms()
+        free = [list(node) for node in nodes]
+        placements = {name: self.__place(task, free, force=True) for name, (_, task) in self.deployed_tasks.items()}
+
+        head = self.pending.peek(PendingTaskStore.ARRIVAL)
+        while head is not None and self.__place(head, free) is not None:
+            self.__assign_backfill(head)
+            head = self.pending.peek(PendingTaskStore.ARRIVAL)
+        if head is None:
+            return
+        if not self.deployed_tasks and not any(self.schedule):
+            # The task does not fit in an empty cluster, deploy it anyway rather than blocking all other tasks.
+            self.__logger.warning(f'Task {head.id} requests more than the capacity of the cluster {nodes}')
+            self.__assign_backfill(head)
+            return
+
+        # Reservation of the head of the queue, at the predicted completion of enough running jobs. The resources that
+        # remain at the shadow time, after placing the head, can be used by backfilled tasks that run longer.
+        available = [list(node) for node in free]
+        shadow = now
+        extra = None
+        running = sorted((max(self.start_time_of(name) + self._deployed_jobs[name].busy_time, now), name)
+                         for name in self.deployed_tasks)
+        for end, name in running:
+            self.__unplace(self.deployed_tasks[name][1], available, placements[name])
+            shadow = end
+            if self.__place(head, available) is not None:
+                extra = available
+                break
+
+        candidates = []
+        for task in itertools.islice(self.pending.ordered(PendingTaskStore.ARRIVAL), 1, self._backfill_depth + 1):
+            placement = self.__place(task, free)
+            if placement is None:
+                continue
+            if now + task.planned_length(self._quantile) <= shadow or \
+                    (extra is not None and self.__place(task, extra) is not None):
+                candidates.append(task)
+            else:
+                self.__unplace(task, free, placement)
+        for task in candidates:
+            self.__assign_backfill(task)
+
+    @staticmethod
+    def __place(task: ArrivalTask, free: List[List[int]], force: bool = False) -> Optional[List[int]]:
+        """
+        Function to place the executors of a task first-fit on the nodes, and subtract their demand from the free
+        resources of the nodes.
+        @param task: Task to place.
+        @type task: ArrivalTask
+        @param free: Free (milli-cores, bytes) per node, updated in place.
+        @type free: List[List[int]]
+        @param force: Whether an executor that does not fit is placed on the node with the most free milli-cores,
+        instead of failing the placement.
+        @type force: bool
+        @return: Node of every executor, None (without changing the free resources) when the task does not fit.
+        @rtype: Optional[List[int]]
+        """
+        cores, memory = executor_demand(task)
+        placement = []
+        for _ in range(int(task.sys_conf.data_parallelism)):
+            node = next((i for i, (c, m) in enumerate(free) if cores <= c and memory <= m), None)
+            if node is None:
+                if not force:
+                    Schedule.__unplace(task, free, placement)
+                    return None
+                node = max(range(len(free)), key=lambda i: free[i][0])
+            free[node][0] -= cores
+            free[node][1] -= memory
+            placement.append(node)
+        return placement
+
+    @staticmethod
+    def __unplace(task: ArrivalTask, free: List[List[int]], placement: List[int]) -> None:
+        cores, memory = executor_demand(task)
+        for node in placement:
+            free[node][0] += cores
+            free[node][1] += memory
+
+    def __assign_backfill(self, task: ArrivalTask) -> None:
+        """
+        Function to assign a task to the pipeline with the least running and scheduled jobs.
+        """
+        pipe = min(range(self.n_pipelines), key=lambda i: (self._running[i] + len(self.schedule[i]), i))
+        self.__assign(pipe, task)
 
-        for pipe in range(self.n_pipelines):
-            # length, pipe
-            lengths.put((0, pipe))
+    @staticmethod
+    def __delay_key(delay: int = None) -> float:
+        return 1 / delay if delay else 1
 
-        while not task_order.empty():
-            delay, task = task_order.get()
-            length, pipe = lengths.get()
-            self.schedule[pipe].append(task)
-            lengths.put((length + task.predicted_length, pipe))
+    def __assign(self, pipe: int, task: ArrivalTask) -> None:
+        self.pending.remove(task.id)
+        self.schedule[pipe].append(task)
+        self._dirty_pipelines.add(pipe)
 
     def deploy_tasks(self):
+        """
+        Function to deploy the scheduled tasks of the pipelines that are idle (or of all pipelines, for the
+        work-conserving policies). The creations are issued concurrently (when the backend supports it), and only
+        awaited once all are submitted. A task is registered as deployed once its creation succeeded, a task of which
+        the creation failed is added to the pending tasks again (under a new identifier, as the failed request may
+        still have created its PyTorchJob).
+        @return: None
+        @rtype: None
+        """
+        submitted = []
         # check per pipe
         for i, pipe in enumerate(self.schedule):
             # if there is stuff scheduled in this pipe and it is not busy we deploy the job
-            if len(pipe) != 0 and not self.pipeline_busy[i]:
-                first = pipe.pop()
-
-                for x, task in enumerate(self.pending_tasks):
-                    if task.id == first.id:
-                        del self.pending_tasks[x]
-
-                self.__logger.info(f"Scheduling arrival of Arrival: {first.task_id} -> {first.id}")
-                job_to_start = construct_job(self._config, first)
-
-                # Hack to overcome limitation of KubeFlow version (Made for older version of Kubernetes)
-                self.__logger.info(f"Deploying on cluster: {first.task_id} -> {first.id}")
-
-                self.__client.create(job_to_start, namespace=self._config.cluster_config.namespace)
-
-                self.deployed_tasks.append((i, first))
-                self.history[i].append(
-                        Job(f'{first.id}',
-                        first.group_id,
-                        first.created,
-                        round(time.time() * 1000), # job started now
-                        first.predicted_length)
-                )
-
-                self.__logger.info(f"{first.id} :::: {first.created} -> {round(time.time() * 1000)}, diff = {round(time.time() * 1000) - first.created}")
+            while len(pipe) != 0 and (not self.pipeline_busy[i] or self._work_conserving):
+                task = pipe.pop(0)
+                submitted.append((i, task, self._clock.time_ms(), self.__deploy(task)))
                 self.pipeline_busy[i] = True
+        failed = 0
+        for i, task, started, future in submitted:
+            try:
+                future.result()
+            except Exception as e:
+                self.__logger.error(f'Could not deploy {task.task_id} -> {task.id}, requeueing it: {e}')
+                self.pending.add(dataclasses.replace(task, id=uuid.uuid4()))
+                self.pipeline_busy[i] = self._running[i] > 0
+                failed += 1
+            else:
+                self.__register(i, task, started)
+        self._deploying.clear()
+        if failed:
+            self.__logger.warning(f'{failed} of {len(submitted)} deployments failed')
+
+    def __deploy(self, first: ArrivalTask) -> Future:
+        self.__logger.info(f"Scheduling arrival of Arrival: {first.task_id} -> {first.id}")
+        job_to_start = self._templates.construct(self._config, first)
+
+        # Hack to overcome limitation of KubeFlow version (Made for older version of Kubernetes)
+        self.__logger.info(f"Deploying on cluster: {first.task_id} -> {first.id}")
+
+        namespace = self._config.cluster_config.namespace
+        self._deploying.add(f"trainjob-{first.id}")
+        return self.__backend.create_async(job_to_start, namespace=namespace)
+
+    def __register(self, i: int, first: ArrivalTask, started: int) -> None:
+        """
+        Function to administer a task of which the PyTorchJob was created, as running on a pipeline.
+        @param i: Index of the pipeline.
+        @type i: int
+        @param first: Deployed task.
+        @type first: ArrivalTask
+        @param started: Moment of deployment in milliseconds.
+        @type started: int
+        @return: None
+        @rtype: None
+        """
+        job_name = f"trainjob-{first.id}"
+        self.deployed_tasks[job_name] = (i, first)
+        job = Job(f'{first.id}',
+                  first.group_id,
+                  first.created,
+                  started, # job started now
+                  first.planned_length(self._quantile))
+        self.history[i].append(job)
+        self._deployed_jobs[job_name] = job
+
+        self._realised_delays[first.group_id] = self._realised_delays.get(first.group_id, 0) + \
+                                                started - first.created
+        self._busy_time[i] += first.planned_length(self._quantile)
+        self._dirty_pipelines.add(i)
+        self._running[i] += 1
+
+        self.__logger.info(f"{first.id} :::: {first.created} -> {started}, diff = {started - first.created}")
+        self.pipeline_busy[i] = True
 
     def check_completed(self):
-        for deployed in self.deployed_tasks:
-            pipe, task = deployed
-            job = self.__client.get(f"trainjob-{task.id}", namespace=self._config.cluster_config.namespace)
-
-            # check the status of the job
-            if 'status' in job and len(job['status']['conditions']) and (job['status']['conditions'][-1]['type'].lower() == 'succeeded' or job['status']['conditions'][-1]['type'].lower() == 'failed'):
-                # job is done
-                self.__logger.info(f'Job done: {task.id}')
-                self.deployed_tasks.remove(deployed)
-                self.completed_tasks.append(f"trainjob-{task.id}")
-                start_time = job['status']['startTime']
-                end_time = job['status']['conditions'][-1]['lastTransitionTime']
-                start_time = parser.parse(start_time).timestamp()
-                end_time = parser.parse(end_time).timestamp()
-                length = (end_time - start_time) * 1000 # convert to ms
-
-                # update the workload predictor with the timings
-                self.workload_predictor.feedback(task, int(length))
-                # update the history schedule with the timings
-                self.history[pipe][-1].busy_time = length
-                # update the busy variable of the pipe
-                self.pipeline_busy[pipe] = False
+        """
+        Function to process the jobs that have completed since the previous call. When a JobCompletionTracker is used,
+        the completions pushed by the tracker are processed, without calls to the API. Otherwise, the status of every
+        deployed job is requested.
+        @return: None
+        @rtype: None
+        """
+        if self._tracker is None:
+            namespace = self._config.cluster_config.namespace
+            job_names = list(self.deployed_tasks.keys())
+            futures = [self.__backend.get_async(job_name, namespace=namespace) for job_name in job_names]
+            jobs = [future.result() for future in futures]
+            for job_name, job in zip(job_names, jobs):
+                if 'status' in job and is_terminal(job):
+                    self._finished_jobs.append((job_name, job))
+
+        while self._finished_jobs:
+            job_name, job = self._finished_jobs.popleft()
+            if job_name in self.deployed_tasks:
+                self.__complete(job_name, job)
+            elif job_name in self._deploying:
+                # Completion can be observed before the deployment is registered.
+                self._unmatched_jobs[job_name] = job
+            # Other jobs already completed (e.g. a repeated event), were preempted or were not deployed by the Schedule.
+
+        for job_name in [name for name in self._unmatched_jobs if name not in self._deploying]:
+            job = self._unmatched_jobs.pop(job_name)
+            if job_name in self.deployed_tasks:
+                self.__complete(job_name, job)
+
+    def __complete(self, job_name: str, job: Dict[str, Any]) -> None:
+        """
+        Function to administer the completion of a deployed job.
+        @param job_name: Name of the completed PyTorchJob.
+        @type job_name: str
+        @param job: PyTorchJob object in a terminal condition.
+        @type job: Dict[str, Any]
+        @return: None
+        @rtype: None
+        """
+        task = self.deployed_tasks[job_name][1]
+        # job is done
+        self.__logger.info(f'Job done: {task.id}')
+        self.completed_tasks.append(job_name)
+        start_time = job['status']['startTime']
+        end_time = job['status']['conditions'][-1]['lastTransitionTime']
+        start_time = parse_timestamp(start_time)
+        end_time = parse_timestamp(end_time)
+        length = (end_time - start_time) * 1000 # convert to ms
+
+        # update the workload predictor with the timings
+        self.workload_predictor.feedback(task, int(length))
+        self.completion_times.append(end_time * 1000 - task.created)
+        self._preempted.discard(task.task_id)
+        self.__release(job_name, length)
+
+    def __release(self, job_name: str, length: float) -> Tuple[int, ArrivalTask]:
+        """
+        Function to free the pipeline and resources of a deployed job that completed or was stopped.
+        @param job_name: Name of the PyTorchJob.
+        @type job_name: str
+        @param length: Time in milliseconds that the job occupied its pipeline.
+        @type length: float
+        @return: Tuple of the pipeline and the task of the job.
+        @rtype: Tuple[int, ArrivalTask]
+        """
+        pipe, task = self.deployed_tasks.pop(job_name)
+        self._running_since.pop(job_name, None)
+        # update the history schedule with the timings
+        history_job = self._deployed_jobs.pop(job_name)
+        self._busy_time[pipe] += length - history_job.busy_time
+        history_job.busy_time = length
+        self._dirty_pipelines.add(pipe)
+        self._reserved_time += task_demand(task)[0] * length
+        self._running[pipe] -= 1
+        # update the busy variable of the pipe
+        self.pipeline_busy[pipe] = self._running[pipe] > 0
+        return pipe, task
 
     def calculate_utilization(self):
-        total_time = round(time.time() * 1000) - self.start_time
+        """
+        Function to calculate the utilization of the experiment. For the pipeline policies, this is the fraction of the
+        time that the pipelines were busy, averaged over the pipelines. For the work-conserving policies, which do not
+        bound the deployments by the pipelines, it is the fraction of the milli-cores of the cluster that were reserved
+        by the jobs, over the time of the experiment.
+        @return: Utilization between 0 and 1 (unless the cluster is overcommitted).
+        @rtype: float
+        """
+        now = self._clock.time_ms()
+        total_time = now - self.start_time
+        if self._work_conserving:
+            cores = sum(node[0] for node in self._capacity())
+            reserved = self._reserved_time + sum(task_demand(task)[0] * (now - self._deployed_jobs[name].started)
+                                                 for name, (_, task) in self.deployed_tasks.items())
+            return reserved / (cores * total_time) if cores and total_time else math.nan
         average_utilization = 0
-        for pipeline in self.history:
-            busy_time = 0
-            for job in pipeline:
-                busy_time += job.busy_time
-
+        for busy_time in self._busy_time:
             average_utilization += busy_time / total_time
 
         return average_utilization / len(self.schedule)
 
+    def calculate_completion_times(self) -> Tuple[float, float]:
+        """
+        Function to calculate the mean and 99th percentile of the time between the arrival and completion of the
+        completed tasks.
+        @return: Tuple of (mean, p99) completion time in seconds, NaN when no task completed.
+        @rtype: Tuple[float, float]
+        """
+        if not self.completion_times:
+            return math.nan, math.nan
+        completion_times = np.asarray(self.completion_times) / 1000
+        return float(completion_times.mean()), float(np.percentile(completion_times, 99))
+
     def calculate_fairness(self):
         """
         Calculates the fairness which we defined as the variance between the total delay's of groups
@@ -183,26 +681,54 @@ class Schedule:
 
         return std / len(delay_in_secs.values())
 
-    def calculate_group_delays(self):
-        group_delays = dict()
-        for pipeline in self.history:
-            for job in pipeline:
-                if job.group_id not in group_delays:
-                    group_delays[job.group_id] = 0
-                # calculate the delay
-                group_delays[job.group_id] += job.started - job.created
-
-        # calculate delays in current pipeline
-        for i, pipeline in enumerate(self.schedule):
-            start_next = 0
-            # calculate the moment the previous job will likely end
-            if len(self.history[i]):
-                start_next = self.history[i][-1].started + self.history[i][-1].busy_time
-            for job in pipeline:
-                if job.group_id not in group_delays:
-                    group_delays[job.group_id] = 0
-                # calculate the delay which is the predicted start time of this job which is the moment the previous job will likely end
-                group_delays[job.group_id] += start_next - job.created
-                # Add the predicted length to the start_next such that delay of the next job is also correct
-                start_next += job.predicted_length
+    def calculate_group_delays(self) -> Dict[str, int]:
+        """
+        Function to calculate the total delay per group, i.e. the realised delay of the jobs that have started, plus the
+        projected delay of the jobs that are scheduled on a pipeline, plus the time that the pending tasks have been
+        waiting so far. Only the projections of pipelines that changed since the previous call are recomputed.
+        @return: Delay in milliseconds per group.
+        @rtype: Dict[str, int]
+        """
+        for pipe in self._dirty_pipelines:
+            for group_id, delay in self._pipeline_projections[pipe].items():
+                self._projected_delays[group_id][0] -= delay
+                self._projected_delays[group_id][1] -= 1
+                if not self._projected_delays[group_id][1]:
+                    del self._projected_delays[group_id]
+            self._pipeline_projections[pipe] = self.__project_pipeline(pipe)
+            for group_id, delay in self._pipeline_projections[pipe].items():
+                projected = self._projected_delays.setdefault(group_id, [0, 0])
+                projected[0] += delay
+                projected[1] += 1
+        self._dirty_pipelines.clear()
+
+        group_delays = dict(self._realised_delays)
+        for group_id, (delay, _) in self._projected_delays.items():
+            group_delays[group_id] = group_delays.get(group_id, 0) + delay
+        now = self._clock.time_ms()
+        for group_id in self.pending.groups():
+            group_delays[group_id] = group_delays.get(group_id, 0) + self.pending.waiting_time(group_id, now)
         return group_delays
+
+    def __project_pipeline(self, pipe: int) -> Dict[str, int]:
+        """
+        Function to calculate the projected delay per group of the jobs that are scheduled on a pipeline.
+        @param pipe: Index of the pipeline.
+        @type pipe: int
+        @return: Projected delay in milliseconds per group.
+        @rtype: Dict[str, int]
+        """
+        projection = dict()
+        start_next = 0
+        # calculate the moment the previous job will likely end
+        if len(self.history[pipe]):
+            last = self.history[pipe][-1]
+            job_name = f'trainjob-{last.id}'
+            start_next = (self.start_time_of(job_name) if job_name in self._deployed_jobs else last.started) + \
+                last.busy_time
+        for job in self.schedule[pipe]:
+            # calculate the delay which is the predicted start time of this job which is the moment the previous job will likely end
+            projection[job.group_id] = projection.get(job.group_id, 0) + start_next - job.created
+            # Add the predicted length to the start_next such that delay of the next job is also correct
+            start_next += job.planned_length(self._quantile)
+        return projection
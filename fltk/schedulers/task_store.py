@@ -0,0 +1,214 @@
+import heapq
+import itertools
+import random
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from fltk.util.task.task import ArrivalTask
+
+# Key function of an ordering view, tasks with the smallest key come first.
+ViewKey = Callable[[ArrivalTask], tuple]
+
+
+class PendingTaskStore:
+    """
+    Store of pending tasks, keyed by task UUID. Besides O(1) lookup, the store maintains heap-backed ordering views that
+    are updated incrementally on every add/remove, such that scheduling policies can query the next task in
+    O(log n) instead of rebuilding a (priority) queue of all pending tasks.
+
+    Default views:
+        * ARRIVAL: order of arrival (created timestamp).
+        * Per group: priority, then order of arrival, see `peek_group`.
+
+    Removal is lazy, i.e. stale heap entries are discarded when they reach the top of a heap, and the heaps are
+    compacted once more than half of their entries are stale.
+    """
+
+    ARRIVAL = 'arrival'
+
+    def __init__(self, seed: int = None):
+        self._tasks: Dict[UUID, ArrivalTask] = dict()
+        # Sequence number of the current entry of each task, used to detect stale entries.
+        self._sequence: Dict[UUID, int] = dict()
+        self._counter = itertools.count()
+        self._view_keys: Dict[str, ViewKey] = dict()
+        self._views: Dict[str, List[Tuple]] = dict()
+        self._groups: Dict[str, List[Tuple]] = dict()
+        self._group_sizes: Dict[str, int] = dict()
+        # Sum of the arrival times per group, to compute the time that the tasks of a group have been waiting.
+        self._group_created: Dict[str, int] = dict()
+        # Dense array of task ids for O(1) random selection.
+        self._ids: List[UUID] = []
+        self._positions: Dict[UUID, int] = dict()
+        # Without a seed the global generator is used, such that seeding `random` makes the selection reproducible.
+        self._random = random.Random(seed) if seed is not None else random
+        self._entries = 0
+
+        self.add_view(self.ARRIVAL, lambda task: (task.created,))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: UUID) -> bool:
+        return task_id in self._tasks
+
+    def __iter__(self) -> Iterator[ArrivalTask]:
+        """
+        Iterate over the pending tasks in order of insertion.
+        """
+        return iter(list(self._tasks.values()))
+
+    def get(self, task_id: UUID) -> Optional[ArrivalTask]:
+        return self._tasks.get(task_id)
+
+    def add_view(self, name: str, key: ViewKey) -> None:
+        """
+        Register an ordering view. The key of a task must not change while the task is pending, `add` the task again otherwise.
+        @param name: Name of the view.
+        @type name: str
+        @param key: Function that computes the (tuple) key of a task, smallest key first.
+        @type key: ViewKey
+        @return: None
+        @rtype: None
+        """
+        self._view_keys[name] = key
+        self._views[name] = [(key(task), self._sequence[task.id], task.id) for task in self._tasks.values()]
+        heapq.heapify(self._views[name])
+        self._entries += len(self._tasks)
+
+    def add(self, task: ArrivalTask) -> None:
+        """
+        Add a task to the store, O(v log n) for v views. A pending task with the same UUID is replaced, e.g. to update
+        its keys.
+        """
+        if task.id in self._tasks:
+            self.remove(task.id)
+        sequence = next(self._counter)
+        self._tasks[task.id] = task
+        self._sequence[task.id] = sequence
+        for name, key in self._view_keys.items():
+            heapq.heappush(self._views[name], (key(task), sequence, task.id))
+        heapq.heappush(self._groups.setdefault(task.group_id, []), (task.priority, task.created, sequence, task.id))
+        self._group_sizes[task.group_id] = self._group_sizes.get(task.group_id, 0) + 1
+        self._group_created[task.group_id] = self._group_created.get(task.group_id, 0) + task.created
+        self._positions[task.id] = len(self._ids)
+        self._ids.append(task.id)
+        self._entries += len(self._view_keys) + 1
+
+    def remove(self, task_id: UUID) -> ArrivalTask:
+        """
+        Remove a task from the store, O(1) (amortized O(log n) for the views).
+        @param task_id: UUID of the task to remove.
+        @type task_id: UUID
+        @return: The removed task.
+        @rtype: ArrivalTask
+        """
+        task = self._tasks.pop(task_id)
+        del self._sequence[task_id]
+        self._group_sizes[task.group_id] -= 1
+        self._group_created[task.group_id] -= task.created
+        if not self._group_sizes[task.group_id]:
+            del self._group_sizes[task.group_id]
+            del self._group_created[task.group_id]
+            # All entries of the heap are stale, and are discarded with it.
+            self._entries -= len(self._groups[task.group_id])
+            del self._groups[task.group_id]
+        position = self._positions.pop(task_id)
+        last = self._ids.pop()
+        if last != task_id:
+            self._ids[position] = last
+            self._positions[last] = position
+        if self._entries > 2 * (len(self._tasks) + 1) * (len(self._view_keys) + 1):
+            self.__compact()
+        return task
+
+    def peek(self, view: str = ARRIVAL) -> Optional[ArrivalTask]:
+        """
+        Function to get the first task of a view, without removing it.
+        @param view: Name of the view.
+        @type view: str
+        @return: First pending task of the view, None if no tasks are pending.
+        @rtype: Optional[ArrivalTask]
+        """
+        heap = self._views[view]
+        while heap and not self.__is_current(heap[0]):
+            heapq.heappop(heap)
+            self._entries -= 1
+        return self._tasks[heap[0][-1]] if heap else None
+
+    def ordered(self, view: str = ARRIVAL) -> Iterator[ArrivalTask]:
+        """
+        Lazily iterate over the pending tasks in the order of a view, O(k log k) for the first k tasks. The store must
+        not be modified during the iteration.
+        @param view: Name of the view.
+        @type view: str
+        @return: Iterator over the pending tasks.
+        @rtype: Iterator[ArrivalTask]
+        """
+        heap = self._views[view]
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, index = heapq.heappop(frontier)
+            if self.__is_current(entry):
+                yield self._tasks[entry[-1]]
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def groups(self) -> List[str]:
+        """
+        Function to get the groups that have pending tasks, O(groups).
+        """
+        return list(self._groups.keys())
+
+    def group_size(self, group_id: str) -> int:
+        return self._group_sizes.get(group_id, 0)
+
+    def waiting_time(self, group_id: str, now: int) -> int:
+        """
+        Function to get the total time that the pending tasks of a group have been waiting, O(1).
+        @param group_id: Identifier of the group.
+        @type group_id: str
+        @param now: Current time in milliseconds.
+        @type now: int
+        @return: Sum of the waiting times in milliseconds.
+        @rtype: int
+        """
+        return self.group_size(group_id) * now - self._group_created.get(group_id, 0)
+
+    def peek_group(self, group_id: str) -> Optional[ArrivalTask]:
+        """
+        Function to get the first pending task of a group, ordered by priority and arrival.
+        @param group_id: Identifier of the group.
+        @type group_id: str
+        @return: First pending task of the group, None if the group has no pending tasks.
+        @rtype: Optional[ArrivalTask]
+        """
+        heap = self._groups.get(group_id)
+        while heap and not self.__is_current(heap[0]):
+            heapq.heappop(heap)
+            self._entries -= 1
+        return self._tasks[heap[0][-1]] if heap else None
+
+    def random(self) -> Optional[ArrivalTask]:
+        """
+        Function to select a pending task uniformly at random, O(1).
+        """
+        if not self._ids:
+            return None
+        return self._tasks[self._ids[self._random.randrange(len(self._ids))]]
+
+    def __is_current(self, entry: Tuple) -> bool:
+        return self._sequence.get(entry[-1]) == entry[-2]
+
+    def __compact(self) -> None:
+        """
+        Remove all stale entries from the heaps.
+        """
+        for name in self._views:
+            self._views[name] = [entry for entry in self._views[name] if self.__is_current(entry)]
+            heapq.heapify(self._views[name])
+        for group_id in self._groups:
+            self._groups[group_id] = [entry for entry in self._groups[group_id] if self.__is_current(entry)]
+            heapq.heapify(self._groups[group_id])
+        self._entries = len(self._tasks) * (len(self._view_keys) + 1)
@@ -0,0 +1,264 @@
+import copy
+import dataclasses
+import logging
+import math
+import random
+import zlib
+from abc import abstractmethod
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
+from fltk.orchestrator import Orchestrator
+from fltk.util.clock import SimulatedClock
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.cluster.fake import FakePyTorchJobApi
+from fltk.util.config.base_config import BareConfig
+from fltk.util.events import EventNotifier
+from fltk.util.progress import ProgressReport
+from fltk.util.task.generator.multi_group_arrival_generator import MultiGroupArrivalGenerator
+from fltk.util.task.task import ArrivalTask
+
+
+class DurationModel:
+    """
+    Model of the duration of a (simulated) training job.
+    """
+
+    @abstractmethod
+    def duration(self, task: ArrivalTask, rng: np.random.Generator) -> float:
+        """
+        Function to draw the duration of a task.
+        @param task: Task that is deployed.
+        @type task: ArrivalTask
+        @param rng: Random generator of the task.
+        @type rng: np.random.Generator
+        @return: Duration of the task in seconds.
+        @rtype: float
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+
+class LogNormalDurationModel(DurationModel):
+    """
+    Log-normally distributed duration per epoch, i.e. the duration of a task is its number of epochs times a draw of
+    the distribution.
+    """
+
+    def __init__(self, median: float = 60, sigma: float = 0.25):
+        """
+        @param median: Median duration of an epoch in seconds.
+        @type median: float
+        @param sigma: Standard deviation of the logarithm of the duration.
+        @type sigma: float
+        """
+        self.median = median
+        self.sigma = sigma
+
+    @classmethod
+    def fit(cls, epoch_durations: Sequence[float]) -> 'LogNormalDurationModel':
+        """
+        Function to fit the distribution to measured epoch durations (e.g. of earlier experiments on a cluster).
+        @param epoch_durations: Measured durations of an epoch in seconds.
+        @type epoch_durations: Sequence[float]
+        @return: Fitted model.
+        @rtype: LogNormalDurationModel
+        """
+        logs = np.log(np.asarray(epoch_durations, dtype=float))
+        return cls(median=float(np.exp(logs.mean())), sigma=float(logs.std()))
+
+    def duration(self, task: ArrivalTask, rng: np.random.Generator) -> float:
+        return int(task.param_conf.max_epoch) * float(rng.lognormal(math.log(self.median), self.sigma))
+
+
+class PredictorDurationModel(DurationModel):
+    """
+    Replays the lengths predicted by a JobWorkloadPredictor that was trained on measured lengths (e.g. of an earlier
+    experiment on a cluster). Tasks are drawn from the fallback model while the predictor has not been trained.
+    """
+
+    def __init__(self, predictor: JobWorkloadPredictor, fallback: DurationModel = None):
+        self.predictor = predictor
+        self.fallback = fallback or LogNormalDurationModel()
+
+    def duration(self, task: ArrivalTask, rng: np.random.Generator) -> float:
+        if not self.predictor.trained:
+            return self.fallback.duration(task, rng)
+        features = self.predictor.get_features_from_arrival_task(task)
+        return float(self.predictor.predict_features([features])[0]) / 1000
+
+
+class SimulatedJobApi(FakePyTorchJobApi):
+    """
+    FakePyTorchJobApi of which the jobs run by themselves on a SimulatedClock. A job starts directly after its
+    creation, and succeeds after the duration that is given by the `duration` callback, unless it is deleted before.
+    When `epochs` is given, the progress of a job is reported after every (equally long) epoch but the last.
+    """
+
+    def __init__(self, clock: SimulatedClock, duration: Callable[[str], float],
+                 on_update: Callable[[], None] = None, epochs: Callable[[str], int] = None,
+                 on_progress: Callable[[str, int, int, float], None] = None):
+        """
+        @param clock: Simulated clock to run the jobs on.
+        @type clock: SimulatedClock
+        @param duration: Function to get the duration (in seconds) of a job by its name, called when the job starts.
+        @type duration: Callable[[str], float]
+        @param on_update: Function that is called after a job completed.
+        @type on_update: Callable[[], None]
+        @param epochs: Function to get the number of epochs of a job by its name, called when the job starts.
+        @type epochs: Callable[[str], int]
+        @param on_progress: Function that is called with the name, completed epochs, total epochs and elapsed time (in
+        seconds) of a job after an epoch.
+        @type on_progress: Callable[[str, int, int, float], None]
+        """
+        super(SimulatedJobApi, self).__init__(clock, keep_spec=False)
+        self._duration = duration
+        self._on_update = on_update
+        self._epochs = epochs
+        self._on_progress = on_progress
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict:
+        job = super(SimulatedJobApi, self).create(pytorchjob, namespace)
+        name = job['metadata']['name']
+        # The job is registered by the caller after its creation, so it only starts once control returns to the clock.
+        self._clock.call_later(0, lambda: self.__run(name))
+        return job
+
+    def __run(self, name: str) -> None:
+        if name not in self._jobs:
+            # The job was deleted (preempted) before it started.
+            return
+        self.start_job(name)
+        duration = self._duration(name)
+        if self._epochs is not None and self._on_progress is not None:
+            epochs = self._epochs(name)
+            for epoch in range(1, epochs):
+                elapsed = duration * epoch / epochs
+                self._clock.call_later(elapsed, lambda e=epoch, t=elapsed: self.__progress(name, e, epochs, t))
+        self._clock.call_later(duration, lambda: self.__finish(name))
+
+    def __progress(self, name: str, epoch: int, epochs: int, elapsed: float) -> None:
+        if name not in self._jobs:
+            return
+        self._on_progress(name, epoch, epochs, elapsed)
+
+    def __finish(self, name: str) -> None:
+        if name not in self._jobs:
+            return
+        self.finish_job(name)
+        if self._on_update:
+            self._on_update()
+
+
+class Simulator:
+    """
+    Offline discrete-event simulation of an experiment. The arrivals of the MultiGroupArrivalGenerator are replayed
+    against the Orchestrator and Schedule on a SimulatedClock, with a SimulatedJobApi instead of the cluster. As no
+    wall-clock time is spent waiting, a full experiment takes in the order of milliseconds.
+    """
+
+    def __init__(self, config: BareConfig, duration_model: DurationModel = None, node_cpu: str = '3920m',
+                 node_memory: str = '13Gi', progress: bool = True):
+        """
+        @param config: Configuration of the experiment, the experiment parameters and duration are used. The predictor
+        is warm started from its history store, but the simulated lengths are not recorded in it.
+        @type config: BareConfig
+        @param duration_model: Model of the job durations, by default a LogNormalDurationModel.
+        @type duration_model: DurationModel
+        @param node_cpu: Allocatable CPU of a simulated node, the cluster consists of `experiment.nodes` nodes.
+        @type node_cpu: str
+        @param node_memory: Allocatable memory of a simulated node.
+        @type node_memory: str
+        @param progress: Whether the simulated jobs report their progress after every epoch.
+        @type progress: bool
+        """
+        self.__logger = logging.getLogger('Simulator')
+        history = config.execution_config.history
+        if history is not None and history.record:
+            # Simulated lengths would mislead the predictors of real experiments, the store is only warm started from.
+            config = copy.copy(config)
+            config.execution_config = dataclasses.replace(config.execution_config,
+                                                          history=dataclasses.replace(history, record=False))
+        self._config = config
+        self.duration_model = duration_model or LogNormalDurationModel()
+        self.node_capacity = (cpu_to_millicores(node_cpu), memory_to_bytes(node_memory))
+        self.progress = progress
+
+    def run(self, seed: int = None) -> List:
+        """
+        Function to simulate a single experiment.
+        @param seed: Seed of the random generators (arrivals, priorities, durations and random scheduling), by default
+        the arrival seed of the configuration.
+        @type seed: int
+        @return: Statistics of the experiment, with columns as in `fltk.orchestrator.STATISTICS_HEADER`.
+        @rtype: List
+        """
+        if seed is None:
+            seed = self._config.execution_config.reproducibility.arrival_seed
+        random.seed(seed)
+        np.random.seed(seed)
+
+        clock = SimulatedClock()
+        # The generator is a Singleton, so it is reset for every experiment.
+        generator = MultiGroupArrivalGenerator(self._config)
+        generator.reset(self._config)
+        generator.set_logger()
+
+        orchestrator: Orchestrator = None
+        durations: Dict[str, float] = dict()
+
+        def duration(name: str) -> float:
+            task = orchestrator.schedule.deployed_tasks[name][1]
+            # Every task draws from its own generator, such that its duration does not depend on the order in which
+            # the policy starts the tasks, and a preempted task keeps its duration when it restarts.
+            if task.task_id not in durations:
+                rng = np.random.default_rng([seed, zlib.crc32(task.task_id.encode())])
+                durations[task.task_id] = self.duration_model.duration(task, rng)
+            return durations[task.task_id]
+
+        def epochs(name: str) -> int:
+            return int(orchestrator.schedule.deployed_tasks[name][1].param_conf.max_epoch)
+
+        def progress(name: str, epoch: int, total: int, elapsed: float) -> None:
+            task = orchestrator.schedule.deployed_tasks[name][1]
+            orchestrator.report_progress(ProgressReport(task_id=str(task.id), epoch=epoch, epochs=total,
+                                                        elapsed=elapsed * 1000, timestamp=clock.time()))
+
+        backend = SimulatedJobApi(clock, duration, lambda: orchestrator.notify(EventNotifier.JOB_STATUS), epochs,
+                                 progress if self.progress else None)
+        # All state changes are notified, so the Orchestrator does not need to poll.
+        nodes = self._config.experiment.nodes
+        capacity = [self.node_capacity] * nodes
+        orchestrator = Orchestrator(None, generator, self._config, backend=backend, clock=clock,
+                                    poll_interval=math.inf, capacity=lambda: capacity, seed=seed)
+        generator.simulate(clock, self._config.get_duration())
+        orchestrator.run(clear=False, report=False)
+
+        self.__logger.info(f'Simulated {clock.time():.0f} seconds, '
+                           f'completed {len(orchestrator.schedule.completed_tasks)} jobs.')
+        return orchestrator.statistics()
+
+    def run_repetitions(self, repetitions: int, seed: int = None) -> List[List]:
+        """
+        Function to simulate repetitions of the experiment, repetition `i` uses seed `seed + i` and is reported as trial
+        `i`.
+        @param repetitions: Number of repetitions.
+        @type repetitions: int
+        @param seed: Seed of the first repetition, by default the arrival seed of the configuration.
+        @type seed: int
+        @return: Statistics per repetition.
+        @rtype: List[List]
+        """
+        if seed is None:
+            seed = self._config.execution_config.reproducibility.arrival_seed
+        base_config = self._config
+        results = []
+        try:
+            for repetition in range(repetitions):
+                self._config = copy.copy(base_config)
+                self._config.experiment = dataclasses.replace(base_config.experiment, repetition=repetition)
+                results.append(self.run(seed + repetition))
+        finally:
+            self._config = base_config
+        return results
@@ -0,0 +1,267 @@
+import copy
+import csv
+import dataclasses
+import hashlib
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from fltk.orchestrator import STATISTICS_HEADER
+from fltk.simulator import LogNormalDurationModel, Simulator
+from fltk.util.config.base_config import BareConfig, ExperimentConfig
+
+# Columns of a (2^k) design table, with the experiment parameter they set and the values of the -1 and 1 levels.
+FACTORS: Dict[str, Tuple[str, Any, Any]] = {
+    '# of nodes': ('nodes', 1, 4),
+    '# of groups': ('number_of_groups', 2, 8),
+    'Jobs per group': ('number_of_jobs_per_group', 3, 9),
+    '# of pipelines': ('pipelines', 1, 4),
+}
+
+# Columns of the result store, besides the statistics of the experiment.
+CELL_COLUMNS = ['key', 'experiment', 'namespace', 'seed']
+
+
+def setup_digest(base: BareConfig, epoch_median: float, epoch_sigma: float) -> str:
+    """
+    Function to get a digest of the setup that is shared by the cells of a sweep, i.e. the base configuration (except
+    its path) and the parameters of the simulated durations, such that results of another setup are not reused.
+    @param base: Configuration that is shared by all cells.
+    @type base: BareConfig
+    @param epoch_median: Median duration of an epoch in the simulation.
+    @type epoch_median: float
+    @param epoch_sigma: Standard deviation of the logarithm of the epoch duration in the simulation.
+    @type epoch_sigma: float
+    @return: Hexadecimal digest of the setup.
+    @rtype: str
+    """
+    config = base.to_dict()
+    config.pop('config_path', None)
+    setup = json.dumps([config, epoch_median, epoch_sigma], sort_keys=True, default=str)
+    return hashlib.sha1(setup.encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class SweepCell:
+    """
+    Single cell of a sweep, i.e. an experiment of the design with its parameters, at a given repetition, simulated with
+    a seed in a setup (see `setup_digest`).
+    """
+    experiment: str
+    parameters: Tuple[Tuple[str, Any], ...]
+    repetition: int
+    seed: int
+    setup: str
+
+    @property
+    def key(self) -> str:
+        parameters = ','.join(f'{name}={value}' for name, value in self.parameters)
+        return f'{self.experiment}|{parameters}|{self.repetition}|{self.seed}|{self.setup}'
+
+    def config(self, base: BareConfig, namespace: str) -> BareConfig:
+        """
+        Function to create the configuration of the cell, without modifying the base configuration.
+        @param base: Configuration that is shared by all cells.
+        @type base: BareConfig
+        @param namespace: Namespace to run the cell in.
+        @type namespace: str
+        @return: Copy of the base configuration with the parameters of the cell.
+        @rtype: BareConfig
+        """
+        config = copy.deepcopy(base)
+        config.experiment = dataclasses.replace(base.experiment, repetition=self.repetition, **dict(self.parameters))
+        config.cluster_config = dataclasses.replace(base.cluster_config, namespace=namespace)
+        return config
+
+
+def read_design(path: Path, factors: Dict[str, Tuple[str, Any, Any]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Function to read a design table, e.g. `configs/2^k setup.csv`. The table is separated by semicolons, with the name of
+    the experiment in the first column. Columns of a factor are coded as -1 (low) and 1 (high), columns named after an
+    ExperimentConfig parameter (e.g. `scheduler`) are used as is, other columns are ignored.
+    @param path: Path to the design table.
+    @type path: Path
+    @param factors: Coding of the factors, by default FACTORS.
+    @type factors: Dict[str, Tuple[str, Any, Any]]
+    @return: List of (experiment, parameters) tuples.
+    @rtype: List[Tuple[str, Dict[str, Any]]]
+    """
+    factors = factors or FACTORS
+    parameter_types = {f.name: f.type for f in dataclasses.fields(ExperimentConfig)}
+    design = []
+    with open(path, encoding='utf-8-sig') as f:
+        reader = csv.reader(f, delimiter=';')
+        header = [column.strip() for column in next(reader)]
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            parameters = {}
+            for column, value in zip(header[1:], row[1:]):
+                if column in factors:
+                    name, low, high = factors[column]
+                    parameters[name] = low if float(value) < 0 else high
+                elif column in parameter_types:
+                    parameters[column] = _parse_value(value.strip(), parameter_types[column])
+            design.append((row[0].strip(), parameters))
+    return design
+
+
+def _parse_value(value: str, tpe: type) -> Any:
+    if tpe is bool:
+        return value.lower() in ('true', '1', 'yes')
+    return tpe(value)
+
+
+def cross_design(design: Sequence[Tuple[str, Dict[str, Any]]], parameter: str,
+                 values: Sequence[Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Function to cross a design with the values of a parameter, e.g. to run every experiment of a 2^k design with every
+    scheduler.
+    @param design: Design to cross.
+    @type design: Sequence[Tuple[str, Dict[str, Any]]]
+    @param parameter: Name of the ExperimentConfig parameter.
+    @type parameter: str
+    @param values: Values of the parameter.
+    @type values: Sequence[Any]
+    @return: Crossed design.
+    @rtype: List[Tuple[str, Dict[str, Any]]]
+    """
+    return [(f'{experiment} ({parameter}={value})', {**parameters, parameter: value})
+            for experiment, parameters in design for value in values]
+
+
+def simulate_cell(config: BareConfig, seed: int, epoch_median: float, epoch_sigma: float) -> List:
+    """
+    Function to simulate a single cell, executed in a worker process.
+    """
+    return Simulator(config, LogNormalDurationModel(epoch_median, epoch_sigma)).run(seed)
+
+
+class ResultStore:
+    """
+    Columnar store of the results of a sweep, saved as a `.npz` file with an array per column. The file is replaced
+    atomically on every checkpoint, such that an interrupted sweep can be resumed from the last checkpoint. Columns that
+    were added to the statistics after a store was written are read as NaN for its rows.
+    """
+
+    COLUMNS = CELL_COLUMNS + STATISTICS_HEADER
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._rows: List[List] = []
+        if self.path.exists():
+            with np.load(self.path) as data:
+                rows = len(data[self.COLUMNS[0]])
+                columns = [data[column].tolist() if column in data else [math.nan] * rows for column in self.COLUMNS]
+            self._rows = [list(row) for row in zip(*columns)]
+        self._keys = {row[0] for row in self._rows}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, row: List) -> None:
+        self._rows.append(row)
+        self._keys.add(row[0])
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Function to get the results per column.
+        @return: Dictionary of column name to array of values.
+        @rtype: Dict[str, np.ndarray]
+        """
+        values = list(zip(*self._rows)) or [[] for _ in self.COLUMNS]
+        return {column: np.asarray(values[i]) for i, column in enumerate(self.COLUMNS)}
+
+    def checkpoint(self) -> None:
+        """
+        Function to write the results to disk, by writing to a temporary file that replaces the store.
+        @return: None
+        @rtype: None
+        """
+        temporary = self.path.with_name(f'.{self.path.name}.tmp')
+        with open(temporary, 'wb') as f:
+            np.savez(f, **self.columns())
+        os.replace(temporary, self.path)
+
+
+class SweepRunner:
+    """
+    Runs the cells of a design (times the number of repetitions) in parallel in a process pool, where every cell is
+    simulated on its own SimulatedClock and cluster. Cells that are already in the ResultStore are skipped, so a sweep
+    continues where it was interrupted.
+    """
+
+    def __init__(self, base_config: BareConfig, design: Sequence[Tuple[str, Dict[str, Any]]], repetitions: int,
+                 store: ResultStore, seed: int = None, epoch_median: float = 60, epoch_sigma: float = 0.25):
+        """
+        @param base_config: Configuration shared by all cells, it is not modified.
+        @type base_config: BareConfig
+        @param design: List of (experiment, parameters) tuples, see `read_design`.
+        @type design: Sequence[Tuple[str, Dict[str, Any]]]
+        @param repetitions: Number of repetitions per experiment of the design.
+        @type repetitions: int
+        @param store: Store to write the results to.
+        @type store: ResultStore
+        @param seed: Seed of the first repetition, repetition `i` of every cell uses seed `seed + i` (common random
+        numbers across the cells). By default, the arrival seed of the configuration.
+        @type seed: int
+        @param epoch_median: Median duration of an epoch in the simulation.
+        @type epoch_median: float
+        @param epoch_sigma: Standard deviation of the logarithm of the epoch duration in the simulation.
+        @type epoch_sigma: float
+        """
+        self.__logger = logging.getLogger('SweepRunner')
+        self._base_config = base_config
+        self._store = store
+        self._seed = seed if seed is not None else base_config.execution_config.reproducibility.arrival_seed
+        self._epoch_median = epoch_median
+        self._epoch_sigma = epoch_sigma
+        setup = setup_digest(base_config, epoch_median, epoch_sigma)
+        self.cells = [SweepCell(experiment, tuple(sorted(parameters.items())), repetition, self._seed + repetition, setup)
+                      for experiment, parameters in design for repetition in range(repetitions)]
+
+    def run(self, workers: int = None, checkpoint_every: int = 100) -> ResultStore:
+        """
+        Function to run the cells that have no results yet.
+        @param workers: Number of worker processes, by default the number of CPUs.
+        @type workers: int
+        @param checkpoint_every: Number of completed cells after which the results are written to disk.
+        @type checkpoint_every: int
+        @return: Store with the results of all cells.
+        @rtype: ResultStore
+        """
+        pending = [(index, cell) for index, cell in enumerate(self.cells) if cell.key not in self._store]
+        self.__logger.info(f'Running {len(pending)} of {len(self.cells)} cells, '
+                           f'{len(self.cells) - len(pending)} completed earlier.')
+        namespace = self._base_config.cluster_config.namespace
+        completed = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for index, cell in pending:
+                cell_namespace = f'{namespace}-{index}'
+                future = executor.submit(simulate_cell, cell.config(self._base_config, cell_namespace), cell.seed,
+                                         self._epoch_median, self._epoch_sigma)
+                futures[future] = (cell, cell_namespace)
+            try:
+                for future in as_completed(futures):
+                    cell, cell_namespace = futures[future]
+                    self._store.add([cell.key, cell.experiment, cell_namespace, cell.seed] + future.result())
+                    completed += 1
+                    if completed % checkpoint_every == 0:
+                        self._store.checkpoint()
+                        self.__logger.info(f'Completed {completed}/{len(pending)} cells.')
+            finally:
+                for future in futures:
+                    future.cancel()
+                self._store.checkpoint()
+        return self._store
@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import threading
+import time
+from abc import abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+
+class Clock:
+    """
+    Source of time for the components of the Orchestrator. Components that need to know the current time, or need to
+    block until something happens, should go through a Clock, such that an experiment can be run in wall-clock time
+    (on a cluster) as well as in simulated time (e.g. in a test).
+
+    realtime: Indicates whether time passes independently of the owner of the clock. When False, other threads cannot
+    make progress while the owner waits, so components need to be driven synchronously.
+    """
+    realtime: bool = True
+
+    @abstractmethod
+    def time(self) -> float:
+        """
+        Function to get the current time of the clock.
+        @return: Current time in seconds.
+        @rtype: float
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    def time_ms(self) -> int:
+        """
+        Function to get the current time of the clock in milliseconds, as used to timestamp tasks.
+        @return: Current time in milliseconds.
+        @rtype: int
+        """
+        return round(self.time() * 1000)
+
+    @abstractmethod
+    def wait(self, condition: threading.Condition, predicate: Callable[[], bool], timeout: float) -> bool:
+        """
+        Function to block until the predicate holds, or the timeout expires. Must be called while holding the lock of
+        the condition, similar to `threading.Condition.wait_for`.
+        @param condition: Condition that is notified when the predicate may have changed.
+        @type condition: threading.Condition
+        @param predicate: Callable that returns True when waiting can stop.
+        @type predicate: Callable[[], bool]
+        @param timeout: Maximum time (in seconds of this clock) to wait.
+        @type timeout: float
+        @return: Last value of the predicate.
+        @rtype: bool
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+
+class WallClock(Clock):
+    """
+    Default clock, follows the system time and blocks the calling thread while waiting.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def wait(self, condition: threading.Condition, predicate: Callable[[], bool], timeout: float) -> bool:
+        return condition.wait_for(predicate, timeout=max(timeout, 0))
+
+
+class SimulatedClock(Clock):
+    """
+    Discrete event clock. Time only advances when the owner of the clock waits, at which point the clock jumps to the
+    next scheduled timer (or the end of the timeout), and runs the callbacks that are due. This allows to run a full
+    experiment (arrivals, deployments and completions) without spending wall-clock time.
+
+    The SimulatedClock is not thread-safe, all callbacks are executed on the thread that calls `wait`.
+    """
+    realtime = False
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._timers: List[Tuple[float, int, Callable[[], None]]] = []
+        self._counter = itertools.count()
+
+    def time(self) -> float:
+        return self._now
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> None:
+        """
+        Schedule a callback to be executed once the simulated time reaches `when`.
+        @param when: Simulated time (in seconds) at which the callback must be executed.
+        @type when: float
+        @param callback: Function without arguments to execute.
+        @type callback: Callable[[], None]
+        @return: None
+        @rtype: None
+        """
+        heapq.heappush(self._timers, (max(when, self._now), next(self._counter), callback))
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> None:
+        """
+        Schedule a callback to be executed after `delay` seconds of simulated time.
+        @param delay: Delay in seconds.
+        @type delay: float
+        @param callback: Function without arguments to execute.
+        @type callback: Callable[[], None]
+        @return: None
+        @rtype: None
+        """
+        self.call_at(self._now + delay, callback)
+
+    def next_timer(self) -> Optional[float]:
+        """
+        Function to get the time of the first pending timer.
+        @return: Simulated time of the next timer, or None when no timers are scheduled.
+        @rtype: Optional[float]
+        """
+        return self._timers[0][0] if self._timers else None
+
+    def advance(self, until: float) -> None:
+        """
+        Advance the simulated time to `until`, executing all timers that are due on the way.
+        @param until: Simulated time to advance to.
+        @type until: float
+        @return: None
+        @rtype: None
+        """
+        self.wait(threading.Condition(), lambda: False, until - self._now)
+
+    def wait(self, condition: threading.Condition, predicate: Callable[[], bool], timeout: float) -> bool:
+        deadline = self._now + max(timeout, 0)
+        result = predicate()
+        while not result:
+            if not self._timers or self._timers[0][0] > deadline:
+                self._now = deadline
+                break
+            when, _, callback = heapq.heappop(self._timers)
+            self._now = when
+            callback()
+            result = predicate()
+        return result
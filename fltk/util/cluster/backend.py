@@ -0,0 +1,146 @@
+from abc import abstractmethod
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def match_labels(obj: Dict[str, Any], label_selector: Optional[str]) -> bool:
+    """
+    Function to check whether an object matches an equality-based label selector, e.g. `app=fltk,tier!=test` (a key
+    without value requires the label to be present).
+    @param obj: Object (dictionary) with metadata.
+    @type obj: Dict[str, Any]
+    @param label_selector: Comma separated requirements, every object matches an empty selector.
+    @type label_selector: Optional[str]
+    @return: True when the object meets all requirements.
+    @rtype: bool
+    """
+    labels = obj.get('metadata', {}).get('labels') or {}
+    for requirement in filter(None, (label_selector or '').split(',')):
+        if '!=' in requirement:
+            key, value = requirement.split('!=', 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif '=' in requirement:
+            key, value = requirement.replace('==', '=').split('=', 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif requirement.strip() not in labels:
+            return False
+    return True
+
+
+def completed(function: Callable[[], Any]) -> Future:
+    """
+    Function to run a call synchronously, with its result (or exception) as a completed future.
+    @param function: Function to call.
+    @type function: Callable[[], Any]
+    @return: Completed future.
+    @rtype: Future
+    """
+    future = Future()
+    try:
+        future.set_result(function())
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class ClusterBackend:
+    """
+    Backend that runs the training jobs of the Orchestrator and Schedule. A job is described by a PyTorchJob (see
+    `fltk.util.cluster.client.construct_job`), and reported in the shape of the PyTorchJob custom resource, i.e. as a
+    dictionary with the conditions (Created, Running, Succeeded or Failed) and start and completion time in its status,
+    as set by the PyTorch operator.
+
+    Backends implement `create`, `get` and `delete` (the subset of `PyTorchJobClient` used by FLTK), and a list+watch
+    source of the jobs for the JobCompletionTracker. Asynchronous variants and bulk deletion complete synchronously,
+    unless a backend overrides them.
+    """
+
+    @abstractmethod
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        """
+        Function to start a job.
+        @param pytorchjob: Job, as V1PyTorchJob or (serialised) dictionary.
+        @type pytorchjob: Union[V1PyTorchJob, Dict[str, Any]]
+        @param namespace: Namespace of the job.
+        @type namespace: str
+        @return: Created job.
+        @rtype: Dict[str, Any]
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    @abstractmethod
+    def get(self, name: str = None, namespace: str = None) -> Dict[str, Any]:
+        """
+        Function to get a job, or all jobs of a namespace.
+        @param name: Name of the job, or None to list the jobs of the namespace.
+        @type name: str
+        @param namespace: Namespace of the job.
+        @type namespace: str
+        @return: Job, or a list response with the jobs under `items`.
+        @rtype: Dict[str, Any]
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    @abstractmethod
+    def delete(self, name: str, namespace: str = None) -> Any:
+        """
+        Function to stop and remove a job.
+        @param name: Name of the job.
+        @type name: str
+        @param namespace: Namespace of the job.
+        @type namespace: str
+        @return: Response of the deletion.
+        @rtype: Any
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    @abstractmethod
+    def source(self, namespace: str):
+        """
+        Function to get the list+watch source of the jobs of a namespace, see `fltk.util.cluster.informer.WatchSource`.
+        @param namespace: Namespace to watch.
+        @type namespace: str
+        @return: Source that can be used by an Informer.
+        @rtype: WatchSource
+        """
+        raise NotImplementedError("Cannot call abstract function")
+
+    def create_async(self, pytorchjob, namespace: str = None) -> Future:
+        return completed(lambda: self.create(pytorchjob, namespace))
+
+    def get_async(self, name: str = None, namespace: str = None) -> Future:
+        return completed(lambda: self.get(name, namespace))
+
+    def delete_collection(self, namespace: str = None, label_selector: str = None) -> List[str]:
+        """
+        Function to delete all jobs of a namespace that match a label selector.
+        @param namespace: Namespace of the jobs.
+        @type namespace: str
+        @param label_selector: Selector of the jobs (e.g. `app=fltk-trainjob`), all jobs of the namespace when None.
+        @type label_selector: str
+        @return: Names of the deleted jobs.
+        @rtype: List[str]
+        """
+        names = [job['metadata']['name'] for job in self.get(namespace=namespace)['items']
+                 if match_labels(job, label_selector)]
+        for name in names:
+            self.delete(name, namespace)
+        return names
+
+    def capacity(self) -> Optional[List[Tuple[int, int]]]:
+        """
+        Function to get the resources of the backend that are available to the jobs, per node (a job is placed on
+        the nodes executor by executor).
+        @return: List of milli-cores and bytes of memory per node (empty while the resources are not known yet), or
+        None when the backend does not know its capacity.
+        @rtype: Optional[List[Tuple[int, int]]]
+        """
+        return None
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
@@ -1,25 +1,37 @@
 import logging
+import threading
 import time
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from multiprocessing.pool import ThreadPool
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from uuid import UUID
 
-import schedule
 from kubeflow.pytorchjob import V1PyTorchJob, V1ReplicaSpec, V1PyTorchJobSpec
 from kubernetes import client
 from kubernetes.client import V1ObjectMeta, V1ResourceRequirements, V1Container, V1PodTemplateSpec, \
-    V1VolumeMount, V1Toleration, V1Volume, V1PersistentVolumeClaimVolumeSource
+    V1VolumeMount, V1Toleration, V1Volume, V1PersistentVolumeClaimVolumeSource, V1EnvVar
 
-from fltk.util.cluster.conversion import Convert
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.cluster.informer import Informer, WatchSource, DELETED, default_key
 from fltk.util.config import BareConfig
+from fltk.util.cpu import CPU_LIMIT_ENV
+from fltk.util.progress import PROGRESS_ADDRESS_ENV
 from fltk.util.singleton import Singleton
 from fltk.util.task.task import ArrivalTask
 
+# Labels of the PyTorchJobs that are deployed by FLTK, e.g. to clear them with a single deletecollection.
+JOB_LABELS = {'app': 'fltk-trainjob'}
+JOB_LABEL_SELECTOR = ','.join(f'{key}={value}' for key, value in JOB_LABELS.items())
+# Labels of the pods of the PyTorchJobs, to tell them apart from the pods that are not deployed by FLTK.
+WORKER_LABELS = {'app': 'fltk-worker'}
+
 
 @dataclass
 class Resource:
+    """
+    Resource aggregate of a node, CPU quantities are in milli-cores, memory quantities in bytes.
+    """
     node_name: str
     cpu_allocatable: int
     memory_allocatable: int
@@ -27,6 +39,9 @@ class Resource:
     memory_requested: int
     cpu_limit: int
     memory_limit: int
+    # Requests of the pods that were not deployed by FLTK, e.g. system pods or other workloads.
+    cpu_requested_other: int = 0
+    memory_requested_other: int = 0
 
 
 class BuildDescription:
@@ -47,20 +62,38 @@ class ResourceWatchDog:
     on GithHub:
 
     https://gist.github.com/gorenje/dff508489c3c8a460433ad709f14b7db
+
+    Instead of periodically listing all pods for every node, the watchdog keeps an informer-style cache, consisting of
+    a single watch on the nodes, and a single watch on the pods of the cluster. The per-node Resource aggregates are
+    updated incrementally on every ADDED/MODIFIED/DELETED event, such that they can be queried in O(1).
     """
     _alive: False
     _time: float = -1
     _node_lookup: Dict[str, client.V1Node] = dict()
     _resource_lookup: Dict[str, Resource] = dict()
 
-    def __init__(self):
+    def __init__(self, node_source: WatchSource = None, pod_source: WatchSource = None):
         """
         Work should be based on the details listed here:
         https://github.com/scylladb/scylla-cluster-tests/blob/a7b09e69f0152a4d70bfb25ded3d75b7e7328acc/sdcm/cluster_k8s/__init__.py#L216-L223
+        @param node_source: Optional list+watch source of nodes, by default the nodes of the cluster are watched.
+        @type node_source: WatchSource
+        @param pod_source: Optional list+watch source of pods, by default the pods in all namespaces are watched.
+        @type pod_source: WatchSource
         """
         self._v1: client.CoreV1Api
         self._logger = logging.getLogger('ResourceWatchDog')
-        self._Q = Convert()
+        self._node_source = node_source
+        self._pod_source = pod_source
+        self._node_informer: Optional[Informer] = None
+        self._pod_informer: Optional[Informer] = None
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._node_lookup = dict()
+        self._resource_lookup = dict()
+        # Contribution of each active pod, keyed by pod key, as (node_name, cpu_req, mem_req, cpu_lim, mem_lim, other),
+        # where other indicates that the pod was not deployed by FLTK.
+        self._pod_usage: Dict[str, Tuple[str, int, int, int, int, bool]] = dict()
 
     def stop(self) -> None:
         """
@@ -71,6 +104,10 @@ class ResourceWatchDog:
         """
         self._logger.info("[WatchDog] Received request to stop execution")
         self._alive = False
+        for informer in (self._node_informer, self._pod_informer):
+            if informer:
+                informer.stop()
+        self._stopped.set()
 
     def start(self) -> None:
         """
@@ -81,75 +118,122 @@ class ResourceWatchDog:
         """
         self._logger.info("Starting resource watchdog")
         self._alive = True
-        self._v1 = client.CoreV1Api()
-        self.__monitor_nodes()
-
-        # Every 10 seconds we check the nodes with all the pods.
-        schedule.every(10).seconds.do(self.__monitor_pods).tag('node-monitoring')
-        # Every 1 minutes we check all the pods (in case the topology changes).
-        schedule.every(1).minutes.do(self.__monitor_pods).tag('pod-monitoring')
+        self._stopped.clear()
+        if not (self._node_source and self._pod_source):
+            self._v1 = client.CoreV1Api()
+        self._node_informer = Informer(self._node_source or WatchSource(self._v1.list_node), name='NodeInformer')
+        self._node_informer.add_handler(self.__on_node_event)
+        self._pod_informer = Informer(self._pod_source or WatchSource(self._v1.list_pod_for_all_namespaces),
+                                      name='PodInformer')
+        self._pod_informer.add_handler(self.__on_pod_event)
 
         self._logger.info("Starting with watching resources")
-        while self._alive:
-            schedule.run_pending()
-            time.sleep(1)
+        self._node_informer.start()
+        self._node_informer.wait_for_sync()
+        self._pod_informer.start()
+        self._stopped.wait()
 
-    def __monitor_nodes(self) -> None:
+    def has_synced(self) -> bool:
         """
-        Watchdog function that watches the Cluster resources in a K8s cluster. Requires the conf to be set and loaded
-        prior to calling.
-        @return: None
-        @rtype: None
+        Function to check whether the nodes and pods of the cluster have been listed, i.e. whether the resource
+        aggregates are complete.
+        @return: True when both informers have synced.
+        @rtype: bool
+        """
+        return all(informer is not None and informer.has_synced()
+                   for informer in (self._node_informer, self._pod_informer))
+
+    def get_resource(self, node_name: str) -> Optional[Resource]:
+        """
+        Function to get the (cached) resource aggregate of a node.
+        @param node_name: Name of the node.
+        @type node_name: str
+        @return: Resource of the node, None if the node is unknown.
+        @rtype: Optional[Resource]
+        """
+        return self._resource_lookup.get(node_name)
+
+    def get_resources(self) -> Dict[str, Resource]:
         """
-        self._logger.info("Fetching node information of cluster...")
-        try:
-            node_list: client.V1NodeList = self._v1.list_node(watch=False)
-            self._node_lookup = {node.metadata.name: node for node in node_list.items}
-            if not self._alive:
-                self._logger.info("Instructed to stop, stopping list_node watch on Kubernetes.")
+        Function to get a snapshot of the resource aggregates of all nodes.
+        @return: Dictionary of node names to a copy of their Resource.
+        @rtype: Dict[str, Resource]
+        """
+        with self._lock:
+            return {name: replace(resource) for name, resource in self._resource_lookup.items()}
+
+    def __on_node_event(self, event_type: str, node: client.V1Node, old: Optional[client.V1Node]) -> None:
+        """
+        Handler of node events, keeps the allocatable resources of the nodes up-to-date.
+        """
+        node_name = node.metadata.name
+        with self._lock:
+            if event_type == DELETED:
+                self._node_lookup.pop(node_name, None)
+                self._resource_lookup.pop(node_name, None)
                 return
-        except Exception as e:
-            self._logger.error(e)
-            raise e
+            self._node_lookup[node_name] = node
+            resource = self.__node_resource(node_name)
+            resource.cpu_allocatable = cpu_to_millicores(node.status.allocatable['cpu'])
+            resource.memory_allocatable = memory_to_bytes(node.status.allocatable['memory'])
 
-    def __monitor_pods(self) -> None:
+    def __on_pod_event(self, event_type: str, pod: client.V1Pod, old: Optional[client.V1Pod]) -> None:
         """
-        Function to monitor pod activity of currently listed pods. The available pods themselves are to be fetched
-        prior to calling this function. Stale pod information will result in incomplete update, as pods will be missed.
-        @return: None
-        @rtype: None
+        Handler of pod events, removes the previous contribution of the pod from the aggregate of its node, and adds
+        the new contribution when the pod is (still) active.
+        """
+        key = default_key(pod)
+        with self._lock:
+            previous = self._pod_usage.pop(key, None)
+            if previous:
+                self.__account(previous, -1)
+            if event_type == DELETED:
+                return
+            usage = self.__pod_usage(pod)
+            if usage:
+                self._pod_usage[key] = usage
+                self.__account(usage, 1)
+
+    def __pod_usage(self, pod: client.V1Pod) -> Optional[Tuple[str, int, int, int, int, bool]]:
         """
-        node: client.V1Node
-        new_resource_mapper = {}
-
-        self._logger.info("Fetching pod information of cluster...")
-        for node_name, node in self._node_lookup.items():
-            try:
-
-                # Create field selector to only get active pods that 'request' memory
-                selector = f'status.phase!=Succeeded,status.phase!=Failed,spec.nodeName={node_name}'
-                # Select pods from all namespaces on specific Kubernetes node
-                # try:
-                pod_list: client.V1PodList = self._v1.list_pod_for_all_namespaces(watch=False, field_selector=selector)
-                # Retrieve allocatable memory of node
-                alloc_cpu, alloc_mem = (self._Q(node.status.allocatable[item]) for item in ['cpu', 'memory'])
-                core_req, core_lim, mem_req, mem_lim = 0, 0, 0, 0
-                for pod in pod_list.items:
-                    for container in pod.spec.containers:
-                        response = container.resources
-                        reqs = defaultdict(lambda: 0, response.requests or {})
-                        lmts = defaultdict(lambda: 0, response.limits or {})
-                        core_req += self._Q(reqs["cpu"])
-                        mem_req += self._Q(reqs["memory"])
-                        core_lim += self._Q(lmts["cpu"])
-                        mem_lim += self._Q(lmts["memory"])
-                resource = Resource(node_name, alloc_cpu, alloc_mem, core_req, mem_req, core_lim, mem_lim)
-                new_resource_mapper[node_name] = resource
-            except Exception as e:
-                self._logger.error(f'Namespace lookup for {node_name} failed. Reason: {e}')
-
-        self._resource_lookup = new_resource_mapper
-        self._logger.debug(self._resource_lookup)
+        Function to calculate the requests and limits of an active pod, i.e. a pod that is bound to a node and that has
+        not terminated.
+        """
+        if not pod.spec.node_name or (pod.status and pod.status.phase in ('Succeeded', 'Failed')):
+            return None
+        core_req, core_lim, mem_req, mem_lim = 0, 0, 0, 0
+        for container in pod.spec.containers:
+            response = container.resources
+            reqs = defaultdict(lambda: 0, (response and response.requests) or {})
+            lmts = defaultdict(lambda: 0, (response and response.limits) or {})
+            core_req += cpu_to_millicores(reqs["cpu"])
+            mem_req += memory_to_bytes(reqs["memory"])
+            core_lim += cpu_to_millicores(lmts["cpu"])
+            mem_lim += memory_to_bytes(lmts["memory"])
+        labels = (pod.metadata and pod.metadata.labels) or {}
+        other = any(labels.get(key) != value for key, value in WORKER_LABELS.items())
+        return pod.spec.node_name, core_req, mem_req, core_lim, mem_lim, other
+
+    def __account(self, usage: Tuple[str, int, int, int, int, bool], sign: int) -> None:
+        node_name, core_req, mem_req, core_lim, mem_lim, other = usage
+        if sign < 0 and node_name not in self._resource_lookup:
+            # Node (and its aggregate) was already removed.
+            return
+        resource = self.__node_resource(node_name)
+        resource.cpu_requested += sign * core_req
+        resource.memory_requested += sign * mem_req
+        resource.cpu_limit += sign * core_lim
+        resource.memory_limit += sign * mem_lim
+        if other:
+            resource.cpu_requested_other += sign * core_req
+            resource.memory_requested_other += sign * mem_req
+
+    def __node_resource(self, node_name: str) -> Resource:
+        resource = self._resource_lookup.get(node_name)
+        if resource is None:
+            resource = Resource(node_name, 0, 0, 0, 0, 0, 0)
+            self._resource_lookup[node_name] = resource
+        return resource
 
 
 class ClusterManager(metaclass=Singleton):
@@ -177,6 +261,36 @@ class ClusterManager(metaclass=Singleton):
         self.__thread_pool.apply_async(self._watchdog.start)
         self.__thread_pool.apply_async(self._run)
 
+    def get_resource(self, node_name: str) -> Optional[Resource]:
+        """
+        Function to get the cached resource aggregate of a node, as maintained by the ResourceWatchDog.
+        @param node_name: Name of the node.
+        @type node_name: str
+        @return: Resource of the node, None if the node is unknown.
+        @rtype: Optional[Resource]
+        """
+        return self._watchdog.get_resource(node_name)
+
+    def get_resources(self) -> Dict[str, Resource]:
+        """
+        Function to get a snapshot of the resource aggregates of all nodes in the cluster.
+        @return: Dictionary of node names to their Resource.
+        @rtype: Dict[str, Resource]
+        """
+        return self._watchdog.get_resources()
+
+    def get_capacity(self) -> List[Tuple[int, int]]:
+        """
+        Function to get the resources per node that are available to the PyTorchJobs of FLTK, i.e. the allocatable
+        resources minus the requests of the pods that were not deployed by FLTK.
+        @return: List of (milli-cores, bytes of memory) per node, empty until the ResourceWatchDog has synced.
+        @rtype: List[Tuple[int, int]]
+        """
+        if not self._watchdog.has_synced():
+            return []
+        return [(r.cpu_allocatable - r.cpu_requested_other, r.memory_allocatable - r.memory_requested_other)
+                for r in self._watchdog.get_resources().values() if r.cpu_allocatable]
+
     def _stop(self):
         self._logger.info("Stopping execution of ClusterManager, halting components...")
         self._watchdog.stop()
@@ -230,12 +344,24 @@ class DeploymentBuilder:
                    f'--backend gloo')
         return command.split(' ')
 
+    @staticmethod
+    def _generate_env(config: BareConfig, task: ArrivalTask) -> List[V1EnvVar]:
+        # The clients size their thread pools to the CPU limit of the container, see `fltk.util.cpu`.
+        env = [V1EnvVar(name=CPU_LIMIT_ENV, value=str(task.sys_conf.executor_cores))]
+        orchestrator = config.cluster_config.orchestrator
+        if orchestrator.progress_port is not None:
+            # The clients report their progress to the service of the Orchestrator, see `fltk.util.progress`.
+            env.append(V1EnvVar(name=PROGRESS_ADDRESS_ENV,
+                                value=f'{orchestrator.service}:{orchestrator.progress_port}'))
+        return env
+
     def _build_container(self, conf: BareConfig, task: ArrivalTask, name: str = "pytorch",
                          vol_mnts: List[V1VolumeMount] = None) -> V1Container:
         return V1Container(
             name=name,
             image=conf.cluster_config.image,
             command=self._generate_command(conf, task),
+            env=self._generate_env(conf, task),
             image_pull_policy='Always',
             # Set the resources to the pre-generated resources
             resources=self._buildDescription.resources,
@@ -300,12 +426,12 @@ class DeploymentBuilder:
              ]
 
         self._buildDescription.master_template = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(labels={"app": "fltk-worker"}),
+            metadata=client.V1ObjectMeta(labels=dict(WORKER_LABELS)),
             spec=client.V1PodSpec(containers=[self._buildDescription.master_container],
                                   volumes=master_volumes,
                                   tolerations=self._buildDescription.tolerations))
         self._buildDescription.worker_template = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(labels={"app": "fltk-worker"}),
+            metadata=client.V1ObjectMeta(labels=dict(WORKER_LABELS)),
             spec=client.V1PodSpec(containers=[self._buildDescription.worker_container],
                                   tolerations=self._buildDescription.tolerations))
 
@@ -341,7 +467,8 @@ class DeploymentBuilder:
         job = V1PyTorchJob(
             api_version="kubeflow.org/v1",
             kind="PyTorchJob",
-            metadata=V1ObjectMeta(name=f'trainjob-{self._buildDescription.id}', namespace='test'),
+            metadata=V1ObjectMeta(name=f'trainjob-{self._buildDescription.id}', namespace='test',
+                                  labels=dict(JOB_LABELS)),
             spec=self._buildDescription.spec)
         return job
 
@@ -370,3 +497,93 @@ def construct_job(conf: BareConfig, task: ArrivalTask) -> V1PyTorchJob:
     job = dp_builder.construct()
     job.openapi_types = job.swagger_types
     return job
+
+
+def serialize_model(obj: Any) -> Any:
+    """
+    Function to serialise a (Kubernetes or KubeFlow) model into the JSON compatible description that is posted to the
+    API, i.e. with the attribute names of the API and without unset attributes.
+    @param obj: Model, or list/dictionary of models, to serialise.
+    @type obj: Any
+    @return: Serialised description.
+    @rtype: Any
+    """
+    if isinstance(obj, list):
+        return [serialize_model(item) for item in obj]
+    if isinstance(obj, dict):
+        return {key: serialize_model(value) for key, value in obj.items()}
+    types = getattr(obj, 'openapi_types', None) or getattr(obj, 'swagger_types', None)
+    if types is None:
+        return obj
+    return {obj.attribute_map[attribute]: serialize_model(getattr(obj, attribute)) for attribute in types
+            if getattr(obj, attribute) is not None}
+
+
+class JobTemplateCache:
+    """
+    Cache of serialised PyTorchJob descriptions, such that a deployment does not need to build (and serialise) the V1
+    objects of a DeploymentBuilder. A template is built once per job class (network and dataset), executor resources
+    and image (and the parts of the configuration that end up in the description). To construct a job, only its name,
+    the command of its containers and the number of workers are patched into a copy of the template.
+
+    The copy shares the parts of the template that are not patched (e.g. the resources and tolerations), so the
+    constructed jobs must not be modified.
+    """
+
+    def __init__(self, max_templates: int = 1024):
+        """
+        @param max_templates: Maximum number of cached templates, the oldest template is evicted when it is exceeded.
+        @type max_templates: int
+        """
+        self.max_templates = max_templates
+        self._templates: Dict[Tuple, Dict[str, Any]] = dict()
+        self._builder = DeploymentBuilder()
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def construct(self, conf: BareConfig, task: ArrivalTask) -> Dict[str, Any]:
+        """
+        Function to construct the description of a Job, equivalent to the serialisation of `construct_job`.
+        @param conf: configuration object that contains specifics to properly start a client.
+        @type conf: BareConfig
+        @param task: Learning task for which a job description must be made.
+        @type task: ArrivalTask
+        @return: KubeFlow compatible PyTorchJob description, as dictionary.
+        @rtype: Dict[str, Any]
+        """
+        key = self.__key(conf, task)
+        template = self._templates.get(key)
+        if template is None:
+            if len(self._templates) >= self.max_templates:
+                del self._templates[next(iter(self._templates))]
+            template = self._templates[key] = self.__build(conf, task)
+        command = self._builder._generate_command(conf, task)
+        replica_specs = template['spec']['pytorchReplicaSpecs']
+        patched = {'Master': self.__patch(replica_specs['Master'], 1, command)}
+        parallelism = int(task.sys_conf.data_parallelism)
+        if parallelism > 1:
+            patched['Worker'] = self.__patch(replica_specs['Worker'], parallelism - 1, command)
+        return {**template,
+                'metadata': {**template['metadata'], 'name': f'trainjob-{task.id}'},
+                'spec': {**template['spec'], 'pytorchReplicaSpecs': patched}}
+
+    @staticmethod
+    def __key(conf: BareConfig, task: ArrivalTask) -> Tuple:
+        orchestrator = conf.cluster_config.orchestrator
+        return (task.network, task.dataset, task.sys_conf.executor_cores, task.sys_conf.executor_memory,
+                conf.cluster_config.image, conf.config_path, str(conf.get_log_dir()), orchestrator.service,
+                orchestrator.progress_port)
+
+    def __build(self, conf: BareConfig, task: ArrivalTask) -> Dict[str, Any]:
+        # The template is built with workers, which are dropped for tasks without data parallelism.
+        template_task = replace(task, sys_conf=replace(task.sys_conf, data_parallelism=2))
+        return serialize_model(construct_job(conf, template_task))
+
+    @staticmethod
+    def __patch(replica_spec: Dict[str, Any], replicas: int, command: List[str]) -> Dict[str, Any]:
+        pod = replica_spec['template']
+        containers = pod['spec']['containers']
+        return {**replica_spec, 'replicas': replicas,
+                'template': {**pod, 'spec': {**pod['spec'],
+                                            'containers': [{**containers[0], 'command': command}] + containers[1:]}}}
@@ -1,30 +1,107 @@
+import math
+import re
+from decimal import Decimal
+from functools import lru_cache
 from pathlib import Path
 from typing import Union
 
-from pint import UnitRegistry
+QUANTITY_CACHE_SIZE = 4096
+
+# Kubernetes quantity suffixes, see https://kubernetes.io/docs/reference/kubernetes-api/common-definitions/quantity/
+_BINARY_SI = {'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40, 'Pi': 2 ** 50, 'Ei': 2 ** 60}
+_DECIMAL_SI = {'n': Decimal('1e-9'), 'u': Decimal('1e-6'), 'm': Decimal('1e-3'), '': Decimal(1),
+               'k': Decimal('1e3'), 'M': Decimal('1e6'), 'G': Decimal('1e9'), 'T': Decimal('1e12'),
+               'P': Decimal('1e15'), 'E': Decimal('1e18')}
+_QUANTITY = re.compile(r'^([+-]?(?:\d+\.?\d*|\.\d+))(?:([eE][+-]?\d+)|(Ki|Mi|Gi|Ti|Pi|Ei|[numkMGTPE]?))$')
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def parse_quantity(value: Union[str, int, float]) -> Decimal:
+    """
+    Function to parse a Kubernetes quantity (e.g. '500m', '2Gi', '1e3') into its exact numeric value, without using
+    pint. Results are cached per distinct value.
+    @param value: String (or numeric) representation of the quantity.
+    @type value: Union[str, int, float]
+    @return: Exact value of the quantity in base units (cores or bytes).
+    @rtype: Decimal
+    """
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    match = _QUANTITY.match(value.strip())
+    if not match:
+        raise ValueError(f'Invalid quantity: {value!r}')
+    number, exponent, suffix = match.groups()
+    if exponent:
+        return Decimal(number).scaleb(int(exponent[1:]))
+    if suffix in _BINARY_SI:
+        return Decimal(number) * _BINARY_SI[suffix]
+    return Decimal(number) * _DECIMAL_SI[suffix]
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def cpu_to_millicores(value: Union[str, int, float]) -> int:
+    """
+    Function to convert a CPU quantity into milli-cores, e.g. '1' -> 1000 and '250m' -> 250. Fractions of a milli-core
+    are rounded up, like Kubernetes does.
+    @param value: CPU quantity.
+    @type value: Union[str, int, float]
+    @return: Number of milli-cores.
+    @rtype: int
+    """
+    return math.ceil(parse_quantity(value) * 1000)
+
+
+@lru_cache(maxsize=QUANTITY_CACHE_SIZE)
+def memory_to_bytes(value: Union[str, int, float]) -> int:
+    """
+    Function to convert a memory quantity into bytes, e.g. '1Ki' -> 1024 and '1k' -> 1000. Fractions of a byte are
+    rounded up, like Kubernetes does.
+    @param value: Memory quantity.
+    @type value: Union[str, int, float]
+    @return: Number of bytes.
+    @rtype: int
+    """
+    return math.ceil(parse_quantity(value))
 
 
 class Convert:
     """
     Conversion class, wrapper around pint UnitRegistry. Assumes that the active path is set to the project root.
     Otherwise, provide a custom path to the conversion file when called from a different directory.
+
+    Prefer `cpu_to_millicores` and `memory_to_bytes` on hot paths, they do not depend on pint and return integers.
     """
 
     CONVERSION_PATH = Path('configs/quantities/kubernetes.conf')
+    CACHE_SIZE = 1024
 
     def __init__(self, path: Path = None):
+        # Imported here, as clients only need the pint-free parsers.
+        from pint import UnitRegistry
         if path:
             self.__Registry = UnitRegistry(filename=str(path))
         else:
             self.__Registry = UnitRegistry(filename=str(self.CONVERSION_PATH))
+        # Clusters only use a handful of distinct quantities, so conversions are cached per distinct value.
+        self.__convert = lru_cache(maxsize=self.CACHE_SIZE)(self.__to_base_units)
 
-    def __call__(self, value: Union[str, int]) -> int:
+    def __call__(self, value: Union[str, int]) -> float:
         """
-        Function to convert str representation of a CPU/memory quantity into an integer representation. For conversion
+        Function to convert str representation of a CPU/memory quantity into a numeric representation. For conversion
         metrics see `<project_root>/configs/quantities/kubernetes.conf`
         @param value: String representation of CPU/memory to be converted to quantity.
         @type value: str
-        @return: Integer representation of CPU/memory quantity that was provided by the caller.
-        @rtype: int
+        @return: Numeric representation of CPU/memory quantity that was provided by the caller, in cores for CPU and
+        in bytes for memory.
+        @rtype: float
         """
-        return self.__Registry.Quantity(value)
+        return self.__convert(value)
+
+    def uncached(self, value: Union[str, int]) -> float:
+        """
+        Function to convert a quantity without the cache, i.e. by creating a pint Quantity for every call.
+        """
+        return self.__to_base_units(value)
+
+    def __to_base_units(self, value: Union[str, int]) -> float:
+        return self.__Registry.Quantity(value).to_base_units().magnitude
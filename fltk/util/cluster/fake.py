@@ -0,0 +1,156 @@
+import copy
+import datetime
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes.client import ApiClient
+
+from fltk.util.clock import Clock, WallClock
+from fltk.util.cluster.backend import ClusterBackend, match_labels
+from fltk.util.cluster.informer import ADDED, MODIFIED, DELETED
+
+
+def format_timestamp(timestamp: float) -> str:
+    """
+    Function to format a (unix) timestamp in the RFC 3339 format used by the Kubernetes API.
+    """
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakePyTorchJobApi(ClusterBackend):
+    """
+    In-memory stand-in for the PyTorchJob API of a cluster, to run the Orchestrator and Schedule offline (e.g. in tests
+    or simulations). It is a ClusterBackend, and is itself the list+watch source of its jobs (`list`, `watch`).
+
+    Jobs do not run by themselves, their conditions are changed with `start_job` and `finish_job`. All API calls are
+    counted per verb in `calls`.
+    """
+
+    def __init__(self, clock: Clock = None, history_limit: int = 1000, keep_spec: bool = True):
+        """
+        @param clock: Clock used to timestamp conditions.
+        @type clock: Clock
+        @param history_limit: Number of events to keep for watches to resume from. Watches from an older
+        resourceVersion receive a 410 (Gone) error, like the Kubernetes API server.
+        @type history_limit: int
+        @param keep_spec: Whether to store the full PyTorchJob, or only its name and status (which is considerably
+        cheaper to copy, e.g. in simulations).
+        @type keep_spec: bool
+        """
+        self._clock = clock or WallClock()
+        self._history_limit = history_limit
+        self._keep_spec = keep_spec
+        self._condition = threading.Condition()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._resource_version = 0
+        self._serializer: Optional[ApiClient] = None
+        self.calls = Counter()
+
+    def __contains__(self, name: str) -> bool:
+        with self._condition:
+            return name in self._jobs
+
+    # PyTorchJobClient interface
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        self.calls['create'] += 1
+        if not self._keep_spec:
+            name = pytorchjob['metadata']['name'] if isinstance(pytorchjob, dict) else pytorchjob.metadata.name
+            pytorchjob = {'metadata': {'name': name}}
+        elif not isinstance(pytorchjob, dict):
+            if self._serializer is None:
+                self._serializer = ApiClient()
+            pytorchjob = self._serializer.sanitize_for_serialization(pytorchjob)
+        job = copy.deepcopy(pytorchjob)
+        job['metadata']['namespace'] = namespace or job['metadata'].get('namespace')
+        job['metadata']['creationTimestamp'] = format_timestamp(self._clock.time())
+        job['status'] = {'conditions': [self.__condition('Created')]}
+        with self._condition:
+            self._record(ADDED, job)
+        return copy.deepcopy(job)
+
+    def get(self, name: str = None, namespace: str = None, label_selector: str = None, **kwargs) -> Dict[str, Any]:
+        self.calls['get'] += 1
+        with self._condition:
+            if name is None:
+                return {'items': copy.deepcopy([job for job in self._jobs.values()
+                                                if match_labels(job, label_selector)]),
+                        'metadata': {'resourceVersion': str(self._resource_version)}}
+            return copy.deepcopy(self._jobs[name])
+
+    def delete(self, name: str, namespace: str = None) -> None:
+        self.calls['delete'] += 1
+        with self._condition:
+            job = self._jobs[name]
+            self._record(DELETED, job)
+
+    def delete_collection(self, namespace: str = None, label_selector: str = None) -> List[str]:
+        self.calls['deletecollection'] += 1
+        with self._condition:
+            deleted = [job for job in self._jobs.values() if match_labels(job, label_selector)]
+            for job in deleted:
+                self._record(DELETED, job)
+        return [job['metadata']['name'] for job in deleted]
+
+    # Source interface
+
+    def source(self, namespace: str) -> 'FakePyTorchJobApi':
+        return self
+
+    def list(self) -> Tuple[List[Dict[str, Any]], str]:
+        self.calls['list'] += 1
+        with self._condition:
+            return copy.deepcopy(list(self._jobs.values())), str(self._resource_version)
+
+    def watch(self, resource_version: str, timeout: int) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        self.calls['watch'] += 1
+        last_seen = int(resource_version)
+        with self._condition:
+            self._condition.wait_for(lambda: self._resource_version > last_seen, timeout=timeout)
+            if self._events and last_seen < self._events[0][0] - 1:
+                events = [('ERROR', {'code': 410, 'reason': 'Gone'})]
+            else:
+                events = [(event_type, copy.deepcopy(job)) for rv, event_type, job in self._events if rv > last_seen]
+        yield from events
+
+    # Control of the fake cluster
+
+    def start_job(self, name: str) -> None:
+        """
+        Mark a job as running, which sets the start time of the job.
+        """
+        with self._condition:
+            job = copy.deepcopy(self._jobs[name])
+            job['status']['startTime'] = format_timestamp(self._clock.time())
+            job['status']['conditions'].append(self.__condition('Running'))
+            self._record(MODIFIED, job)
+
+    def finish_job(self, name: str, succeeded: bool = True) -> None:
+        """
+        Mark a job as Succeeded (or Failed).
+        """
+        with self._condition:
+            job = copy.deepcopy(self._jobs[name])
+            job['status'].setdefault('startTime', job['metadata']['creationTimestamp'])
+            job['status']['conditions'].append(self.__condition('Succeeded' if succeeded else 'Failed'))
+            job['status']['completionTime'] = format_timestamp(self._clock.time())
+            self._record(MODIFIED, job)
+
+    def _record(self, event_type: str, job: Dict[str, Any]) -> None:
+        self._resource_version += 1
+        job['metadata']['resourceVersion'] = str(self._resource_version)
+        name = job['metadata']['name']
+        if event_type == DELETED:
+            self._jobs.pop(name, None)
+        else:
+            self._jobs[name] = job
+        self._events.append((self._resource_version, event_type, job))
+        if len(self._events) > self._history_limit:
+            del self._events[:len(self._events) - self._history_limit]
+        self._condition.notify_all()
+
+    def __condition(self, condition_type: str) -> Dict[str, str]:
+        now = format_timestamp(self._clock.time())
+        return {'type': condition_type, 'status': 'True', 'lastUpdateTime': now, 'lastTransitionTime': now}
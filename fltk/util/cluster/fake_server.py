@@ -0,0 +1,202 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Sequence
+from urllib.parse import parse_qs, urlparse
+
+from kubeflow.pytorchjob.constants.constants import PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, PYTORCHJOB_PLURAL
+from kubernetes.client import Configuration
+
+from fltk.util.cluster.fake import FakePyTorchJobApi
+
+
+class FakeApiServer:
+    """
+    Local HTTP server that serves the PyTorchJob custom resource API of a FakePyTorchJobApi, such that the ApiGateway
+    (or a PyTorchJobClient) can be tested over real (keep-alive) connections, without a cluster. Supported are create,
+    get, list (with a label selector, and watch), delete and deletecollection of PyTorchJobs, in any namespace.
+
+    Every request can be delayed by `latency` seconds, and fails with probability `fault_rate` with one of the
+    `fault_statuses` (before it is applied), to test concurrency and retries. Requests are counted per verb in
+    `requests`, and accepted connections in `connections`.
+    """
+
+    def __init__(self, api: FakePyTorchJobApi = None, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 fault_rate: float = 0.0, fault_statuses: Sequence[int] = (429, 503), seed: int = None):
+        """
+        @param api: Fake API that holds the jobs, by default an empty FakePyTorchJobApi.
+        @type api: FakePyTorchJobApi
+        @param host: Address to bind to.
+        @type host: str
+        @param port: Port to bind to, by default an arbitrary free port.
+        @type port: int
+        @param latency: Delay of every request in seconds.
+        @type latency: float
+        @param fault_rate: Probability that a request fails.
+        @type fault_rate: float
+        @param fault_statuses: Status codes of the failed requests, drawn uniformly.
+        @type fault_statuses: Sequence[int]
+        @param seed: Seed of the fault injection.
+        @type seed: int
+        """
+        self._logger = logging.getLogger('FakeApiServer')
+        self.api = api or FakePyTorchJobApi()
+        self.latency = latency
+        self.fault_rate = fault_rate
+        self.fault_statuses = tuple(fault_statuses)
+        self.requests = Counter()
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self.__handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def configuration(self) -> Configuration:
+        """
+        Function to create a configuration of the Kubernetes client that points to the server.
+        @return: Configuration without authentication.
+        @rtype: Configuration
+        """
+        configuration = Configuration()
+        configuration.host = self.url
+        return configuration
+
+    def start(self) -> 'FakeApiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='FakeApiServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'FakeApiServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _fault(self) -> int:
+        with self._lock:
+            if self.fault_rate and self._random.random() < self.fault_rate:
+                return self._random.choice(self.fault_statuses)
+        return 0
+
+    def _count(self, verb: str = None, connection: bool = False) -> None:
+        with self._lock:
+            if verb:
+                self.requests[verb] += 1
+            if connection:
+                self.connections += 1
+
+    def __handler(self):
+        server = self
+        path_pattern = re.compile(rf'^/apis/{re.escape(PYTORCHJOB_GROUP)}/{re.escape(PYTORCHJOB_VERSION)}/namespaces/'
+                                  rf'(?P<namespace>[^/]+)/{re.escape(PYTORCHJOB_PLURAL)}(?:/(?P<name>[^/]+))?$')
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps the connections alive between requests.
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, which would otherwise be delayed by Nagle's algorithm.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                server._count(connection=True)
+
+            def log_message(self, format, *args):
+                server._logger.debug(format % args)
+
+            def do_POST(self):
+                self.__handle('create')
+
+            def do_GET(self):
+                self.__handle('get')
+
+            def do_DELETE(self):
+                self.__handle('delete')
+
+            def __handle(self, verb: str):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                match = path_pattern.match(url.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if match is None:
+                    return self.__status(404, 'NotFound', f'Unknown path {url.path}')
+                namespace, name = match.group('namespace'), match.group('name')
+                if name is None and verb != 'create':
+                    verb = {'get': 'list', 'delete': 'deletecollection'}[verb]
+                    if verb == 'list' and query.get('watch') in ('true', '1'):
+                        verb = 'watch'
+                server._count(verb)
+                if server.latency:
+                    time.sleep(server.latency)
+                fault = server._fault()
+                if fault:
+                    return self.__status(fault, 'TooManyRequests' if fault == 429 else 'InternalError',
+                                         'Injected fault', {'Retry-After': '0'} if fault == 429 else None)
+                try:
+                    if verb == 'create':
+                        job = json.loads(body)
+                        if job.get('metadata', {}).get('name') in server.api:
+                            return self.__status(409, 'AlreadyExists', f'{job["metadata"]["name"]} already exists')
+                        return self.__json(201, server.api.create(job, namespace))
+                    if verb == 'get':
+                        return self.__json(200, server.api.get(name, namespace))
+                    if verb == 'list':
+                        jobs = server.api.get(namespace=namespace, label_selector=query.get('labelSelector'))
+                        return self.__json(200, {'apiVersion': f'{PYTORCHJOB_GROUP}/{PYTORCHJOB_VERSION}',
+                                                 'kind': 'PyTorchJobList', **jobs})
+                    if verb == 'watch':
+                        return self.__watch(query.get('resourceVersion') or '0',
+                                            int(query.get('timeoutSeconds') or 60))
+                    if verb == 'delete':
+                        server.api.delete(name, namespace)
+                        return self.__status(200, 'Success', f'Deleted {name}')
+                    deleted = server.api.delete_collection(namespace, query.get('labelSelector'))
+                    return self.__status(200, 'Success', f'Deleted {len(deleted)} jobs')
+                except KeyError:
+                    return self.__status(404, 'NotFound', f'{name} not found')
+                except ValueError as e:
+                    return self.__status(400, 'BadRequest', str(e))
+
+            def __watch(self, resource_version: str, timeout: int):
+                # The stream is sent with chunked encoding, as the watch of the Kubernetes client expects.
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for event_type, job in server.api.watch(resource_version, timeout):
+                    line = json.dumps({'type': event_type, 'object': job}).encode() + b'\n'
+                    self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+            def __json(self, code: int, data: Any, headers: Dict[str, str] = None):
+                payload = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def __status(self, code: int, reason: str, message: str, headers: Dict[str, str] = None):
+                self.__json(code, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Success' if code < 400 else
+                                   'Failure', 'reason': reason, 'message': message, 'code': code}, headers)
+
+        return Handler
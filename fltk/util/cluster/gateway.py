@@ -0,0 +1,287 @@
+import bisect
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from kubeflow.pytorchjob.constants.constants import PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, PYTORCHJOB_PLURAL
+from kubernetes.client import ApiClient, Configuration, CustomObjectsApi, V1DeleteOptions
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+
+# Status codes of responses that are retried, i.e. throttling and (transient) server errors.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LatencyHistogram:
+    """
+    Thread-safe histogram of request latencies, with buckets that double in size from 1 ms up to about a minute.
+    Quantiles are reported as the upper bound of the bucket that contains them.
+    """
+
+    # Upper bounds of the buckets in seconds, the last bucket (above the last bound) is unbounded.
+    BOUNDS = tuple(0.001 * 2 ** i for i in range(17))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = bisect.bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def quantile(self, quantile: float) -> float:
+        """
+        Function to get an upper bound of a quantile of the observed latencies.
+        @param quantile: Quantile to get, between 0 and 1.
+        @type quantile: float
+        @return: Upper bound of the bucket of the quantile in seconds, infinite for the last bucket and NaN when empty.
+        @rtype: float
+        """
+        with self._lock:
+            if not self.count:
+                return math.nan
+            rank = max(1, math.ceil(quantile * self.count))
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= rank:
+                    return self.BOUNDS[index] if index < len(self.BOUNDS) else math.inf
+        return math.inf
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        Function to get the non-empty buckets of the histogram.
+        @return: List of (upper bound in seconds, number of observations) tuples.
+        @rtype: List[Tuple[float, int]]
+        """
+        with self._lock:
+            return [(self.BOUNDS[index] if index < len(self.BOUNDS) else math.inf, count)
+                    for index, count in enumerate(self._counts) if count]
+
+    def summary(self) -> str:
+        return (f'n={self.count} mean={self.mean * 1000:.1f}ms p50<={self.quantile(0.5) * 1000:.0f}ms '
+                f'p90<={self.quantile(0.9) * 1000:.0f}ms p99<={self.quantile(0.99) * 1000:.0f}ms')
+
+
+class ApiGateway:
+    """
+    Concurrent gateway to the PyTorchJob API. It is a drop-in replacement of the subset of `PyTorchJobClient` that is
+    used by FLTK (`create`, `get` and `delete`), and additionally provides:
+        * Asynchronous variants (`create_async`, `get_async`, `delete_async`), that are executed by a bounded pool of
+          workers, which share a pool of keep-alive HTTP connections.
+        * Coalescing of GETs, i.e. a GET of a job (or list) that is already in flight returns the pending response
+          instead of issuing another request.
+        * Retries with exponential backoff (and full jitter) on throttling (429, respecting Retry-After), server
+          errors (5xx) and connection errors. A retried create that conflicts with itself (409) returns the created
+          job, and a retried delete of a job that is gone (404) succeeds.
+        * Bulk deletion by label selector (`delete_collection`).
+        * A latency histogram per verb (`latency`), covering all attempts of a call.
+
+    Responses of coalesced GETs are shared between the callers, so they must not be modified.
+    """
+
+    VERBS = ('create', 'get', 'list', 'delete', 'deletecollection')
+
+    def __init__(self, configuration: Configuration = None, workers: int = 8, retries: int = 5,
+                 backoff: float = 0.05, max_backoff: float = 5.0, api: CustomObjectsApi = None):
+        """
+        @param configuration: Configuration of the API client, by default a copy of the loaded (kube) configuration.
+        @type configuration: Configuration
+        @param workers: Number of concurrent requests (and keep-alive connections).
+        @type workers: int
+        @param retries: Maximum number of retries of a request.
+        @type retries: int
+        @param backoff: Base of the exponential backoff in seconds.
+        @type backoff: float
+        @param max_backoff: Maximum backoff in seconds.
+        @type max_backoff: float
+        @param api: API to use instead of a CustomObjectsApi on the configuration.
+        @type api: CustomObjectsApi
+        """
+        self.__logger = logging.getLogger('ApiGateway')
+        if api is None:
+            configuration = configuration or Configuration.get_default_copy()
+            # A connection per worker, and one for the watch of the JobCompletionTracker.
+            configuration.connection_pool_maxsize = workers + 1
+            api = CustomObjectsApi(ApiClient(configuration))
+        # Exposed like PyTorchJobClient, such that the tracker can watch through the same connection pool.
+        self.custom_api = api
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ApiGateway')
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[Optional[str], Optional[str]], Future] = dict()
+        self.latency: Dict[str, LatencyHistogram] = {verb: LatencyHistogram() for verb in self.VERBS}
+        self.retried = Counter()
+        self.coalesced = 0
+
+    # PyTorchJobClient interface
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        return self.create_async(pytorchjob, namespace).result()
+
+    def get(self, name: str = None, namespace: str = None) -> Dict[str, Any]:
+        return self.get_async(name, namespace).result()
+
+    def delete(self, name: str, namespace: str = None) -> Any:
+        return self.delete_async(name, namespace).result()
+
+    # Asynchronous interface
+
+    def create_async(self, pytorchjob, namespace: str = None) -> Future:
+        """
+        Function to create a PyTorchJob in the background.
+        @param pytorchjob: Job to create, as V1PyTorchJob or (serialised) dictionary.
+        @type pytorchjob: Union[V1PyTorchJob, Dict[str, Any]]
+        @param namespace: Namespace to create the job in.
+        @type namespace: str
+        @return: Future of the created job.
+        @rtype: Future
+        """
+        name = pytorchjob['metadata']['name'] if isinstance(pytorchjob, dict) else pytorchjob.metadata.name
+
+        def request(attempt: int) -> Dict[str, Any]:
+            try:
+                return self.custom_api.create_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace,
+                                                                       PYTORCHJOB_PLURAL, pytorchjob)
+            except ApiException as e:
+                # An earlier attempt was applied, but its response was lost.
+                if e.status == 409 and attempt:
+                    return self.custom_api.get_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION,
+                                                                        namespace, PYTORCHJOB_PLURAL, name)
+                raise
+
+        return self._executor.submit(self.__call, 'create', request)
+
+    def get_async(self, name: str = None, namespace: str = None) -> Future:
+        """
+        Function to get a PyTorchJob, or all PyTorchJobs of a namespace, in the background. Coalesced with a pending
+        GET of the same job (or list).
+        @param name: Name of the job, or None to list the jobs of the namespace.
+        @type name: str
+        @param namespace: Namespace of the job.
+        @type namespace: str
+        @return: Future of the job, or of the list of jobs.
+        @rtype: Future
+        """
+        key = (namespace, name)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if name:
+                future = self._executor.submit(self.__call, 'get', lambda attempt: self.custom_api.
+                                               get_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION,
+                                                                            namespace, PYTORCHJOB_PLURAL, name))
+            else:
+                future = self._executor.submit(self.__call, 'list', lambda attempt: self.custom_api.
+                                               list_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION,
+                                                                             namespace, PYTORCHJOB_PLURAL))
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self.__forget(key, done))
+        return future
+
+    def delete_async(self, name: str, namespace: str = None) -> Future:
+        """
+        Function to delete a PyTorchJob in the background.
+        @param name: Name of the job.
+        @type name: str
+        @param namespace: Namespace of the job.
+        @type namespace: str
+        @return: Future of the response (status) of the deletion.
+        @rtype: Future
+        """
+        def request(attempt: int) -> Any:
+            try:
+                return self.custom_api.delete_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace,
+                                                                       PYTORCHJOB_PLURAL, name, body=V1DeleteOptions())
+            except ApiException as e:
+                # An earlier attempt was applied, but its response was lost.
+                if e.status == 404 and attempt:
+                    return None
+                raise
+
+        return self._executor.submit(self.__call, 'delete', request)
+
+    def delete_collection(self, namespace: str = None, label_selector: str = None) -> Any:
+        """
+        Function to delete all PyTorchJobs of a namespace that match a label selector, with a single request.
+        @param namespace: Namespace of the jobs.
+        @type namespace: str
+        @param label_selector: Selector of the jobs (e.g. `app=fltk-trainjob`), all jobs of the namespace when None.
+        @type label_selector: str
+        @return: Response (status) of the deletion.
+        @rtype: Any
+        """
+        kwargs = {'label_selector': label_selector} if label_selector else {}
+        return self._executor.submit(self.__call, 'deletecollection', lambda attempt: self.custom_api.
+                                     delete_collection_namespaced_custom_object(PYTORCHJOB_GROUP, PYTORCHJOB_VERSION,
+                                                                                namespace, PYTORCHJOB_PLURAL,
+                                                                                **kwargs)).result()
+
+    def close(self) -> None:
+        """
+        Function to wait for the pending requests, and stop the workers.
+        @return: None
+        @rtype: None
+        """
+        self._executor.shutdown(wait=True)
+
+    def log_latencies(self) -> None:
+        for verb, histogram in self.latency.items():
+            if histogram.count:
+                self.__logger.info(f'{verb}: {histogram.summary()}, retried {self.retried[verb]} times')
+        if self.coalesced:
+            self.__logger.info(f'Coalesced {self.coalesced} GETs')
+
+    def __call(self, verb: str, request: Callable[[int], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return request(attempt)
+                except ApiException as e:
+                    if e.status not in RETRY_STATUSES or attempt == self.retries:
+                        raise
+                    delay = self.__delay(attempt, e.headers)
+                    self.__logger.debug(f'Retrying {verb} in {delay:.3f}s after status {e.status}')
+                except HTTPError as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.__delay(attempt)
+                    self.__logger.debug(f'Retrying {verb} in {delay:.3f}s after {e}')
+                with self._lock:
+                    self.retried[verb] += 1
+                time.sleep(delay)
+        finally:
+            self.latency[verb].observe(time.perf_counter() - start)
+
+    def __delay(self, attempt: int, headers=None) -> float:
+        retry_after = headers.get('Retry-After') if headers else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def __forget(self, key: Tuple[Optional[str], Optional[str]], future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
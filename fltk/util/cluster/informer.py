@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+ADDED = 'ADDED'
+MODIFIED = 'MODIFIED'
+DELETED = 'DELETED'
+
+# Handler signature: (event_type, new_object, old_object). On deletion, new_object is the last known state.
+EventHandler = Callable[[str, Any, Optional[Any]], None]
+
+
+def object_meta(obj: Any) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Function to get the name, namespace and resourceVersion of an object returned by the Kubernetes API. Custom objects
+    (such as PyTorchJobs) are returned as dictionaries, core objects (such as V1Pod) as OpenAPI models.
+    @param obj: Object to get the metadata from.
+    @type obj: Any
+    @return: Tuple of (name, namespace, resource_version).
+    @rtype: Tuple[str, Optional[str], Optional[str]]
+    """
+    if isinstance(obj, dict):
+        meta = obj.get('metadata', {})
+        return meta.get('name'), meta.get('namespace'), meta.get('resourceVersion')
+    return obj.metadata.name, obj.metadata.namespace, obj.metadata.resource_version
+
+
+def default_key(obj: Any) -> str:
+    """
+    Cache key of an object, `<namespace>/<name>` for namespaced objects, `<name>` otherwise.
+    """
+    name, namespace, _ = object_meta(obj)
+    return f'{namespace}/{name}' if namespace else name
+
+
+class WatchSource:
+    """
+    List+watch source for a Kubernetes list function, e.g. `CoreV1Api.list_node` or
+    `CustomObjectsApi.list_namespaced_custom_object` (with the group, version, namespace and plural as arguments).
+    """
+
+    def __init__(self, list_func: Callable[..., Any], *args, **kwargs):
+        self._list_func = list_func
+        self._args = args
+        self._kwargs = kwargs
+
+    def list(self) -> Tuple[List[Any], str]:
+        """
+        Perform a full LIST of the resource.
+        @return: Tuple of the listed objects, and the resourceVersion of the list to start watching from.
+        @rtype: Tuple[List[Any], str]
+        """
+        response = self._list_func(*self._args, **self._kwargs)
+        if isinstance(response, dict):
+            return response.get('items', []), response.get('metadata', {}).get('resourceVersion')
+        return response.items, response.metadata.resource_version
+
+    def watch(self, resource_version: str, timeout: int) -> Iterable[Tuple[str, Any]]:
+        """
+        Open a WATCH stream on the resource starting after `resource_version`.
+        @param resource_version: Resource version to resume from.
+        @type resource_version: str
+        @param timeout: Server side timeout of the stream in seconds.
+        @type timeout: int
+        @return: Iterable of (event_type, object) tuples.
+        @rtype: Iterable[Tuple[str, Any]]
+        """
+        stream = watch.Watch().stream(self._list_func, *self._args, resource_version=resource_version,
+                                      timeout_seconds=timeout, **self._kwargs)
+        for event in stream:
+            yield event['type'], event['object']
+
+
+class Informer:
+    """
+    Informer-style cache of a Kubernetes resource. Performs a single LIST followed by a WATCH, which is resumed from the
+    last seen resourceVersion. The local cache is kept up-to-date from the event stream, and registered handlers are
+    called for every ADDED/MODIFIED/DELETED event. Only when the resourceVersion has expired (HTTP 410 Gone) the
+    resource is listed again, after which the differences with the cache are delivered as events.
+    """
+
+    # Delay (in seconds) before retrying after a failed list or watch.
+    _retry_delay: float = 1
+
+    def __init__(self, source, name: str = 'Informer', key: Callable[[Any], str] = default_key,
+                 watch_timeout: int = 300):
+        """
+        @param source: Object providing `list()` and `watch(resource_version, timeout)`, see WatchSource.
+        @type source: WatchSource
+        @param name: Name to use for logging.
+        @type name: str
+        @param key: Function to compute the cache key of an object.
+        @type key: Callable[[Any], str]
+        @param watch_timeout: Timeout of a single watch stream in seconds, after which the watch is resumed.
+        @type watch_timeout: int
+        """
+        self._logger = logging.getLogger(name)
+        self._source = source
+        self._key = key
+        self._watch_timeout = watch_timeout
+        self._lock = threading.RLock()
+        self._cache: Dict[str, Any] = {}
+        self._handlers: List[EventHandler] = []
+        self._resource_version: Optional[str] = None
+        self._synced = threading.Event()
+        self._alive = False
+        self._thread: Optional[threading.Thread] = None
+
+    def add_handler(self, handler: EventHandler) -> None:
+        """
+        Register a handler that is called for every event, with the lock of the informer held.
+        @param handler: Function accepting (event_type, new_object, old_object).
+        @type handler: EventHandler
+        @return: None
+        @rtype: None
+        """
+        self._handlers.append(handler)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def items(self) -> List[Any]:
+        with self._lock:
+            return list(self._cache.values())
+
+    def has_synced(self) -> bool:
+        return self._synced.is_set()
+
+    def wait_for_sync(self, timeout: float = None) -> bool:
+        return self._synced.wait(timeout)
+
+    def start(self) -> None:
+        """
+        Start the informer in a daemon thread.
+        @return: None
+        @rtype: None
+        """
+        self._alive = True
+        self._thread = threading.Thread(target=self.run, name=self._logger.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the informer, the running watch stream is abandoned after it returns (at most `watch_timeout` seconds).
+        @return: None
+        @rtype: None
+        """
+        self._alive = False
+
+    def run(self) -> None:
+        """
+        Blocking list+watch loop, to be run in a separate thread.
+        @return: None
+        @rtype: None
+        """
+        self._alive = True
+        while self._alive:
+            try:
+                self.run_once(self._watch_timeout)
+            except Exception as e:
+                self._logger.warning(f'Watch failed, re-listing. Reason: {e}')
+                self._resource_version = None
+                time.sleep(self._retry_delay)
+
+    def run_once(self, timeout: int) -> None:
+        """
+        Process a single watch stream. Lists the resource first when no (valid) resourceVersion is known.
+        @param timeout: Timeout of the watch stream in seconds.
+        @type timeout: int
+        @return: None
+        @rtype: None
+        """
+        if self._resource_version is None:
+            self._relist()
+        try:
+            for event_type, obj in self._source.watch(self._resource_version, timeout):
+                if event_type == 'ERROR':
+                    code = obj.get('code') if isinstance(obj, dict) else getattr(obj, 'code', None)
+                    if code == 410:
+                        self._logger.info('Resource version expired, re-listing.')
+                        self._resource_version = None
+                        return
+                    raise ApiException(status=code, reason=str(obj))
+                if event_type == 'BOOKMARK':
+                    self._resource_version = object_meta(obj)[2]
+                    continue
+                self._apply(event_type, obj)
+                if not self._alive and self._thread is not None:
+                    return
+        except ApiException as e:
+            if e.status != 410:
+                raise
+            self._logger.info('Resource version expired, re-listing.')
+            self._resource_version = None
+
+    def _relist(self) -> None:
+        items, resource_version = self._source.list()
+        with self._lock:
+            listed = {self._key(obj): obj for obj in items}
+            for key in [key for key in self._cache if key not in listed]:
+                self._apply(DELETED, self._cache[key])
+            for obj in listed.values():
+                self._apply(ADDED, obj)
+            self._resource_version = resource_version
+        self._synced.set()
+
+    def _apply(self, event_type: str, obj: Any) -> None:
+        key = self._key(obj)
+        with self._lock:
+            old = self._cache.get(key)
+            if event_type == DELETED:
+                self._cache.pop(key, None)
+            else:
+                if old is not None and object_meta(old)[2] == object_meta(obj)[2]:
+                    # Unchanged object, e.g. delivered again by a re-list.
+                    return
+                self._cache[key] = obj
+                event_type = MODIFIED if old is not None else ADDED
+            resource_version = object_meta(obj)[2]
+            if resource_version is not None:
+                self._resource_version = resource_version
+            for handler in self._handlers:
+                handler(event_type, obj, old)
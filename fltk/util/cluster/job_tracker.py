@@ -0,0 +1,121 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from kubeflow.pytorchjob.constants.constants import PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, PYTORCHJOB_PLURAL
+
+from fltk.util.cluster.informer import Informer, WatchSource, DELETED
+
+TERMINAL_CONDITIONS = ('succeeded', 'failed')
+
+# Listener signature: (job_name, job) with the job being the PyTorchJob custom object (dictionary).
+CompletionListener = Callable[[str, Dict[str, Any]], None]
+
+
+def job_condition(job: Dict[str, Any]) -> Optional[str]:
+    """
+    Function to get the (lower case) type of the last condition of a PyTorchJob.
+    @param job: PyTorchJob custom object.
+    @type job: Dict[str, Any]
+    @return: Type of the latest condition, or None when the job has no conditions (yet).
+    @rtype: Optional[str]
+    """
+    conditions = (job.get('status') or {}).get('conditions') or []
+    return conditions[-1]['type'].lower() if conditions else None
+
+
+def is_terminal(job: Dict[str, Any]) -> bool:
+    """
+    Function to check whether a PyTorchJob has reached the Succeeded or Failed condition.
+    """
+    return job_condition(job) in TERMINAL_CONDITIONS
+
+
+def pytorchjob_source(job_client, namespace: str):
+    """
+    Function to create the list+watch source of the PyTorchJobs in a namespace. When the provided client is a
+    PyTorchJobClient, the source watches the custom resource through its CustomObjectsApi. Otherwise, the client is
+    expected to implement the source protocol itself (e.g. FakePyTorchJobApi).
+    @param job_client: PyTorchJobClient (or stand-in) that is used to deploy jobs.
+    @type job_client: PyTorchJobClient
+    @param namespace: Namespace to watch.
+    @type namespace: str
+    @return: Source that can be used by an Informer.
+    @rtype: WatchSource
+    """
+    if hasattr(job_client, 'custom_api'):
+        return WatchSource(job_client.custom_api.list_namespaced_custom_object,
+                           PYTORCHJOB_GROUP, PYTORCHJOB_VERSION, namespace, PYTORCHJOB_PLURAL)
+    return job_client
+
+
+class JobCompletionTracker:
+    """
+    Tracker of PyTorchJob completions, based on a single list+watch stream on the PyTorchJob resource in a namespace.
+    The tracker keeps a local status cache keyed by job name, and pushes every transition to a terminal condition
+    (Succeeded or Failed) to its listeners. As such, the number of API calls made does not depend on the number of
+    deployed jobs.
+    """
+
+    def __init__(self, source, name: str = 'JobCompletionTracker'):
+        """
+        @param source: List+watch source of PyTorchJobs, see `pytorchjob_source`.
+        @type source: WatchSource
+        @param name: Name to use for logging.
+        @type name: str
+        """
+        self._logger = logging.getLogger(name)
+        self._informer = Informer(source, name=f'{name}-Informer', key=lambda job: job['metadata']['name'])
+        self._informer.add_handler(self._on_event)
+        self._listeners: List[CompletionListener] = []
+
+    def add_listener(self, listener: CompletionListener) -> None:
+        """
+        Register a listener that is called, from the watching thread, when a job reaches a terminal condition.
+        @param listener: Function accepting the job name and the job object.
+        @type listener: CompletionListener
+        @return: None
+        @rtype: None
+        """
+        self._listeners.append(listener)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Function to get the last known state of a job from the local cache.
+        @param name: Name of the PyTorchJob.
+        @type name: str
+        @return: Cached PyTorchJob, None when it is unknown.
+        @rtype: Optional[Dict[str, Any]]
+        """
+        return self._informer.get(name)
+
+    def start(self) -> None:
+        """
+        Start watching in a daemon thread.
+        """
+        self._logger.info("Starting PyTorchJob completion tracker")
+        self._informer.start()
+
+    def stop(self) -> None:
+        self._informer.stop()
+
+    def sync(self, timeout: int = 0) -> None:
+        """
+        Process the events that are available without starting a thread, e.g. when the source is a stand-in that is
+        driven by a simulated clock.
+        @param timeout: Timeout of the watch in seconds.
+        @type timeout: int
+        @return: None
+        @rtype: None
+        """
+        self._informer.run_once(timeout)
+
+    def _on_event(self, event_type: str, job: Dict[str, Any], old: Optional[Dict[str, Any]]) -> None:
+        if event_type == DELETED or not is_terminal(job):
+            return
+        if old is not None and is_terminal(old):
+            # Already reported.
+            return
+        name = job['metadata']['name']
+        self._logger.debug(f'Job reached terminal condition: {name} -> {job_condition(job)}')
+        for listener in self._listeners:
+            listener(name, job)
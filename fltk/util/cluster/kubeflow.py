@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from fltk.util.cluster.backend import ClusterBackend
+from fltk.util.cluster.client import ClusterManager
+from fltk.util.cluster.gateway import ApiGateway
+from fltk.util.cluster.job_tracker import pytorchjob_source
+from fltk.util.config.base_config import ApiGatewayConfig
+
+
+class KubeflowBackend(ClusterBackend):
+    """
+    Backend that deploys the jobs as PyTorchJobs on a Kubernetes cluster with the KubeFlow PyTorch operator. The API is
+    accessed through an ApiGateway, and the capacity is that of the nodes seen by the ClusterManager.
+    """
+
+    def __init__(self, gateway: ApiGateway = None, cluster_manager: ClusterManager = None,
+                 api_config: ApiGatewayConfig = None):
+        """
+        @param gateway: Gateway to the API, by default a gateway on the loaded (kube) configuration.
+        @type gateway: ApiGateway
+        @param cluster_manager: Manager of the resources of the cluster, None when the capacity is not needed.
+        @type cluster_manager: ClusterManager
+        @param api_config: Configuration of the default gateway.
+        @type api_config: ApiGatewayConfig
+        """
+        if gateway is None:
+            api_config = api_config or ApiGatewayConfig()
+            gateway = ApiGateway(workers=api_config.workers, retries=api_config.retries, backoff=api_config.backoff,
+                                 max_backoff=api_config.max_backoff)
+        self.gateway = gateway
+        self._cluster_manager = cluster_manager
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        return self.gateway.create(pytorchjob, namespace)
+
+    def create_async(self, pytorchjob, namespace: str = None) -> Future:
+        return self.gateway.create_async(pytorchjob, namespace)
+
+    def get(self, name: str = None, namespace: str = None) -> Dict[str, Any]:
+        return self.gateway.get(name, namespace)
+
+    def get_async(self, name: str = None, namespace: str = None) -> Future:
+        return self.gateway.get_async(name, namespace)
+
+    def delete(self, name: str, namespace: str = None) -> Any:
+        return self.gateway.delete(name, namespace)
+
+    def delete_collection(self, namespace: str = None, label_selector: str = None) -> List[str]:
+        # A single request, the API server does not report which jobs were deleted.
+        self.gateway.delete_collection(namespace, label_selector)
+        return []
+
+    def source(self, namespace: str):
+        return pytorchjob_source(self.gateway, namespace)
+
+    def capacity(self) -> Optional[List[Tuple[int, int]]]:
+        return self._cluster_manager.get_capacity() if self._cluster_manager is not None else None
+
+    def stop(self) -> None:
+        self.gateway.log_latencies()
+        self.gateway.close()
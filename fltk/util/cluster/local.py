@@ -0,0 +1,249 @@
+import logging
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+from fltk.util.cluster.backend import ClusterBackend
+from fltk.util.cluster.client import serialize_model
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.cluster.fake import FakePyTorchJobApi
+from fltk.util.cpu import CPUSET_ENV, format_cpuset
+
+# Period of the CPU quota of a cgroup in microseconds, as used by Kubernetes.
+CPU_PERIOD = 100000
+
+
+def free_port() -> int:
+    """
+    Function to find a port that is free, e.g. for the rendezvous of the ranks of a distributed job.
+    @return: Port number.
+    @rtype: int
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind(('', 0))
+        return probe.getsockname()[1]
+
+
+class _Replica:
+    """
+    Process of a replica of a job, and the resources that were assigned to it.
+    """
+
+    def __init__(self, process: subprocess.Popen, cpus: List[int], cgroup: Optional[Path], log: Optional[IO]):
+        self.process = process
+        self.cpus = cpus
+        self.cgroup = cgroup
+        self.log = log
+
+
+class LocalProcessBackend(ClusterBackend):
+    """
+    Backend that runs the replicas of the jobs as `python -m fltk client` processes on this machine, as a stand-in for
+    a cluster with the PyTorch operator. Every replica gets the environment of its container, and the variables that the
+    operator sets for `torch.distributed` (MASTER_ADDR, MASTER_PORT, WORLD_SIZE and RANK), with the Master replica as
+    rank 0.
+
+    The CPU limit of a replica is enforced with its CPU affinity, a set of cores that is disjoint from the other
+    replicas as long as there are enough cores (and shared by the least used cores otherwise). When a (delegated)
+    cgroup v2 directory is configured, every replica additionally runs in a child cgroup with the CPU limit as cpu.max
+    quota and the memory limit as memory.max.
+
+    The conditions of the jobs follow the operator: Created and Running once the replicas are started, Succeeded when
+    all replicas exited successfully, and Failed when a replica failed, after which the other replicas are terminated.
+    """
+
+    # Interval (in seconds) at which the exit of the replicas is checked.
+    _poll_interval: float = 0.2
+
+    def __init__(self, log_dir: Path = None, cgroup: Path = None, python: str = sys.executable,
+                 grace_period: float = 10):
+        """
+        @param log_dir: Directory to write the output of every replica to, discarded when None.
+        @type log_dir: Path
+        @param cgroup: Directory of a cgroup (v2) that the user may create child cgroups in, None to only use the CPU
+        affinity.
+        @type cgroup: Path
+        @param python: Python interpreter that runs the replicas, instead of the `python3` of the container command.
+        @type python: str
+        @param grace_period: Time in seconds that a terminated replica gets to exit, before it is killed.
+        @type grace_period: float
+        """
+        self.__logger = logging.getLogger('LocalProcessBackend')
+        self._log_dir = log_dir
+        self._cgroup = cgroup
+        self._python = python
+        self._grace_period = grace_period
+        self._cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        self._cpu_usage = Counter({cpu: 0 for cpu in self._cpus})
+        self._jobs = FakePyTorchJobApi()
+        self._running: Dict[str, List[_Replica]] = {}
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._alive = False
+        if log_dir is not None:
+            log_dir.mkdir(parents=True, exist_ok=True)
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        if not isinstance(pytorchjob, dict):
+            pytorchjob = serialize_model(pytorchjob)
+        name = pytorchjob['metadata']['name']
+        job = self._jobs.create({'metadata': {'name': name, 'labels': pytorchjob['metadata'].get('labels') or {}}},
+                                namespace)
+        replica_specs = pytorchjob['spec']['pytorchReplicaSpecs']
+        replicas = [(replica_type, replica_specs[replica_type]['template']['spec']['containers'][0])
+                    for replica_type in ('Master', 'Worker') if replica_type in replica_specs
+                    for _ in range(replica_specs[replica_type].get('replicas', 1))]
+        port = free_port()
+        with self._lock:
+            started = []
+            for rank, (replica_type, container) in enumerate(replicas):
+                started.append(self.__launch(name, rank, replica_type, container, port, len(replicas)))
+            self._running[name] = started
+            self.__ensure_monitor()
+        self._jobs.start_job(name)
+        self.__logger.info(f'Started {name} with {len(replicas)} replicas')
+        return job
+
+    def get(self, name: str = None, namespace: str = None) -> Dict[str, Any]:
+        return self._jobs.get(name, namespace)
+
+    def delete(self, name: str, namespace: str = None) -> None:
+        with self._lock:
+            replicas = self._running.pop(name, [])
+        self.__terminate(replicas)
+        self._jobs.delete(name, namespace)
+
+    def source(self, namespace: str) -> FakePyTorchJobApi:
+        return self._jobs
+
+    def capacity(self) -> Optional[List[Tuple[int, int]]]:
+        memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        return [(1000 * (len(self._cpus) or os.cpu_count()), memory)]
+
+    def start(self) -> None:
+        with self._lock:
+            self.__ensure_monitor()
+
+    def stop(self) -> None:
+        self._alive = False
+        with self._lock:
+            running, self._running = self._running, {}
+        for replicas in running.values():
+            self.__terminate(replicas)
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+    def __launch(self, name: str, rank: int, replica_type: str, container: Dict[str, Any], port: int,
+                 world_size: int) -> _Replica:
+        command = list(container['command'])
+        if command[0].startswith('python'):
+            command[0] = self._python
+        limits = (container.get('resources') or {}).get('limits') or {}
+        millicores = cpu_to_millicores(limits['cpu']) if 'cpu' in limits else None
+        cpus = self.__assign_cpus(millicores)
+        env = {**os.environ, **{var['name']: var.get('value', '') for var in container.get('env') or []},
+               'MASTER_ADDR': '127.0.0.1', 'MASTER_PORT': str(port), 'WORLD_SIZE': str(world_size),
+               'RANK': str(rank), 'PYTHONUNBUFFERED': '1'}
+        if cpus:
+            # The replica also pins itself, such that its threads are on its cores even when started before the
+            # affinity below is set.
+            env[CPUSET_ENV] = format_cpuset(cpus)
+        log = None
+        if self._log_dir is not None:
+            log = open(self._log_dir / f'{name}-{replica_type.lower()}-{rank}.log', 'wb')
+        process = subprocess.Popen(command, env=env, stdout=log or subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        if cpus:
+            try:
+                os.sched_setaffinity(process.pid, cpus)
+            except OSError as e:
+                self.__logger.warning(f'Could not set the affinity of {name} rank {rank}: {e}')
+        cgroup = self.__limit(f'{name}-{rank}', process.pid, millicores,
+                              memory_to_bytes(limits['memory']) if 'memory' in limits else None)
+        return _Replica(process, cpus, cgroup, log)
+
+    def __assign_cpus(self, millicores: Optional[int]) -> List[int]:
+        """
+        Function to assign the least used cores to a replica. Requires the lock.
+        """
+        if not self._cpus or millicores is None:
+            return []
+        count = min(len(self._cpus), max(1, math.ceil(millicores / 1000)))
+        cpus = sorted(self._cpus, key=lambda cpu: (self._cpu_usage[cpu], cpu))[:count]
+        for cpu in cpus:
+            self._cpu_usage[cpu] += 1
+        return cpus
+
+    def __limit(self, name: str, pid: int, millicores: Optional[int], memory: Optional[int]) -> Optional[Path]:
+        if self._cgroup is None:
+            return None
+        cgroup = self._cgroup / name
+        try:
+            cgroup.mkdir(exist_ok=True)
+            if millicores is not None:
+                (cgroup / 'cpu.max').write_text(f'{millicores * CPU_PERIOD // 1000} {CPU_PERIOD}')
+            if memory is not None:
+                (cgroup / 'memory.max').write_text(str(memory))
+            (cgroup / 'cgroup.procs').write_text(str(pid))
+        except OSError as e:
+            self.__logger.warning(f'Could not limit {name} with cgroup {cgroup}: {e}')
+        return cgroup
+
+    def __release(self, replica: _Replica) -> None:
+        for cpu in replica.cpus:
+            self._cpu_usage[cpu] -= 1
+        if replica.log is not None:
+            replica.log.close()
+        if replica.cgroup is not None:
+            try:
+                replica.cgroup.rmdir()
+            except OSError:
+                pass
+
+    def __terminate(self, replicas: List[_Replica]) -> None:
+        for replica in replicas:
+            if replica.process.poll() is None:
+                replica.process.terminate()
+        deadline = time.monotonic() + self._grace_period
+        for replica in replicas:
+            try:
+                replica.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                replica.process.kill()
+                replica.process.wait()
+        with self._lock:
+            for replica in replicas:
+                self.__release(replica)
+
+    def __ensure_monitor(self) -> None:
+        if self._monitor is None:
+            self._alive = True
+            self._monitor = threading.Thread(target=self.__watch, name='LocalProcessBackend', daemon=True)
+            self._monitor.start()
+
+    def __watch(self) -> None:
+        while self._alive:
+            time.sleep(self._poll_interval)
+            finished, failed = [], []
+            with self._lock:
+                for name, replicas in list(self._running.items()):
+                    codes = [replica.process.poll() for replica in replicas]
+                    if any(code not in (None, 0) for code in codes):
+                        failed.append((name, self._running.pop(name), codes))
+                    elif all(code == 0 for code in codes):
+                        finished.append(name)
+                        for replica in self._running.pop(name):
+                            self.__release(replica)
+            for name in finished:
+                self._jobs.finish_job(name)
+            for name, replicas, codes in failed:
+                self.__logger.warning(f'{name} failed with exit codes {codes}')
+                self.__terminate(replicas)
+                self._jobs.finish_job(name, succeeded=False)
@@ -0,0 +1,423 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+from argparse import ArgumentParser
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Connection, Listener, Pipe, wait
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fltk.util.cluster.backend import ClusterBackend
+from fltk.util.cluster.client import serialize_model
+from fltk.util.cluster.conversion import cpu_to_millicores, memory_to_bytes
+from fltk.util.cluster.fake import FakePyTorchJobApi
+from fltk.util.config.arguments import LearningParameters, create_client_parser, extract_learning_parameters
+from fltk.util.config.base_config import WorkerPoolConfig
+from fltk.util.results import EpochData
+
+# Environment variable with the key that authenticates the workers to the pool (as hexadecimal string).
+WORKER_AUTHKEY_ENV = 'FLTK_WORKER_AUTHKEY'
+
+
+@dataclass(frozen=True)
+class WorkerHello:
+    """
+    First message of a worker after it connected to the pool.
+
+    name: Name of the worker, e.g. the name of its pod.
+    host: Address at which the other workers of a distributed task can reach the worker.
+    datasets: Datasets that the worker has loaded.
+    """
+    name: str
+    host: str
+    datasets: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class TaskDescriptor:
+    """
+    Task (or rank of a distributed task) that the pool sends to a worker, the equivalent of the client command of a
+    PyTorchJob replica.
+
+    job_name: Name of the PyTorchJob of the task.
+    task_id: Identifier of the task, as passed to the Client.
+    learning_params: Hyper-parameters of the task.
+    rank: Rank of the worker in the task.
+    world_size: Number of workers of the task, None when it is not distributed.
+    master: Address (host and port) of the rank 0 worker, only set for the other ranks of a distributed task.
+    """
+    job_name: str
+    task_id: str
+    learning_params: LearningParameters
+    rank: int = 0
+    world_size: Optional[int] = None
+    master: Optional[Tuple[str, int]] = None
+
+
+@dataclass(frozen=True)
+class Rendezvous:
+    """
+    Port on which the rank 0 worker of a distributed task waits for the other ranks.
+    """
+    job_name: str
+    port: int
+
+
+@dataclass(frozen=True)
+class TaskResult:
+    """
+    Outcome of a task (or rank) on a worker.
+
+    job_name: Name of the PyTorchJob of the task.
+    rank: Rank of the worker in the task.
+    succeeded: Whether the task completed without error.
+    epochs: Data of the epochs that were run.
+    error: Description of the error when the task failed.
+    """
+    job_name: str
+    rank: int
+    succeeded: bool
+    epochs: List[EpochData] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def parse_descriptor(pytorchjob) -> Tuple[TaskDescriptor, int]:
+    """
+    Function to derive the task of a PyTorchJob from the client command of its Master replica, i.e. a worker runs what
+    a pod of the job would have run.
+    @param pytorchjob: Job, as V1PyTorchJob or (serialised) dictionary.
+    @type pytorchjob: Union[V1PyTorchJob, Dict[str, Any]]
+    @return: Tuple of the descriptor of rank 0, and the number of workers of the task.
+    @rtype: Tuple[TaskDescriptor, int]
+    """
+    if not isinstance(pytorchjob, dict):
+        pytorchjob = serialize_model(pytorchjob)
+    replica_specs = pytorchjob['spec']['pytorchReplicaSpecs']
+    command = replica_specs['Master']['template']['spec']['containers'][0]['command']
+    parser = ArgumentParser()
+    create_client_parser(parser.add_subparsers(dest='mode'))
+    # The command is of the form `python3 -m fltk client ...`.
+    args = parser.parse_args(command[command.index('client'):])
+    parallelism = sum(spec.get('replicas', 1) for spec in replica_specs.values())
+    descriptor = TaskDescriptor(pytorchjob['metadata']['name'], args.task_id, extract_learning_parameters(args),
+                                world_size=parallelism if parallelism > 1 else None)
+    return descriptor, parallelism
+
+
+class _PoolWorker:
+    """
+    Connection of the pool to a worker, and the task that it runs.
+    """
+
+    def __init__(self, connection: Connection, hello: WorkerHello):
+        self.connection = connection
+        self.name = hello.name
+        self.host = hello.host
+        self.datasets = set(hello.datasets)
+        self.job: Optional[str] = None
+
+
+class WorkerPool(ClusterBackend):
+    """
+    Pool of warm `fltk worker` processes (or pods) that run the training tasks of the Orchestrator, which saves the pod
+    scheduling, image pull, imports and loading of the datasets of every task. The workers connect to the pool, and
+    receive TaskDescriptors over a `multiprocessing.connection`, authenticated with a shared key.
+
+    The pool is a ClusterBackend, and is itself the list+watch source of its jobs. Created jobs are
+    queued until enough workers are idle (one per replica), in order of creation, and the condition of the jobs (Created,
+    Running, Succeeded or Failed) is kept in a FakePyTorchJobApi. Deleting a running job does not interrupt its
+    workers, their results are discarded.
+    """
+
+    # Interval (in seconds) at which the receiving thread checks whether it was stopped.
+    _poll_interval: float = 0.5
+
+    def __init__(self, config: WorkerPoolConfig, config_path: Path = None, host: str = None, authkey: bytes = None):
+        """
+        @param config: Configuration of the pool.
+        @type config: WorkerPoolConfig
+        @param config_path: Configuration file that the local workers load.
+        @type config_path: Path
+        @param host: Address to accept the workers on, by default only local workers when the pool starts all workers
+        itself, and any address otherwise.
+        @type host: str
+        @param authkey: Key that authenticates the workers, by default from WORKER_AUTHKEY_ENV, or a random key when the
+        pool starts all workers itself.
+        @type authkey: bytes
+        """
+        self.__logger = logging.getLogger('WorkerPool')
+        self._config = config
+        self._config_path = config_path
+        if authkey is None and os.environ.get(WORKER_AUTHKEY_ENV):
+            authkey = bytes.fromhex(os.environ[WORKER_AUTHKEY_ENV])
+        if authkey is None:
+            if not config.local_workers:
+                raise ValueError(f'{WORKER_AUTHKEY_ENV} must be set to accept workers from the cluster')
+            authkey = os.urandom(16)
+        self._authkey = authkey
+        if host is None:
+            host = '127.0.0.1' if config.local_workers else '0.0.0.0'
+        self._listener = Listener((host, config.port), authkey=authkey)
+        self._jobs = FakePyTorchJobApi(keep_spec=False)
+        self._lock = threading.RLock()
+        # Notified when a worker connects.
+        self._connected = threading.Condition(self._lock)
+        self._workers: List[_PoolWorker] = []
+        self._queue: Deque[Tuple[TaskDescriptor, int]] = deque()
+        # Workers of the running jobs that did not report yet, and whether all reported ranks succeeded.
+        self._running: Dict[str, Tuple[List[_PoolWorker], bool]] = {}
+        # Ranks (other than 0) of the distributed jobs that wait for the rendezvous of their rank 0 worker.
+        self._pending_ranks: Dict[str, List[Tuple[_PoolWorker, TaskDescriptor]]] = {}
+        self._wakeup_reader, self._wakeup_writer = Pipe(duplex=False)
+        self._processes: List[subprocess.Popen] = []
+        self._threads: List[threading.Thread] = []
+        self._alive = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._listener.address
+
+    @property
+    def workers(self) -> int:
+        with self._lock:
+            return len(self._workers)
+
+    def capacity(self) -> List[Tuple[int, int]]:
+        """
+        Function to get the resources of the connected workers, the capacity of the Schedule.
+        @return: List of the milli-cores and bytes of memory of every worker.
+        @rtype: List[Tuple[int, int]]
+        """
+        return [(cpu_to_millicores(self._config.cores), memory_to_bytes(self._config.memory))] * self.workers
+
+    def start(self, timeout: float = 300) -> None:
+        """
+        Function to start accepting workers, and to start the local workers of the configuration and wait for them to
+        connect.
+        @param timeout: Maximum time to wait for the local workers in seconds.
+        @type timeout: float
+        @return: None
+        @rtype: None
+        """
+        self._alive = True
+        for target, name in ((self.__accept, 'WorkerPool-Accept'), (self.__receive, 'WorkerPool-Receive')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.__logger.info(f'Accepting workers on {self.address}')
+        if self._config.local_workers:
+            self.spawn_local(self._config.local_workers, self._config_path)
+            if not self.wait_for_workers(self._config.local_workers, timeout):
+                self.__logger.warning(f'Only {self.workers} of {self._config.local_workers} local workers connected')
+
+    def spawn_local(self, count: int, config_path: Path) -> None:
+        """
+        Function to start worker processes on this machine, that connect to the pool.
+        @param count: Number of workers to start.
+        @type count: int
+        @param config_path: Configuration file that the workers load.
+        @type config_path: Path
+        @return: None
+        @rtype: None
+        """
+        host, port = self.address
+        env = {**os.environ, WORKER_AUTHKEY_ENV: self._authkey.hex()}
+        for index in range(count):
+            command = [sys.executable, '-m', 'fltk', 'worker', str(config_path), '--connect',
+                       f'{"127.0.0.1" if host == "0.0.0.0" else host}:{port}', '--name', f'local-{index}']
+            if self._config.datasets:
+                command += ['--datasets', *self._config.datasets]
+            self._processes.append(subprocess.Popen(command, env=env))
+        self.__logger.info(f'Started {count} local workers')
+
+    def wait_for_workers(self, count: int, timeout: float = None) -> bool:
+        """
+        Function to wait until a number of workers is connected.
+        @param count: Number of workers to wait for.
+        @type count: int
+        @param timeout: Maximum time to wait in seconds, None to wait indefinitely.
+        @type timeout: float
+        @return: Whether the workers connected in time.
+        @rtype: bool
+        """
+        with self._connected:
+            return self._connected.wait_for(lambda: len(self._workers) >= count, timeout=timeout)
+
+    def stop(self) -> None:
+        """
+        Function to stop the workers (after their current task) and the pool.
+        @return: None
+        @rtype: None
+        """
+        self._alive = False
+        with self._lock:
+            for worker in self._workers:
+                try:
+                    worker.connection.send(None)
+                except OSError:
+                    pass
+        self._listener.close()
+        self._wakeup_writer.send(None)
+        for process in self._processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+        for thread in self._threads:
+            thread.join(timeout=self._poll_interval * 2)
+
+    # ClusterBackend interface
+
+    def create(self, pytorchjob, namespace: str = None) -> Dict[str, Any]:
+        descriptor, parallelism = parse_descriptor(pytorchjob)
+        job = self._jobs.create({'metadata': {'name': descriptor.job_name}}, namespace)
+        if self._config.local_workers and parallelism > self._config.local_workers:
+            # Only the local workers connect to the pool, so the job can never start.
+            self.__logger.error(f'{descriptor.job_name} needs {parallelism} workers, the pool has '
+                                f'{self._config.local_workers}')
+            self._jobs.finish_job(descriptor.job_name, False)
+            return job
+        with self._lock:
+            self._queue.append((descriptor, parallelism))
+            self.__dispatch()
+        return job
+
+    def get(self, name: str = None, namespace: str = None, **kwargs) -> Dict[str, Any]:
+        return self._jobs.get(name, namespace, **kwargs)
+
+    def delete(self, name: str, namespace: str = None) -> None:
+        with self._lock:
+            self._queue = deque(item for item in self._queue if item[0].job_name != name)
+            # The workers of a running job complete it (with all ranks), but the result is discarded.
+            self._running.pop(name, None)
+        self._jobs.delete(name, namespace)
+
+    def delete_collection(self, namespace: str = None, label_selector: str = None) -> List[str]:
+        # The jobs of the pool are not labelled, all of them are deleted.
+        deleted = [job['metadata']['name'] for job in self._jobs.get(namespace=namespace)['items']]
+        for name in deleted:
+            self.delete(name, namespace)
+        return deleted
+
+    def source(self, namespace: str) -> 'WorkerPool':
+        return self
+
+    # Source interface
+
+    def list(self):
+        return self._jobs.list()
+
+    def watch(self, resource_version: str, timeout: int):
+        return self._jobs.watch(resource_version, timeout)
+
+    def __accept(self) -> None:
+        while self._alive:
+            try:
+                connection = self._listener.accept()
+                hello = connection.recv()
+            except (OSError, EOFError, AuthenticationError) as e:
+                if self._alive:
+                    self.__logger.warning(f'Could not accept a worker: {e}')
+                continue
+            worker = _PoolWorker(connection, hello)
+            with self._lock:
+                self._workers.append(worker)
+                self._connected.notify_all()
+                self.__dispatch()
+            self.__logger.info(f'Worker {worker.name} connected with datasets {sorted(worker.datasets)}')
+            self._wakeup_writer.send(None)
+
+    def __receive(self) -> None:
+        while self._alive:
+            with self._lock:
+                connections = {worker.connection: worker for worker in self._workers}
+            for ready in wait([self._wakeup_reader, *connections], timeout=self._poll_interval):
+                if ready is self._wakeup_reader:
+                    self._wakeup_reader.recv()
+                    continue
+                worker = connections[ready]
+                try:
+                    message = ready.recv()
+                except (OSError, EOFError):
+                    self.__disconnect(worker)
+                    continue
+                with self._lock:
+                    if isinstance(message, Rendezvous):
+                        self.__rendezvous(worker, message)
+                    elif isinstance(message, TaskResult):
+                        self.__complete(worker, message)
+
+    def __dispatch(self) -> None:
+        """
+        Function to start the queued jobs in order, as long as enough workers are idle. Jobs that need more workers than
+        are connected are skipped (until enough workers connect), such that they do not block the queue. Requires the
+        lock.
+        """
+        skipped = deque()
+        while self._queue:
+            descriptor, parallelism = self._queue[0]
+            if parallelism > len(self._workers):
+                skipped.append(self._queue.popleft())
+                continue
+            idle = [worker for worker in self._workers if worker.job is None]
+            if len(idle) < parallelism:
+                break
+            self._queue.popleft()
+            # Prefer the workers that have the dataset of the task loaded.
+            dataset = descriptor.learning_params.dataset
+            workers = sorted(idle, key=lambda worker: dataset not in worker.datasets)[:parallelism]
+            for worker in workers:
+                worker.job = descriptor.job_name
+            self._running[descriptor.job_name] = (workers, True)
+            self._jobs.start_job(descriptor.job_name)
+            if parallelism > 1:
+                # The other ranks are sent once the rank 0 worker reports the port it waits on.
+                self._pending_ranks[descriptor.job_name] = [
+                    (worker, TaskDescriptor(descriptor.job_name, descriptor.task_id, descriptor.learning_params, rank,
+                                            parallelism)) for rank, worker in enumerate(workers[1:], 1)]
+            self.__send(workers[0], descriptor)
+        self._queue.extendleft(reversed(skipped))
+
+    def __rendezvous(self, worker: _PoolWorker, rendezvous: Rendezvous) -> None:
+        for rank_worker, descriptor in self._pending_ranks.pop(rendezvous.job_name, []):
+            self.__send(rank_worker, TaskDescriptor(descriptor.job_name, descriptor.task_id,
+                                                    descriptor.learning_params, descriptor.rank,
+                                                    descriptor.world_size, (worker.host, rendezvous.port)))
+
+    def __complete(self, worker: _PoolWorker, result: TaskResult) -> None:
+        worker.job = None
+        # Ranks that were not sent, as rank 0 failed before the rendezvous, are released.
+        for rank_worker, _ in self._pending_ranks.pop(result.job_name, []):
+            rank_worker.job = None
+            self.__complete(rank_worker, TaskResult(result.job_name, -1, False, error='Rank 0 failed'))
+        if result.job_name in self._running:
+            workers, succeeded = self._running[result.job_name]
+            if not result.succeeded:
+                self.__logger.warning(f'Rank {result.rank} of {result.job_name} failed on {worker.name}: '
+                                      f'{result.error}')
+            workers = [other for other in workers if other is not worker]
+            self._running[result.job_name] = (workers, succeeded and result.succeeded)
+            if not workers:
+                del self._running[result.job_name]
+                self._jobs.finish_job(result.job_name, succeeded and result.succeeded)
+        self.__dispatch()
+
+    def __disconnect(self, worker: _PoolWorker) -> None:
+        with self._lock:
+            if worker not in self._workers:
+                return
+            self._workers.remove(worker)
+            if self._alive:
+                self.__logger.warning(f'Worker {worker.name} disconnected')
+            if worker.job is not None:
+                self.__complete(worker, TaskResult(worker.job, -1, False, error='Worker disconnected'))
+
+    def __send(self, worker: _PoolWorker, descriptor: TaskDescriptor) -> None:
+        try:
+            worker.connection.send(descriptor)
+        except OSError:
+            self.__disconnect(worker)
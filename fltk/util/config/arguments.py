@@ -1,13 +1,11 @@
+import importlib
 from argparse import Namespace
 from dataclasses import dataclass
-from typing import List, Tuple, Type
+from typing import TYPE_CHECKING, List, Tuple, Type
 
-import torch.distributed as dist
-import torch.nn
-
-import fltk.nets as nets
-from fltk.datasets import CIFAR10Dataset, FashionMNISTDataset, CIFAR100Dataset, MNIST
-from fltk.datasets.dataset import Dataset
+if TYPE_CHECKING:
+    import torch
+    from fltk.datasets.dataset import Dataset
 
 CLIENT_ARGS: List[Tuple[str, str, str, type]] = \
     [("model", "md", "Which model to train", str),
@@ -23,6 +21,17 @@ CLIENT_ARGS: List[Tuple[str, str, str, type]] = \
      ("optimizer", 'op', "Which optimizer to use during the training process", str)
      ]
 
+# Scheduling policies of the Schedule, selected by `experiment.scheduler` in the configuration.
+SCHEDULERS = ['random', 'fifo', 'fair', 'backfill', 'sjf', 'srpt']
+# Backends of the JobWorkloadPredictor, selected by `experiment.predictor` in the configuration.
+PREDICTORS = ['knn', 'ridge']
+# Backends that run the tasks of the Orchestrator, selected by `cluster.backend` in the configuration.
+CLUSTER_BACKENDS = ['kubeflow', 'local', 'pool']
+# Backends of `torch.distributed` that a client can initialise its process group with (see `torch.distributed.Backend`).
+DISTRIBUTED_BACKENDS = ['gloo', 'nccl', 'mpi']
+# Quantiles of the predicted length that the Schedule can plan with, selected by `experiment.planning_quantile`.
+QUANTILES = [0.5, 0.9, 0.99]
+
 
 @dataclass(frozen=True)
 class LearningParameters:
@@ -35,41 +44,57 @@ class LearningParameters:
     loss: str
     optimizer: str
 
+    # Classes by their qualified name, such that a client only imports the net and dataset it trains (and the
+    # Orchestrator none at all).
     _available_nets = {
-        "CIFAR100ResNet": nets.Cifar100ResNet,
-        "CIFAR100VGG": nets.Cifar100VGG,
-        "CIFAR10CNN": nets.Cifar10CNN,
-        "CIFAR10ResNet": nets.Cifar10ResNet,
-        "FashionMNISTCNN": nets.FashionMNISTCNN,
-        "FashionMNISTResNet": nets.FashionMNISTResNet
+        "CIFAR100ResNet": 'fltk.nets.cifar_100_resnet.Cifar100ResNet',
+        "CIFAR100VGG": 'fltk.nets.cifar_100_vgg.Cifar100VGG',
+        "CIFAR10CNN": 'fltk.nets.cifar_10_cnn.Cifar10CNN',
+        "CIFAR10ResNet": 'fltk.nets.cifar_10_resnet.Cifar10ResNet',
+        "FashionMNISTCNN": 'fltk.nets.fashion_mnist_cnn.FashionMNISTCNN',
+        "FashionMNISTResNet": 'fltk.nets.fashion_mnist_resnet.FashionMNISTResNet'
     }
 
     _available_data = {
-        "CIFAR10": CIFAR10Dataset,
-        "CIFAR100": CIFAR100Dataset,
-        "FashionMNIST": FashionMNISTDataset,
-        "MNIST": MNIST
+        "CIFAR10": 'fltk.datasets.cifar10.CIFAR10Dataset',
+        "CIFAR100": 'fltk.datasets.cifar100.CIFAR100Dataset',
+        "FashionMNIST": 'fltk.datasets.fashion_mnist.FashionMNISTDataset',
+        "MNIST": 'fltk.datasets.mnist.MNIST'
     }
 
     _available_loss = {
-        "CrossEntropy": torch.nn.CrossEntropyLoss
+        "CrossEntropy": 'torch.nn.CrossEntropyLoss'
     }
 
     _available_optimizer = {
-        "Adam": torch.optim.SGD
+        "Adam": 'torch.optim.SGD'
     }
 
-    def get_model_class(self) -> Type[torch.nn.Module]:
-        return self._available_nets.get(self.model)
+    def get_model_class(self) -> Type['torch.nn.Module']:
+        return import_class(self._available_nets.get(self.model))
 
-    def get_dataset_class(self) -> Type[Dataset]:
-        return self._available_data.get(self.dataset)
+    def get_dataset_class(self) -> Type['Dataset']:
+        return import_class(self._available_data.get(self.dataset))
 
     def get_loss(self):
-        return self._available_loss.get(self.loss)
+        return import_class(self._available_loss.get(self.loss))
+
+    def get_optimizer(self) -> Type['torch.optim.Optimizer']:
+        return import_class(self._available_optimizer.get(self.optimizer))
+
 
-    def get_optimizer(self) -> Type[torch.optim.Optimizer]:
-        return self._available_optimizer.get(self.optimizer)
+def import_class(qualified_name: str) -> type:
+    """
+    Function to import a class by its qualified name, e.g. `torch.optim.SGD`.
+    @param qualified_name: Name of the module and class, or None.
+    @type qualified_name: str
+    @return: Class, or None when no name was provided.
+    @rtype: type
+    """
+    if qualified_name is None:
+        return None
+    module, name = qualified_name.rsplit('.', 1)
+    return getattr(importlib.import_module(module), name)
 
 
 def extract_learning_parameters(args: Namespace) -> LearningParameters:
@@ -107,11 +132,66 @@ def create_client_parser(subparsers) -> None:
 
     # Add parameter parser for backend
     client_parser.add_argument('--backend', type=str, help='Distributed backend',
-                               choices=[dist.Backend.GLOO, dist.Backend.NCCL, dist.Backend.MPI],
-                               default=dist.Backend.GLOO)
+                               choices=DISTRIBUTED_BACKENDS, default=DISTRIBUTED_BACKENDS[0])
+
+
+def create_worker_parser(subparsers) -> None:
+    worker_parser = subparsers.add_parser('worker')
+    worker_parser.add_argument('config', type=str)
+    worker_parser.add_argument('--connect', type=str, required=True,
+                               help='Address (host:port) of the worker pool of the Orchestrator')
+    worker_parser.add_argument('--name', type=str, default=None, help='Name of the worker, defaults to the host name')
+    worker_parser.add_argument('--datasets', type=str, nargs='*', default=[],
+                               choices=list(LearningParameters._available_data),
+                               help='Datasets to load before accepting tasks')
 
 
 def create_cluster_parser(subparsers) -> None:
     cluster_parser = subparsers.add_parser('cluster')
     cluster_parser.add_argument('config', type=str)
     cluster_parser.add_argument('-l', '--local', type=bool, default=False)
+    cluster_parser.add_argument('--backend', type=str, default=None, choices=CLUSTER_BACKENDS,
+                                help='Override the backend of the config, the local and pool backends need no cluster')
+
+
+def create_simulator_parser(subparsers) -> None:
+    simulator_parser = subparsers.add_parser('simulate')
+    simulator_parser.add_argument('config', type=str)
+    simulator_parser.add_argument('-r', '--repetitions', type=int, default=1, help='Number of simulated repetitions')
+    simulator_parser.add_argument('-s', '--seed', type=int, default=None,
+                                  help='Seed of the first repetition, defaults to the arrival seed of the config')
+    simulator_parser.add_argument('--scheduler', type=str, default=None, choices=SCHEDULERS,
+                                  help='Override the scheduler of the config')
+    simulator_parser.add_argument('--predictor', type=str, default=None, choices=PREDICTORS,
+                                  help='Override the predictor backend of the config')
+    simulator_parser.add_argument('--planning-quantile', type=float, default=None, choices=QUANTILES,
+                                  help='Override the quantile of the predicted length that the scheduler plans with')
+    simulator_parser.add_argument('--history', type=str, default=None,
+                                  help='Path of a history store to warm start the predictor from (simulated lengths '
+                                       'are not recorded in it)')
+    simulator_parser.add_argument('--epoch-median', type=float, default=60,
+                                  help='Median duration of a training epoch in seconds')
+    simulator_parser.add_argument('--epoch-sigma', type=float, default=0.25,
+                                  help='Standard deviation of the log-normal epoch duration')
+    simulator_parser.add_argument('--node-cpu', type=str, default='3920m', help='Allocatable CPU of a node')
+    simulator_parser.add_argument('--node-memory', type=str, default='13Gi', help='Allocatable memory of a node')
+    simulator_parser.add_argument('-o', '--output', type=str, default='simulated_statistics.csv',
+                                  help='CSV file to write the statistics to')
+
+
+def create_sweep_parser(subparsers) -> None:
+    sweep_parser = subparsers.add_parser('sweep')
+    sweep_parser.add_argument('config', type=str)
+    sweep_parser.add_argument('design', type=str, help='Design table, e.g. "configs/2^k setup.csv"')
+    sweep_parser.add_argument('-r', '--repetitions', type=int, default=5, help='Number of repetitions per experiment')
+    sweep_parser.add_argument('--schedulers', type=str, nargs='*', default=None,
+                              choices=SCHEDULERS, help='Run every experiment with each scheduler')
+    sweep_parser.add_argument('-w', '--workers', type=int, default=None, help='Number of worker processes')
+    sweep_parser.add_argument('-s', '--seed', type=int, default=None,
+                              help='Seed of the first repetition, defaults to the arrival seed of the config')
+    sweep_parser.add_argument('--epoch-median', type=float, default=60,
+                              help='Median duration of a training epoch in seconds')
+    sweep_parser.add_argument('--epoch-sigma', type=float, default=0.25,
+                              help='Standard deviation of the log-normal epoch duration')
+    sweep_parser.add_argument('-o', '--output', type=str, default='sweep_results.npz',
+                              help='Columnar result store, an existing store is resumed')
@@ -1,6 +1,7 @@
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import List, Optional
 
 from dataclasses_json import config, dataclass_json
 
@@ -49,6 +50,48 @@ class TensorboardConfig:
             dir_to_check.mkdir()
 
 
+@dataclass_json
+@dataclass(frozen=True)
+class HistoryConfig:
+    """
+    Persistent history of measured job lengths, see `fltk.job_prediction.history_store.HistoryStore`.
+
+    path: Path of the store (without suffix), shared by experiments that warm start from it.
+    max_age: Age in seconds after which records are evicted, None to keep them.
+    max_records: Maximum number of (newest) records to keep, None for no limit.
+    compact_every: Number of appended records after which the log is compacted.
+    record: Whether the measured lengths of the experiment are recorded in the store, simulations only warm start from
+    it.
+    """
+    path: str
+    max_age: Optional[float] = None
+    max_records: Optional[int] = None
+    compact_every: int = 1000
+    record: bool = True
+
+
+@dataclass_json
+@dataclass(frozen=True)
+class DataLoaderConfig:
+    """
+    Settings of the DataLoaders of the clients, see `torch.utils.data.DataLoader`.
+
+    num_workers: Number of loader processes, 0 to load the batches in the training process.
+    prefetch_factor: Number of batches loaded in advance by every loader process, the default of torch when None.
+    persistent_workers: Whether to keep the loader processes between epochs.
+    test_batch_size: Batch size of the test set, the batch size of the job when None.
+    autotune: Whether the clients time a few batches with candidate settings (within their CPU limit, see
+    `fltk.util.cpu`) before training, and train with the fastest.
+    autotune_batches: Number of batches to time for every candidate.
+    """
+    num_workers: int = 0
+    prefetch_factor: Optional[int] = None
+    persistent_workers: bool = False
+    test_batch_size: Optional[int] = None
+    autotune: bool = False
+    autotune_batches: int = 10
+
+
 @dataclass_json
 @dataclass
 class ExecutionConfig:
@@ -59,6 +102,11 @@ class ExecutionConfig:
     duration: int
     experiment_prefix: str = "experiment"
     cuda: bool = False
+    history: Optional[HistoryConfig] = None
+    # Datasets (e.g. `CIFAR10`) that are augmented and normalised per batch instead of per sample, see
+    # `fltk.datasets.augmentation.BatchAugmentation`.
+    batch_augmentation: List[str] = field(default_factory=list)
+    data_loader: DataLoaderConfig = field(default_factory=DataLoaderConfig)
     default_model_folder_path = "default_models"
     epoch_save_end_suffix = "epoch_end"
     save_model_path = "models"
@@ -75,6 +123,13 @@ class ExperimentConfig:
     scheduler: str
     static: bool
     repetition: int
+    # Aging of the sjf and srpt schedulers, milliseconds of predicted length discounted per millisecond of waiting.
+    aging: float = 0.1
+    # Backend of the JobWorkloadPredictor, see `fltk.job_prediction.backends.BACKENDS`.
+    predictor: str = 'knn'
+    # Quantile of the predicted length that the Schedule plans with (e.g. 0.9 for conservative backfilling), or None to
+    # plan with the point prediction. See `fltk.job_prediction.workload_predictor.JobWorkloadPredictor.QUANTILES`.
+    planning_quantile: Optional[float] = None
 
 
 @dataclass_json
@@ -82,6 +137,8 @@ class ExperimentConfig:
 class OrchestratorConfig:
     service: str
     nic: str
+    # Port on which the Orchestrator receives the per-epoch progress of the clients, disabled when not set.
+    progress_port: Optional[int] = None
 
 @dataclass_json
 @dataclass
@@ -90,6 +147,59 @@ class ClientConfig:
     tensorboard_active: bool
 
 
+@dataclass_json
+@dataclass(frozen=True)
+class ApiGatewayConfig:
+    """
+    Access of the Orchestrator to the Kubernetes API, see `fltk.util.cluster.gateway.ApiGateway`.
+
+    workers: Number of concurrent requests, and of keep-alive connections.
+    retries: Maximum number of retries of a throttled (429) or failed (5xx) request.
+    backoff: Base of the exponential backoff between retries in seconds.
+    max_backoff: Maximum backoff between retries in seconds.
+    """
+    workers: int = 8
+    retries: int = 5
+    backoff: float = 0.05
+    max_backoff: float = 5.0
+
+
+@dataclass_json
+@dataclass(frozen=True)
+class WorkerPoolConfig:
+    """
+    Execution of the tasks by a pool of long-lived `fltk worker` processes (or pods), instead of a PyTorchJob per task,
+    used by the `pool` backend, see `fltk.util.cluster.worker_pool.WorkerPool`.
+
+    port: Port on which the Orchestrator accepts the connections of the workers, 0 for an arbitrary free port.
+    local_workers: Number of worker processes that the Orchestrator starts itself. When 0, the workers are expected to
+    connect from the cluster, with the key of the pool in FLTK_WORKER_AUTHKEY.
+    datasets: Datasets that the workers load before accepting tasks.
+    cores: CPU of a worker, the capacity of the pool is the resources of all connected workers.
+    memory: Memory of a worker.
+    """
+    port: int = 5060
+    local_workers: int = 0
+    datasets: List[str] = field(default_factory=list)
+    cores: str = '1000m'
+    memory: str = '2Gi'
+
+
+@dataclass_json
+@dataclass(frozen=True)
+class LocalBackendConfig:
+    """
+    Execution of the replicas of the tasks as local processes, used by the `local` backend, see
+    `fltk.util.cluster.local.LocalProcessBackend`.
+
+    log_dir: Directory to write the output of the replicas to, discarded when not set.
+    cgroup: Directory of a delegated cgroup (v2) to limit the CPU and memory of the replicas with, when not set only the
+    CPU affinity of the replicas is limited.
+    """
+    log_dir: Optional[str] = None
+    cgroup: Optional[str] = None
+
+
 @dataclass_json
 @dataclass
 class ClusterConfig:
@@ -98,6 +208,12 @@ class ClusterConfig:
     wait_for_clients: bool = True
     namespace: str = 'test'
     image: str = 'fltk:latest'
+    api: ApiGatewayConfig = field(default_factory=ApiGatewayConfig)
+    # Backend that runs the tasks, see `fltk.util.config.arguments.CLUSTER_BACKENDS`: a PyTorchJob per task on the
+    # cluster (kubeflow), local processes per task (local), or a pool of warm workers (pool).
+    backend: str = 'kubeflow'
+    local: LocalBackendConfig = field(default_factory=LocalBackendConfig)
+    worker_pool: WorkerPoolConfig = field(default_factory=WorkerPoolConfig)
 
     def load_incluster_namespace(self):
         with open("/var/run/secrets/kubernetes.io/serviceaccount/namespace") as f:
@@ -211,6 +327,16 @@ class BareConfig(object):
         """
         return self.execution_config.cuda
 
+    def batch_augmentation_enabled(self, dataset: str) -> bool:
+        """
+        Function to check whether a dataset is augmented per batch, rather than per sample.
+        @param dataset: Name of the dataset, as in `LearningParameters`.
+        @type dataset: str
+        @return: True when the batches of the dataset are augmented after collation, False otherwise.
+        @rtype: bool
+        """
+        return dataset in self.execution_config.batch_augmentation
+
     def should_save_model(self, epoch_idx) -> bool:
         """
         @deprecated Returns true/false models should be saved.
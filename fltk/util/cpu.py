@@ -0,0 +1,146 @@
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from fltk.util.cluster.conversion import cpu_to_millicores
+
+# Environment variable of a client container with the CPU limit of the container (`executorCores`, e.g. `1000m`).
+CPU_LIMIT_ENV = 'FLTK_CPU_LIMIT'
+# Environment variable with a cpuset (list format, e.g. `0-3,6`) to pin a client to, not pinned when not set.
+CPUSET_ENV = 'FLTK_CPUSET'
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+
+def parse_cpuset(cpuset: str) -> List[int]:
+    """
+    Function to parse a cpuset in the list format of the kernel, e.g. `0-3,6` -> [0, 1, 2, 3, 6].
+    @param cpuset: Comma separated cores and (inclusive) ranges of cores.
+    @type cpuset: str
+    @return: Sorted cores.
+    @rtype: List[int]
+    """
+    cpus = set()
+    for part in filter(None, (part.strip() for part in cpuset.split(','))):
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def format_cpuset(cpus: List[int]) -> str:
+    """
+    Function to format cores in the list format of the kernel, the inverse of `parse_cpuset`.
+    @param cpus: Cores.
+    @type cpus: List[int]
+    @return: Comma separated cores and ranges of cores.
+    @rtype: str
+    """
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(first) if first == last else f'{first}-{last}' for first, last in ranges)
+
+
+def available_cpus() -> List[int]:
+    """
+    Function to get the cores that the process may run on.
+    @return: Cores of the CPU affinity of the process.
+    @rtype: List[int]
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> Optional[int]:
+    """
+    Function to read the CFS quota of the cgroup of the process, i.e. the CPU limit that Kubernetes sets for a container.
+    Supports cgroup v2 (`cpu.max`) and v1 (`cpu.cfs_quota_us` and `cpu.cfs_period_us`).
+    @param root: Mount point of the cgroup filesystem.
+    @type root: Path
+    @return: Limit in milli-cores, or None when the cgroup has no quota (or cannot be read).
+    @rtype: Optional[int]
+    """
+    try:
+        memberships = Path('/proc/self/cgroup').read_text().splitlines()
+    except OSError:
+        memberships = []
+    candidates = []
+    for membership in memberships:
+        _, controllers, path = membership.split(':', 2)
+        path = path.lstrip('/')
+        if controllers == '':
+            candidates.append(root / path / 'cpu.max')
+        elif 'cpu' in controllers.split(','):
+            candidates.append(root / controllers / path / 'cpu.cfs_quota_us')
+    # Within a cgroup namespace (as in a container), the cgroup of the process is the root of the mount.
+    candidates += [root / 'cpu.max', root / 'cpu' / 'cpu.cfs_quota_us']
+    for candidate in candidates:
+        try:
+            if candidate.name == 'cpu.max':
+                quota, period = candidate.read_text().split()
+            else:
+                quota = candidate.read_text().strip()
+                period = (candidate.parent / 'cpu.cfs_period_us').read_text().strip()
+        except (OSError, ValueError):
+            continue
+        if quota in ('max', '-1'):
+            return None
+        return int(quota) * 1000 // int(period)
+    return None
+
+
+def cpu_limit(cores: str = None) -> int:
+    """
+    Function to get the CPU that the process may use, the smallest of the CPU limit of its container, the quota of its
+    cgroup and the cores of its CPU affinity.
+    @param cores: CPU limit (e.g. `1000m`), by default from CPU_LIMIT_ENV.
+    @type cores: str
+    @return: Limit in milli-cores.
+    @rtype: int
+    """
+    limits = [1000 * len(available_cpus())]
+    cores = cores or os.environ.get(CPU_LIMIT_ENV)
+    if cores:
+        limits.append(cpu_to_millicores(cores))
+    quota = cgroup_cpu_limit()
+    if quota is not None:
+        limits.append(quota)
+    return min(limits)
+
+
+def configure_threads(cores: str = None, cpuset: str = None) -> int:
+    """
+    Function to size the intra-op and inter-op thread pools of torch to the CPU limit of the process. By default torch
+    starts a thread per core of the host, such that co-located replicas oversubscribe the CPU and are throttled by
+    their CFS quota. Fractional limits are rounded down (to at least one thread), as a thread that only gets part of a
+    core stalls the others at every synchronisation.
+    @param cores: CPU limit (e.g. `1000m`), by default from CPU_LIMIT_ENV.
+    @type cores: str
+    @param cpuset: Cores to pin the process to (e.g. `0-3`), by default from CPUSET_ENV.
+    @type cpuset: str
+    @return: Number of threads.
+    @rtype: int
+    """
+    import torch
+
+    logger = logging.getLogger('CPU')
+    cpuset = cpuset or os.environ.get(CPUSET_ENV)
+    if cpuset:
+        try:
+            os.sched_setaffinity(0, parse_cpuset(cpuset))
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not pin to cpuset {cpuset}: {e}')
+    threads = max(1, cpu_limit(cores) // 1000)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(threads)
+    except RuntimeError:
+        # The inter-op pool can only be sized once per process, before it is used (e.g. by a previous task).
+        logger.debug(f'Inter-op threads already set to {torch.get_num_interop_threads()}')
+    logger.info(f'Using {threads} threads on cores {format_cpuset(available_cpus())}')
+    return threads
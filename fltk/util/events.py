@@ -0,0 +1,74 @@
+import threading
+from queue import Queue
+from typing import Callable, List, Set
+
+from fltk.util.clock import Clock, WallClock
+
+
+class EventNotifier:
+    """
+    Wake-up primitive for event driven components. Producers (e.g. the arrival generator, or a job watcher) call
+    `notify` with the kind of event that happened, the consumer blocks in `wait` until at least one event was
+    posted, or the timeout of the next timer expires.
+    """
+
+    ARRIVAL = 'arrival'
+    JOB_STATUS = 'job_status'
+    PROGRESS = 'progress'
+    STOP = 'stop'
+
+    def __init__(self, clock: Clock = None):
+        self._clock = clock or WallClock()
+        self._condition = threading.Condition()
+        self._events: Set[str] = set()
+
+    def notify(self, event: str) -> None:
+        """
+        Post an event and wake up the waiting consumer (if any).
+        @param event: Kind of event that happened.
+        @type event: str
+        @return: None
+        @rtype: None
+        """
+        with self._condition:
+            self._events.add(event)
+            self._condition.notify_all()
+
+    def wait(self, timeout: float) -> Set[str]:
+        """
+        Block until an event is posted, or until the timeout expires.
+        @param timeout: Maximum time to wait in seconds (of the clock of the notifier).
+        @type timeout: float
+        @return: Set of events that were posted since the previous call, empty when the timeout expired.
+        @rtype: Set[str]
+        """
+        with self._condition:
+            self._clock.wait(self._condition, lambda: len(self._events) > 0, timeout)
+            events, self._events = self._events, set()
+        return events
+
+
+class NotifyingQueue(Queue):
+    """
+    Drop-in replacement of `queue.Queue`, that calls its listeners after every put. Allows consumers to be woken up on
+    new items, instead of polling the queue.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        super(NotifyingQueue, self).__init__(maxsize)
+        self._listeners: List[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Register a callable that is called (without arguments) after an item was put on the queue.
+        @param listener: Function to call.
+        @type listener: Callable[[], None]
+        @return: None
+        @rtype: None
+        """
+        self._listeners.append(listener)
+
+    def put(self, item, block=True, timeout=None) -> None:
+        super(NotifyingQueue, self).put(item, block, timeout)
+        for listener in self._listeners:
+            listener()
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import socket
+import threading
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional, Tuple
+
+# Environment variable of a client container with the `host:port` of the ProgressServer of the Orchestrator.
+PROGRESS_ADDRESS_ENV = 'FLTK_PROGRESS_ADDRESS'
+
+
+@dataclass(frozen=True)
+class ProgressReport:
+    """
+    Progress of a training job after an epoch, as reported by its master (rank 0) client.
+
+    task_id: Identifier of the task, i.e. the job is deployed as `trainjob-{task_id}`.
+    epoch: Number of epochs that completed.
+    epochs: Total number of epochs of the job.
+    elapsed: Time since the start of the first epoch in milliseconds, including the tests after every epoch.
+    timestamp: Unix time of the report in seconds (of the clock of the reporter).
+    """
+    task_id: str
+    epoch: int
+    epochs: int
+    elapsed: float
+    timestamp: float = 0.0
+
+    def encode(self) -> bytes:
+        return json.dumps(asdict(self)).encode()
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'ProgressReport':
+        fields = json.loads(data.decode())
+        return cls(str(fields['task_id']), int(fields['epoch']), int(fields['epochs']), float(fields['elapsed']),
+                   float(fields.get('timestamp', 0.0)))
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    Function to parse an address of the form `host:port`.
+    @param address: Address to parse.
+    @type address: str
+    @return: Tuple of the host and port.
+    @rtype: Tuple[str, int]
+    """
+    host, _, port = address.rpartition(':')
+    return host, int(port)
+
+
+class ProgressReporter:
+    """
+    Client side of the progress channel. Reports are sent as single UDP datagrams, such that reporting never blocks
+    (or fails) the training loop, and lost reports only make the estimates of the Orchestrator less accurate.
+    """
+
+    def __init__(self, address: Tuple[str, int]):
+        """
+        @param address: Tuple of the host and port of the ProgressServer.
+        @type address: Tuple[str, int]
+        """
+        self.__logger = logging.getLogger('ProgressReporter')
+        self.address = address
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @classmethod
+    def from_environment(cls) -> Optional['ProgressReporter']:
+        """
+        Function to create a reporter to the address in PROGRESS_ADDRESS_ENV.
+        @return: Reporter, or None when the Orchestrator does not listen for progress.
+        @rtype: Optional[ProgressReporter]
+        """
+        address = os.environ.get(PROGRESS_ADDRESS_ENV)
+        return cls(parse_address(address)) if address else None
+
+    def report(self, report: ProgressReport) -> None:
+        """
+        Function to send a report to the Orchestrator, errors are logged and ignored.
+        @param report: Progress of the job.
+        @type report: ProgressReport
+        @return: None
+        @rtype: None
+        """
+        try:
+            self._socket.sendto(report.encode(), self.address)
+        except OSError as e:
+            self.__logger.warning(f'Could not report progress to {self.address}: {e}')
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class ProgressServer:
+    """
+    Orchestrator side of the progress channel. Receives the datagrams of the ProgressReporters on a daemon thread, and
+    passes the decoded reports to a callback (on that thread).
+    """
+
+    # Interval (in seconds) at which the receiving thread checks whether it was stopped.
+    _poll_interval: float = 0.5
+
+    def __init__(self, on_report: Callable[[ProgressReport], None], host: str = '0.0.0.0', port: int = 0):
+        """
+        @param on_report: Function that is called with every received report.
+        @type on_report: Callable[[ProgressReport], None]
+        @param host: Address to bind to.
+        @type host: str
+        @param port: Port to bind to, by default an arbitrary free port.
+        @type port: int
+        """
+        self.__logger = logging.getLogger('ProgressServer')
+        self._on_report = on_report
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(self._poll_interval)
+        self._thread: Optional[threading.Thread] = None
+        self._alive = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._socket.getsockname()
+
+    def start(self) -> None:
+        self._alive = True
+        self._thread = threading.Thread(target=self.__serve, name='ProgressServer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._alive = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._socket.close()
+
+    def __serve(self) -> None:
+        while self._alive:
+            try:
+                data, sender = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                report = ProgressReport.decode(data)
+            except (ValueError, KeyError, TypeError) as e:
+                self.__logger.warning(f'Ignoring malformed progress report from {sender}: {e}')
+                continue
+            self._on_report(report)
@@ -1,7 +1,10 @@
 from dataclasses import dataclass
+from typing import Optional
 
 import numpy as np
 
+from fltk.util.config.base_config import DataLoaderConfig
+
 
 @dataclass
 class EpochData:
@@ -15,3 +18,5 @@ class EpochData:
     class_recall: np.array
     confusion_mat: np.array
     client_id: str = None
+    # Settings of the DataLoaders that the epoch was trained with, e.g. as chosen by autotuning.
+    data_loader: Optional[DataLoaderConfig] = None
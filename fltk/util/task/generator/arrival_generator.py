@@ -10,6 +10,7 @@ from typing import Dict, List, Union
 
 import numpy as np
 
+from fltk.util.events import NotifyingQueue
 from fltk.util.singleton import Singleton
 from fltk.util.task.config.parameter import TrainTask, JobDescription, ExperimentParser, JobClassParameter
 
@@ -22,7 +23,7 @@ class ArrivalGenerator(metaclass=Singleton):
 
     configuration_path: Path
     logger: logging.Logger = None
-    arrivals: "Queue[Arrival]" = Queue()
+    arrivals: "Queue[Arrival]" = NotifyingQueue()
 
     @abstractmethod
     def load_config(self):
@@ -7,7 +7,9 @@ from typing import Dict, List, Union
 
 import numpy as np
 
+from fltk.util.clock import SimulatedClock
 from fltk.util.config import BareConfig
+from fltk.util.events import NotifyingQueue
 from fltk.util.task.config.parameter import TrainTask, JobDescription, ExperimentParser, JobClassParameter
 from fltk.util.task.generator.arrival_generator import ArrivalGenerator, Arrival
 
@@ -16,6 +18,7 @@ class MultiGroupArrivalGenerator(ArrivalGenerator):
     start_time: float = -1
     stop_time: float = -1
     job_dict: Dict[str, JobDescription] = None
+    _descriptions: List[JobDescription] = None
 
     _tick_list: List[Arrival] = []
     _alive: bool = False
@@ -39,16 +42,20 @@ class MultiGroupArrivalGenerator(ArrivalGenerator):
         logging_name = name or self.__class__.__name__
         self.logger = logging.getLogger(logging_name)
 
-    def load_config(self, alternative_path: Path = None):
+    def load_config(self, alternative_path: Path = None, descriptions: List[JobDescription] = None):
         """
         Load configuration from default path, if alternative path is not provided.
         @param alternative_path: Optional non-default location to load the configuration from.
         @type alternative_path: Path
+        @param descriptions: Already parsed job descriptions, to avoid parsing the configuration again.
+        @type descriptions: List[JobDescription]
         @return: None
         @rtype: None
         """
-        parser = ExperimentParser(config_path=alternative_path or self.configuration_path)
-        experiment_descriptions = parser.parse()
+        if descriptions is None:
+            parser = ExperimentParser(config_path=alternative_path or self.configuration_path)
+            descriptions = parser.parse()
+        experiment_descriptions = self._descriptions = descriptions
         self.job_dict = {}
 
         for g in range(self.__config.experiment.number_of_groups):
@@ -104,16 +111,29 @@ class MultiGroupArrivalGenerator(ArrivalGenerator):
         self.logger.info("Received stopping signal")
         self._alive = False
 
-    def run(self, duration: float):
+    def reset(self, config: BareConfig = None) -> None:
         """
-        Run function to generate arrivals during existence of the Orchestrator. Accounts time-drift correction for
-        long-term execution duration of the generator (i.e. for time taken by Python interpreter).
+        Function to prepare the generator for a new experiment, as the generator is a Singleton. Clears the scheduled
+        and queued arrivals, and (optionally) loads the job descriptions for a different configuration.
+        @param config: Configuration of the next experiment, by default the current configuration is kept.
+        @type config: BareConfig
+        @return: None
+        @rtype: None
+        """
+        if config is not None:
+            self.__config = config
+            self.load_config(descriptions=self._descriptions)
+        self.arrivals = NotifyingQueue()
+        self._tick_list = []
+
+    def populate(self) -> None:
+        """
+        Function to schedule the first arrival of each group.
         @return: None
         @rtype: None
         """
-        np.random.seed(42)
-        self.start_time = time.time()
         self.logger.info("Populating tick lists with initial arrivals")
+        self._tick_list = []
         # schedule first job of each group
         for g in range(self.__config.experiment.number_of_groups):
             task_id = f'train_job_{g}_{0}'
@@ -122,33 +142,78 @@ class MultiGroupArrivalGenerator(ArrivalGenerator):
             self._tick_list.append(new_arrival)
             self.logger.info(f"Arrival {task_id} arrives at {new_arrival.ticks} seconds")
 
+    def tick(self) -> bool:
+        """
+        Function to advance the scheduled arrivals by a single tick (of `_decrement` seconds). Arrivals that are due are
+        put on the arrival queue, after which the next arrival of their group is scheduled.
+        @return: Boolean indicating whether arrivals remain scheduled.
+        @rtype: bool
+        """
+        new_scheduled = []
+        for entry in self._tick_list:
+            entry.ticks -= self._decrement
+            if entry.ticks <= 0:
+                self.arrivals.put(entry)
+                group = entry.task_id.split("_")[2]
+                job = int(entry.task_id.split("_")[3]) + 1
+                new_task_id = f'train_job_{group}_{job}'
+
+                if job >= self.__config.experiment.number_of_jobs_per_group:
+                    continue
+
+                new_arrival = self.generate_arrival(new_task_id)
+                new_scheduled.append(new_arrival)
+                self.logger.info(f"Arrival {new_task_id} arrives at {new_arrival.ticks} seconds")
+            else:
+                new_scheduled.append(entry)
+        self._tick_list = new_scheduled
+        return len(new_scheduled) != 0
+
+    def run(self, duration: float):
+        """
+        Run function to generate arrivals during existence of the Orchestrator. Accounts time-drift correction for
+        long-term execution duration of the generator (i.e. for time taken by Python interpreter).
+        @return: None
+        @rtype: None
+        """
+        np.random.seed(42)
+        self.start_time = time.time()
+        self.populate()
+
         event = multiprocessing.Event()
         while self._alive and time.time() - self.start_time < duration:
             save_time = time.time()
 
-            new_scheduled = []
-            for entry in self._tick_list:
-                entry.ticks -= self._decrement
-                if entry.ticks <= 0:
-                    self.arrivals.put(entry)
-                    group = entry.task_id.split("_")[2]
-                    job = int(entry.task_id.split("_")[3]) + 1
-                    new_task_id = f'train_job_{group}_{job}'
-
-                    if job >= self.__config.experiment.number_of_jobs_per_group:
-                        continue
-
-                    new_arrival = self.generate_arrival(new_task_id)
-                    new_scheduled.append(new_arrival)
-                    self.logger.info(f"Arrival {new_task_id} arrives at {new_arrival.ticks} seconds")
-                else:
-                    new_scheduled.append(entry)
-            self._tick_list = new_scheduled
-
-            if len(new_scheduled) == 0:
+            if not self.tick():
                 self._alive = False
             # Correct for time drift between execution, otherwise drift adds up, and arrivals don't generate correctly
             correction_time = time.time() - save_time
             event.wait(timeout=self._decrement - correction_time)
         self.stop_time = time.time()
         self.logger.info(f"Stopped execution at: {self.stop_time}, duration: {self.stop_time - self.start_time}/{duration}")
+
+    def simulate(self, clock: SimulatedClock, duration: Union[float, int]) -> None:
+        """
+        Function to generate the arrivals on a simulated clock instead of in a thread, i.e. every tick is scheduled as a
+        timer of the clock. The random generators need to be seeded by the caller.
+        @param clock: Simulated clock to schedule the ticks on.
+        @type clock: SimulatedClock
+        @param duration: Duration (in simulated seconds) during which arrivals are generated.
+        @type duration: Union[float, int]
+        @return: None
+        @rtype: None
+        """
+        if not self.logger:
+            self.set_logger()
+        self._alive = True
+        self.start_time = clock.time()
+        self.populate()
+
+        def step():
+            if self._alive and clock.time() - self.start_time < duration and self.tick():
+                clock.call_later(self._decrement, step)
+            else:
+                self._alive = False
+                self.stop_time = clock.time()
+
+        clock.call_later(0, step)
@@ -1,4 +1,5 @@
 from dataclasses import field, dataclass
+from typing import Dict
 from uuid import UUID
 
 from fltk.util.task.config.parameter import SystemParameters, HyperParameters
@@ -25,3 +26,19 @@ class ArrivalTask:
     group_id: str = field(compare=False)
     predicted_length: int = field(compare=False)
     priority: int
+    # Predicted quantiles of the length, e.g. {0.9: ...}, see `JobWorkloadPredictor.QUANTILES`.
+    predicted_quantiles: Dict[float, int] = field(default_factory=dict, compare=False)
+    # Whether the predicted length was learned from measured lengths, i.e. the predictor was trained at the arrival.
+    learned: bool = field(default=False, compare=False)
+
+    def planned_length(self, quantile: float = None) -> int:
+        """
+        Function to get the length to plan the task with.
+        @param quantile: Quantile of the predicted length, or None for the predicted length itself.
+        @type quantile: float
+        @return: Length in milliseconds.
+        @rtype: int
+        """
+        if quantile is None:
+            return self.predicted_length
+        return self.predicted_quantiles[quantile]
@@ -0,0 +1,149 @@
+import logging
+import os
+import socket
+import time
+import traceback
+from multiprocessing.connection import Client as Connect, Connection
+from typing import List, Tuple
+
+import torch.distributed as dist
+
+from fltk.client import Client
+from fltk.util.cluster.local import free_port
+from fltk.util.cluster.worker_pool import Rendezvous, TaskDescriptor, TaskResult, WorkerHello, WORKER_AUTHKEY_ENV
+from fltk.util.config.arguments import LearningParameters
+from fltk.util.config.base_config import BareConfig
+from fltk.util.cpu import configure_threads
+from fltk.util.progress import ProgressReporter
+
+
+class Worker:
+    """
+    Long-lived training process of a WorkerPool. The worker imports the training stack and loads its datasets once,
+    connects to the pool, and runs the tasks it receives, one at a time, as a Client would in a pod of a PyTorchJob.
+    Ranks of a distributed task form a process group (over gloo) that is destroyed after the task.
+    """
+
+    # Interval (in seconds) between attempts to connect to the pool, e.g. when the workers start before the Orchestrator.
+    _connect_interval: float = 1
+
+    def __init__(self, config: BareConfig, address: Tuple[str, int], name: str = None, datasets: List[str] = None,
+                 authkey: bytes = None):
+        """
+        @param config: Configuration of the experiment, shared with the Orchestrator.
+        @type config: BareConfig
+        @param address: Host and port of the WorkerPool.
+        @type address: Tuple[str, int]
+        @param name: Name of the worker, by default the host name.
+        @type name: str
+        @param datasets: Datasets to load before connecting, see `LearningParameters._available_data`.
+        @type datasets: List[str]
+        @param authkey: Key of the pool, by default from WORKER_AUTHKEY_ENV.
+        @type authkey: bytes
+        """
+        self.name = name or socket.gethostname()
+        self.__logger = logging.getLogger(f'Worker-{self.name}')
+        self.config = config
+        self.address = address
+        self.datasets = datasets or []
+        self._authkey = authkey if authkey is not None else bytes.fromhex(os.environ[WORKER_AUTHKEY_ENV])
+        # Workers of a local pool reach each other on the loopback interface.
+        local = address[0] in ('127.0.0.1', 'localhost')
+        self.host = '127.0.0.1' if local else socket.gethostbyname(socket.gethostname())
+        self._reporter = ProgressReporter.from_environment()
+        self._connection: Connection = None
+
+    def preload(self) -> None:
+        """
+        Function to load the datasets of the worker, such that the tasks find them in memory.
+        @return: None
+        @rtype: None
+        """
+        for dataset in self.datasets:
+            start = time.perf_counter()
+            params = LearningParameters(None, dataset, 1, 0, 0.0, 0.0, None, None)
+            params.get_dataset_class()(self.config, params, 0, None)
+            self.__logger.info(f'Loaded {dataset} in {time.perf_counter() - start:.1f}s')
+
+    def connect(self, timeout: float = None) -> None:
+        """
+        Function to connect to the pool, retrying until it accepts.
+        @param timeout: Maximum time to retry in seconds, None to retry indefinitely.
+        @type timeout: float
+        @return: None
+        @rtype: None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self._connection = Connect(self.address, authkey=self._authkey)
+                break
+            except ConnectionRefusedError:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise
+                time.sleep(self._connect_interval)
+        self._connection.send(WorkerHello(self.name, self.host, tuple(self.datasets)))
+        self.__logger.info(f'Connected to pool at {self.address}')
+
+    def run(self) -> None:
+        """
+        Function to run the tasks of the pool, until the pool stops the worker or disconnects.
+        @return: None
+        @rtype: None
+        """
+        configure_threads(self.config.cluster_config.worker_pool.cores)
+        self.preload()
+        self.connect()
+        try:
+            while True:
+                try:
+                    descriptor = self._connection.recv()
+                except (EOFError, OSError):
+                    self.__logger.info('Pool disconnected')
+                    break
+                if descriptor is None:
+                    break
+                self._connection.send(self.run_task(descriptor))
+        finally:
+            self._connection.close()
+            if self._reporter is not None:
+                self._reporter.close()
+
+    def run_task(self, descriptor: TaskDescriptor) -> TaskResult:
+        """
+        Function to run a task (or a rank of a distributed task).
+        @param descriptor: Task to run.
+        @type descriptor: TaskDescriptor
+        @return: Outcome of the task.
+        @rtype: TaskResult
+        """
+        self.__logger.info(f'Running {descriptor.job_name} with rank {descriptor.rank}')
+        distributed = descriptor.world_size is not None
+        try:
+            if distributed:
+                self.__init_process_group(descriptor)
+            client = Client(descriptor.rank, descriptor.task_id, descriptor.world_size, self.config,
+                            descriptor.learning_params)
+            client.prepare_learner(distributed)
+            try:
+                epochs = client.run_epochs(self._reporter)
+            finally:
+                client.stop_learner()
+            return TaskResult(descriptor.job_name, descriptor.rank, True, epochs)
+        except Exception as e:
+            self.__logger.error(f'Task {descriptor.job_name} failed: {e}')
+            return TaskResult(descriptor.job_name, descriptor.rank, False, error=traceback.format_exc())
+        finally:
+            if distributed and dist.is_initialized():
+                dist.destroy_process_group()
+
+    def __init_process_group(self, descriptor: TaskDescriptor) -> None:
+        if descriptor.rank == 0:
+            port = free_port()
+            host = self.host
+            # The pool sends the other ranks the address to join on.
+            self._connection.send(Rendezvous(descriptor.job_name, port))
+        else:
+            host, port = descriptor.master
+        dist.init_process_group(dist.Backend.GLOO, init_method=f'tcp://{host}:{port}', rank=descriptor.rank,
+                                world_size=descriptor.world_size)
@@ -0,0 +1,173 @@
+import dataclasses
+import json
+import uuid
+
+import pytest
+
+from fltk.job_prediction.workload_predictor import JobWorkloadPredictor
+from fltk.schedulers.schedule import Schedule
+from fltk.util.clock import SimulatedClock
+from fltk.util.cluster.fake import FakePyTorchJobApi
+from fltk.util.config import BareConfig
+from fltk.util.task.config.parameter import HyperParameters, SystemParameters
+from fltk.util.task.task import ArrivalTask
+
+NODE = (4000, 16 * 2 ** 30)
+
+
+class Experiment:
+    """
+    Schedule on a SimulatedClock, of which the jobs run on a FakePyTorchJobApi. Times are in seconds.
+    """
+
+    def __init__(self, scheduler: str, pipelines: int = 1, aging: float = 0.0, nodes: int = 1):
+        with open('configs/example_cloud_experiment.json') as f:
+            config = BareConfig.from_dict(json.load(f))
+        config.experiment = dataclasses.replace(config.experiment, scheduler=scheduler, pipelines=pipelines,
+                                                aging=aging)
+        self.clock = SimulatedClock()
+        self.api = FakePyTorchJobApi(self.clock)
+        self.schedule = Schedule(self.api, config, JobWorkloadPredictor(), self.clock,
+                                 capacity=lambda: [NODE] * nodes, seed=0)
+
+    def add(self, task_id: str, length: float, cores: str = '1000m', group_id: str = 'group',
+            learned: bool = False) -> ArrivalTask:
+        task = ArrivalTask(priority=1, id=uuid.uuid4(), network='FashionMNISTCNN', dataset='fashion-mnist',
+                           sys_conf=SystemParameters(1, cores, '1Gi', 'train'),
+                           param_conf=HyperParameters(32, 1, '0.01', '0.0002'), created=self.clock.time_ms(),
+                           task_id=task_id, group_id=group_id, predicted_length=int(length * 1000), learned=learned)
+        self.schedule.add_task(task)
+        return task
+
+    def step(self) -> None:
+        self.schedule.check_completed()
+        self.schedule.reschedule()
+        self.schedule.deploy_tasks()
+        for job_name in self.running():
+            if 'startTime' not in self.api.get(job_name)['status']:
+                self.api.start_job(job_name)
+
+    def advance(self, seconds: float) -> None:
+        self.clock.advance(self.clock.time() + seconds)
+
+    def finish(self, task_id: str) -> None:
+        self.api.finish_job(self.job_of(task_id))
+
+    def running(self):
+        return list(self.schedule.deployed_tasks.keys())
+
+    def running_tasks(self):
+        return sorted(task.task_id for _, task in self.schedule.deployed_tasks.values())
+
+    def pending_tasks(self):
+        return [task.task_id for task in self.schedule.pending_tasks]
+
+    def job_of(self, task_id: str) -> str:
+        return next(name for name, (_, task) in self.schedule.deployed_tasks.items() if task.task_id == task_id)
+
+
+def test_fifo_deploys_in_order_of_arrival():
+    experiment = Experiment('fifo')
+    for task_id in ['a', 'b', 'c']:
+        experiment.add(task_id, 10)
+        experiment.advance(1)
+    experiment.step()
+    assert experiment.running_tasks() == ['a']
+    experiment.advance(10)
+    experiment.finish('a')
+    experiment.step()
+    assert experiment.running_tasks() == ['b']
+    # Task a arrived at 0 seconds, and completed after it was deployed at 3 seconds and ran for 10 seconds.
+    assert experiment.schedule.completion_times == [13000]
+
+
+def test_group_delays_sum_realised_and_waiting_time():
+    experiment = Experiment('fifo')
+    experiment.add('a', 10, group_id='x')
+    experiment.advance(2)
+    experiment.add('b', 10, group_id='x')
+    experiment.add('c', 10, group_id='y')
+    experiment.advance(3)
+    # Nothing is deployed, the delays are the time that the pending tasks have been waiting.
+    assert experiment.schedule.calculate_group_delays() == {'x': 5000 + 3000, 'y': 3000}
+    experiment.step()
+    # Task a started after 5 seconds, b and c are still waiting.
+    assert experiment.running_tasks() == ['a']
+    assert experiment.schedule.calculate_group_delays() == {'x': 5000 + 3000, 'y': 3000}
+    experiment.advance(4)
+    assert experiment.schedule.calculate_group_delays() == {'x': 5000 + 7000, 'y': 7000}
+
+
+def test_backfill_does_not_delay_the_reserved_head():
+    experiment = Experiment('backfill')
+    experiment.add('running', 10, cores='3000m')
+    experiment.step()
+    assert experiment.running_tasks() == ['running']
+    # The head needs the full node, and gets a reservation at the completion of the running job after 10 seconds.
+    experiment.add('head', 10, cores='4000m')
+    experiment.add('long', 20)
+    experiment.add('short', 5)
+    experiment.step()
+    assert experiment.running_tasks() == ['running', 'short']
+    assert experiment.pending_tasks() == ['head', 'long']
+
+    experiment.advance(10)
+    experiment.finish('running')
+    experiment.finish('short')
+    experiment.step()
+    assert experiment.running_tasks() == ['head']
+    assert experiment.pending_tasks() == ['long']
+
+
+def test_backfill_uses_the_capacity_left_at_the_reservation():
+    experiment = Experiment('backfill')
+    experiment.add('running', 10, cores='3000m')
+    experiment.step()
+    # At the reservation, the head leaves 2000m of the node, in which the long task fits.
+    experiment.add('head', 10, cores='2000m')
+    experiment.add('long', 20)
+    experiment.step()
+    assert experiment.running_tasks() == ['long', 'running']
+    assert experiment.pending_tasks() == ['head']
+
+
+@pytest.mark.parametrize('length, learned, preempted', [
+    # Remaining 90 seconds, but the job would restart after running for 10 seconds, so the margin is 80 seconds.
+    (50, True, True),
+    (85, True, False),
+    # Cold-start predictions do not preempt.
+    (1, False, False),
+])
+def test_srpt_preempts_by_the_restart_margin(length, learned, preempted):
+    experiment = Experiment('srpt')
+    experiment.add('running', 100, learned=True)
+    experiment.step()
+    experiment.advance(10)
+    experiment.add('candidate', length, learned=learned)
+    experiment.step()
+    assert experiment.schedule.preemptions == int(preempted)
+    if preempted:
+        assert experiment.running_tasks() == ['candidate']
+        assert experiment.pending_tasks() == ['running']
+    else:
+        assert experiment.running_tasks() == ['running']
+        assert experiment.pending_tasks() == ['candidate']
+
+
+def test_srpt_preempts_a_task_at_most_once():
+    experiment = Experiment('srpt')
+    experiment.add('running', 100, learned=True)
+    experiment.step()
+    experiment.advance(10)
+    experiment.add('candidate', 5, learned=True)
+    experiment.step()
+    experiment.advance(5)
+    experiment.finish('candidate')
+    experiment.step()
+    assert experiment.running_tasks() == ['running']
+    experiment.advance(10)
+    experiment.add('short', 1, learned=True)
+    experiment.step()
+    assert experiment.schedule.preemptions == 1
+    assert experiment.running_tasks() == ['running']
+    assert experiment.pending_tasks() == ['short']
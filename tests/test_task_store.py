@@ -0,0 +1,83 @@
+import random
+import uuid
+
+from fltk.schedulers.task_store import PendingTaskStore
+from fltk.util.task.task import ArrivalTask
+
+
+def make_task(created: int, group_id: str = 'group', priority: int = 1) -> ArrivalTask:
+    return ArrivalTask(priority=priority, id=uuid.uuid4(), network='FashionMNISTCNN', dataset='fashion-mnist',
+                       sys_conf=None, param_conf=None, created=created, task_id=f'task_{created}', group_id=group_id,
+                       predicted_length=0)
+
+
+def heap_entries(store: PendingTaskStore) -> int:
+    return sum(map(len, store._views.values())) + sum(map(len, store._groups.values()))
+
+
+def test_peek_skips_removed_tasks():
+    store = PendingTaskStore()
+    tasks = [make_task(created) for created in range(5)]
+    for task in reversed(tasks):
+        store.add(task)
+    store.remove(tasks[0].id)
+    store.remove(tasks[2].id)
+    assert store.peek(PendingTaskStore.ARRIVAL) is tasks[1]
+    assert list(store.ordered(PendingTaskStore.ARRIVAL)) == [tasks[1], tasks[3], tasks[4]]
+    assert store.peek_group('group') is tasks[1]
+
+
+def test_readded_task_is_ordered_by_its_new_key():
+    store = PendingTaskStore()
+    store.add_view('length', lambda task: (task.predicted_length,))
+    short, long = make_task(0), make_task(1)
+    short.predicted_length, long.predicted_length = 10, 20
+    store.add(short)
+    store.add(long)
+    short.predicted_length = 30
+    store.add(short)
+    assert len(store) == 2
+    assert list(store.ordered('length')) == [long, short]
+
+
+def test_entries_count_the_heaps():
+    rng = random.Random(0)
+    store = PendingTaskStore(seed=0)
+    pending = []
+    for created in range(2000):
+        if pending and rng.random() < 0.5:
+            store.remove(pending.pop(rng.randrange(len(pending))).id)
+        else:
+            task = make_task(created, f'group_{rng.randrange(20)}')
+            store.add(task)
+            pending.append(task)
+        if rng.random() < 0.1:
+            store.peek(PendingTaskStore.ARRIVAL)
+        assert store._entries == heap_entries(store)
+        # The heaps are compacted once more than half of their entries are stale.
+        assert store._entries <= 2 * (len(store) + 1) * (len(store._view_keys) + 1)
+
+
+def test_removing_the_last_task_of_a_group_drops_its_entries():
+    store = PendingTaskStore()
+    tasks = [make_task(created, f'group_{created}') for created in range(3)]
+    for task in tasks:
+        store.add(task)
+    store.remove(tasks[0].id)
+    assert store.groups() == ['group_1', 'group_2']
+    # Only the stale entry of the arrival view remains.
+    assert store._entries == heap_entries(store) == 5
+
+
+def test_waiting_time_sums_the_pending_tasks_of_a_group():
+    store = PendingTaskStore()
+    first, second, other = make_task(0, 'a'), make_task(100, 'a'), make_task(200, 'b')
+    for task in (first, second, other):
+        store.add(task)
+    assert store.waiting_time('a', 1000) == 1000 + 900
+    assert store.waiting_time('b', 1000) == 800
+    store.remove(first.id)
+    assert store.waiting_time('a', 1000) == 900
+    store.remove(second.id)
+    assert store.waiting_time('a', 1000) == 0
+    assert store.group_size('a') == 0